@@ -0,0 +1,324 @@
+import sys
+import time
+import queue
+import threading
+import numpy as np
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType, MAX_NACKS
+from audio_stream_sender import AudioStreamSender
+from audio_stream_receiver import AudioStreamReceiver
+from audio_frame_reader import FrameReader
+from audio_packetizer import single_frame
+from audio_backends import LoopbackBackend
+from audio_frame_cache import FrameCache
+
+# Canal de retorno (ACK/NACK) en su propia banda, debajo de la de datos (12.5-15.9 kHz)
+RETURN_BASE_FREQ = 12500
+
+# Flags del ACK (byte después del acumulado)
+ACK_COMPLETE = 0x01
+
+def _render(protocol, packet):
+    """PCM int16 de un paquete, con un símbolo de silencio al final"""
+    audio, _ = protocol.modulate_frames(*single_frame(packet))
+    audio = np.concatenate([audio, np.zeros(protocol.samples_per_bit, dtype=audio.dtype)])
+    return (audio * (32767 * 0.9)).astype(np.int16).tobytes()
+
+class ArqReceiver:
+    """Receptor streaming full-duplex: confirma lo recibido mientras llega.
+    
+    Por la banda de retorno envía ACKs acumulados (primer paquete que falta) cada
+    ack_every paquetes y NACKs selectivos en cuanto aparece un hueco. Guarda los
+    paquetes igual que AudioStreamReceiver (en .partial hasta completar).
+    """
+    def __init__(self, backend=None, output_backend=None, ack_every=4, nack_interval=1.0):
+        self.receiver = AudioStreamReceiver(backend, output_backend)
+        self.protocol = self.receiver.protocol
+        self.return_protocol = AudioProtocolUltrasonic(base_freq=RETURN_BASE_FREQ)
+        self.reader = FrameReader(self.protocol)
+        self.ack_every = ack_every
+        self.nack_interval = nack_interval  # segundos antes de volver a pedir un paquete
+        self.output_stream = None
+        self.state = {}  # por stream: acumulado, paquetes desde el último ACK, NACKs enviados
+        self.completed = {}  # por stream: total del último archivo guardado (para repetir el ACK)
+    
+    def listen(self, output_dir=".", max_files=None, timeout=None):
+        """Escucha y confirma transferencias; devuelve las rutas guardadas"""
+        n = self.protocol.samples_per_bit
+        stream = self.receiver.audio.open(rate=self.protocol.sample_rate, input=True, frames_per_buffer=n * 4)
+        self.output_stream = self.receiver.output.open(rate=self.protocol.sample_rate, output=True)
+        print(f"🎧 Escuchando (ARQ, retorno en {self.return_protocol.freqs[0]}-{self.return_protocol.freqs[7]} Hz)...")
+        
+        saved = []
+        start = time.time()
+        try:
+            while max_files is None or len(saved) < max_files:
+                if timeout and time.time() - start > timeout:
+                    break
+                data = stream.read(n * 4, exception_on_overflow=False)
+                if not data:
+                    break
+                chunk = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
+                if self.receiver.frontend:
+                    chunk = self.receiver.frontend.process(chunk)
+                    if len(chunk) == 0:
+                        continue
+                
+                for packet in self.reader.feed(chunk):
+                    path = self._handle_packet(packet, output_dir)
+                    if path:
+                        saved.append(path)
+        except KeyboardInterrupt:
+            print("\n✓ Escucha detenida")
+        finally:
+            stream.close()
+            self.output_stream.close()
+        return saved
+    
+    def _handle_packet(self, packet, output_dir):
+        ptype, seq, data, valid = self.protocol.decode_packet(packet)
+        if not valid:
+            return None
+        stream_id = self.protocol.packet_stream_id(packet)
+        transfer = self.receiver.transfers.get(stream_id)
+        path = self.receiver._handle_packet(packet, output_dir)
+        
+        if ptype == PacketType.SYN:
+            self.state[stream_id] = {'next': 0, 'since_ack': 0, 'nacked': {}}
+            self.completed.pop(stream_id, None)
+            self._send_ack(stream_id, 0)
+            transfer = self.receiver.transfers.get(stream_id)
+            if transfer and transfer.count():
+                self._update(stream_id, transfer, force=True)  # sesión retomada
+            return None
+        
+        if path:
+            # Archivo completo: ACK final (se repite si vuelve a llegar el FIN)
+            self.completed[stream_id] = transfer.expected
+            self.state.pop(stream_id, None)
+            self._send_ack(stream_id, transfer.expected, ACK_COMPLETE)
+            return path
+        
+        if transfer is None or stream_id not in self.state:
+            if ptype == PacketType.FIN and stream_id in self.completed:
+                self._send_ack(stream_id, self.completed[stream_id], ACK_COMPLETE)
+            return None
+        
+        if ptype == PacketType.DATA:
+            self.state[stream_id]['since_ack'] += 1
+        self._update(stream_id, transfer, force=ptype == PacketType.FIN)
+        return None
+    
+    def _update(self, stream_id, transfer, force=False):
+        """Avanza el acumulado y decide si hay que enviar NACK o ACK"""
+        state = self.state[stream_id]
+        while transfer.has(state['next']):
+            state['next'] += 1
+        
+        # Huecos: hasta el FIN si ya se conoce el total, si no hasta el último recibido
+        last = transfer.expected if transfer.expected is not None else self.receiver.last_seq.get(stream_id, -1)
+        now = time.time()
+        gaps = [seq for seq in range(state['next'], last)
+                if not transfer.has(seq) and (force or now - state['nacked'].get(seq, 0) > self.nack_interval)]
+        if gaps:
+            gaps = gaps[:MAX_NACKS]
+            for seq in gaps:
+                state['nacked'][seq] = now
+            self._send_nack(stream_id, gaps)
+        elif force or state['since_ack'] >= self.ack_every:
+            self._send_ack(stream_id, state['next'])
+    
+    def _send_ack(self, stream_id, cumulative, flags=0):
+        data = cumulative.to_bytes(2, 'big') + bytes([flags])
+        packet = self.return_protocol.encode_packet(PacketType.ACK, cumulative, data, stream_id)
+        self.output_stream.write(_render(self.return_protocol, packet))
+        if stream_id in self.state:
+            self.state[stream_id]['since_ack'] = 0
+        print(f"   ↩ ACK {cumulative}{' (completo)' if flags & ACK_COMPLETE else ''}")
+    
+    def _send_nack(self, stream_id, seqs):
+        data = b''.join(seq.to_bytes(2, 'big') for seq in seqs)
+        packet = self.return_protocol.encode_packet(PacketType.NACK, len(seqs), data, stream_id)
+        self.output_stream.write(_render(self.return_protocol, packet))
+        print(f"   ↩ NACK {seqs}")
+
+class ArqSender:
+    """Emisor streaming full-duplex con ventana deslizante.
+    
+    Envía hasta window paquetes sin confirmar y escucha la banda de retorno en un
+    hilo aparte: los NACK se retransmiten enseguida (desde frame_cache) y los ACK
+    acumulados avanzan la ventana. Si no hay respuesta en timeout segundos se
+    reenvía lo pendiente; la transferencia termina con el ACK final del receptor.
+    frame_cache: FrameCache del emisor (p.ej. con spill_dir para archivos grandes).
+    """
+    def __init__(self, backend=None, input_backend=None, window=8, timeout=2.0, max_retries=10, frame_cache=None):
+        self.sender = AudioStreamSender(backend, frame_cache=frame_cache)
+        self.protocol = self.sender.protocol
+        self.input = input_backend or self.sender.audio
+        self.return_protocol = AudioProtocolUltrasonic(base_freq=RETURN_BASE_FREQ)
+        self.window = window
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.feedback = queue.Queue()
+        self.stream = None
+    
+    def _read_feedback(self, stop):
+        """Hilo lector: decodifica ACK/NACK de la banda de retorno"""
+        n = self.return_protocol.samples_per_bit
+        stream = self.input.open(rate=self.return_protocol.sample_rate, input=True, frames_per_buffer=n * 4)
+        reader = FrameReader(self.return_protocol, interval_symbols=8)
+        try:
+            while not stop.is_set():
+                data = stream.read(n * 4, exception_on_overflow=False)
+                if not data:
+                    break
+                chunk = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
+                for packet in reader.feed(chunk):
+                    ptype, seq, pdata, valid = self.return_protocol.decode_packet(packet)
+                    self.feedback.put((self.return_protocol.packet_stream_id(packet), ptype, pdata))
+        finally:
+            stream.close()
+    
+    def send(self, filename, stream_id=0):
+        """Envía un archivo hasta que el receptor confirma que lo tiene completo"""
+        file_basename, buffer, offsets = self.sender.prepare_frames(filename, stream_id=stream_id)
+        keys = self.sender._frame_keys(buffer, offsets)
+        n_data = len(offsets) - 3
+        
+        last_sent = {}
+        
+        def write_frame(index):
+            last_sent[index] = time.time()
+            # PCM desde frame_cache; si no está (o se descartó), se genera y se guarda
+            pcm = self.sender.frame_cache.get(*keys[index])
+            if pcm is None:
+                pcm = self.sender.render_frames(buffer, offsets[index:index + 2])[0].tobytes()
+                self.sender.frame_cache.put(*keys[index], pcm)
+            self.stream.write(pcm)
+        
+        self.stream = self.sender.audio.open(rate=self.protocol.sample_rate, output=True)
+        stop = threading.Event()
+        listener = threading.Thread(target=self._read_feedback, args=(stop,), daemon=True)
+        listener.start()
+        
+        base = 0  # primer paquete sin confirmar
+        next_new = 0  # próximo paquete nuevo
+        retransmit = []
+        fin_sent = False
+        complete = False
+        heard = False  # hubo alguna respuesta del receptor
+        retries = 0
+        retransmitted = 0
+        start = time.time()
+        last_event = time.time()
+        
+        write_frame(0)
+        print(f"✓ SYN enviado con nombre: {file_basename} (ventana de {self.window} paquetes)")
+        try:
+            while not complete:
+                # Procesar lo que llegó por el canal de retorno
+                while not self.feedback.empty():
+                    fb_stream, ptype, data = self.feedback.get()
+                    if fb_stream != stream_id:
+                        continue
+                    heard = True
+                    last_event = time.time()
+                    if ptype == PacketType.ACK and len(data) >= 2:
+                        cumulative = int.from_bytes(data[:2], 'big')
+                        if cumulative > base:
+                            base = cumulative
+                            retries = 0
+                        if len(data) > 2 and data[2] & ACK_COMPLETE:
+                            complete = True
+                    elif ptype == PacketType.NACK:
+                        for i in range(0, len(data) - 1, 2):
+                            seq = int.from_bytes(data[i:i + 2], 'big')
+                            # Un NACK viejo de algo recién reenviado no se vuelve a atender
+                            recent = time.time() - last_sent.get(1 + seq, 0) < self.timeout / 2
+                            if base <= seq < next_new and seq not in retransmit and not recent:
+                                retransmit.append(seq)
+                if complete:
+                    break
+                
+                retransmit = [seq for seq in retransmit if seq >= base]
+                if retransmit:
+                    seq = retransmit.pop(0)
+                    write_frame(1 + seq)
+                    retransmitted += 1
+                    print(f"↻ Paquete {seq + 1}/{n_data} retransmitido")
+                    last_event = time.time()
+                elif next_new < min(base + self.window, n_data):
+                    write_frame(1 + next_new)
+                    next_new += 1
+                    print(f"✓ Paquete {next_new}/{n_data} enviado")
+                    last_event = time.time()
+                elif next_new == n_data and not fin_sent:
+                    # El FIN le dice al receptor el total: así pide también los últimos
+                    write_frame(n_data + 1)
+                    fin_sent = True
+                    print(f"✓ FIN enviado")
+                    last_event = time.time()
+                elif time.time() - last_event > self.timeout:
+                    retries += 1
+                    if retries > self.max_retries:
+                        print(f"✗ Sin respuesta del receptor después de {self.max_retries} intentos")
+                        return False
+                    print(f"⚠ Timeout: reenviando paquetes {base + 1}-{next_new} (intento {retries})")
+                    if not heard:
+                        write_frame(0)  # quizás se perdió el SYN
+                    for seq in range(base, next_new):
+                        write_frame(1 + seq)
+                        retransmitted += 1
+                    if fin_sent:
+                        write_frame(n_data + 1)
+                    last_event = time.time()
+                else:
+                    time.sleep(0.01)
+        finally:
+            stop.set()
+            listener.join()
+            self.stream.close()
+        
+        # El receptor ya tiene el archivo: su audio no se vuelve a pedir
+        self.sender.frame_cache.drop_session(keys[0][0])
+        print(f"\n✓ Transmisión confirmada en {time.time() - start:.1f} s ({retransmitted} retransmisiones)")
+        return True
+    
+    def close(self):
+        self.sender.close()
+
+def demo(filename, output_dir, loss):
+    """Emisor y receptor conectados por un canal simulado con pérdidas"""
+    sender_end, receiver_end = LoopbackBackend.pair(loss=loss, seed=0)
+    receiver = ArqReceiver(receiver_end)
+    sender = ArqSender(sender_end, timeout=1.0)
+    
+    result = []
+    thread = threading.Thread(target=lambda: result.extend(receiver.listen(output_dir, max_files=1, timeout=600)))
+    thread.start()
+    ok = sender.send(filename)
+    thread.join()
+    print(f"\n{'✓' if ok and result else '✗'} Demo con {loss * 100:.0f}% de pérdida: {result}")
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) < 1 or args[0] not in ('send', 'listen', 'demo'):
+        print("Uso:")
+        print("  python3 audio_arq.py listen [directorio_salida]")
+        print("  python3 audio_arq.py send <archivo> [--window=8] [--frame-cache-mb=64] [--frame-cache-dir=directorio]")
+        print("  python3 audio_arq.py demo <archivo> [directorio_salida] [--loss=0.2]")
+        sys.exit(1)
+    
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    if args[0] == 'listen':
+        ArqReceiver().listen(args[1] if len(args) > 1 else ".")
+    elif args[0] == 'send':
+        # Cache del audio enviado: hasta frame-cache-mb en memoria, el resto a disco
+        frame_cache = FrameCache(int(float(options.get('frame-cache-mb', 64)) * 1024 * 1024),
+                                 options.get('frame-cache-dir'))
+        sender = ArqSender(window=int(options.get('window', 8)), frame_cache=frame_cache)
+        try:
+            sender.send(args[1])
+        finally:
+            sender.close()
+    else:
+        demo(args[1], args[2] if len(args) > 2 else ".", float(options.get('loss', 0.2)))
@@ -0,0 +1,232 @@
+import sys
+import asyncio
+import contextlib
+import numpy as np
+from audio_backends import CALLBACK_CONTINUE, CALLBACK_COMPLETE
+from audio_stream_receiver import AudioStreamReceiver
+from audio_stream_sender import AudioStreamSender
+from audio_protocol_ultrasonic import SYN_FLAG_PROFILE
+
+class AsyncAudioReceiver:
+    """Receptor para asyncio: captura por callback y demodula en un executor.
+    
+    Se puede iterar varias veces; el dispositivo se libera con close() (o al
+    salir de un async with).
+    """
+    
+    def __init__(self, output_dir=".", backend=None, executor=None, max_queue=256, device_rate=None):
+        self.receiver = AudioStreamReceiver(backend, device_rate=device_rate)
+        self.protocol = self.receiver.protocol
+        self.output_dir = output_dir
+        self.executor = executor  # None = executor por defecto del loop
+        self.max_queue = max_queue
+        self.stream = None
+        self._loop = None
+        self._chunks = None
+        self.dropped = 0  # bloques descartados por cola llena (demodulación atrasada)
+        self._dropping = False
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.close()
+    
+    def _push_chunk(self, data):
+        """Encola audio capturado (se ejecuta en el loop); descarta lo más viejo si se llena"""
+        if self._chunks.full():
+            self._chunks.get_nowait()
+            self.dropped += 1
+            if not self._dropping:
+                print("   ⚠ Demodulación atrasada: se descartan bloques de audio (cola llena)")
+            self._dropping = True
+        else:
+            self._dropping = False
+        self._chunks.put_nowait(data)
+    
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        """Callback de PortAudio: solo entrega el bloque al loop, nunca demodula aquí"""
+        self._loop.call_soon_threadsafe(self._push_chunk, in_data)
+        return (None, CALLBACK_CONTINUE)
+    
+    def _start(self):
+        if self.stream is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        frames = self.protocol.samples_per_bit * 4
+        
+        if self.receiver.audio.realtime:
+            self._chunks = asyncio.Queue(maxsize=self.max_queue)
+            self.stream = self.receiver.audio.open(
+                rate=self.receiver.device_rate,
+                input=True,
+                frames_per_buffer=frames,
+                stream_callback=self._on_audio
+            )
+            self.stream.start_stream()
+        else:
+            # Archivo/pipe/memoria: se lee en el executor tan rápido como se pueda
+            self.stream = self.receiver.audio.open(
+                rate=self.receiver.device_rate,
+                input=True,
+                frames_per_buffer=frames
+            )
+    
+    async def _blocks(self):
+        """Bloques de audio capturado; termina si la entrada se acaba"""
+        self._start()
+        frames = self.protocol.samples_per_bit * 4
+        while True:
+            if self._chunks is not None:
+                data = await self._chunks.get()
+            else:
+                data = await self._loop.run_in_executor(self.executor, self.stream.read, frames)
+                if not data:
+                    return
+            yield data
+    
+    def _demodulate(self, data):
+        """Convierte un bloque a float y lo pasa por el receptor (corre en el executor)"""
+        audio_chunk = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
+        return self.receiver.feed(audio_chunk)
+    
+    async def _raw_packets(self):
+        try:
+            async for data in self._blocks():
+                found = await self._loop.run_in_executor(self.executor, self._demodulate, data)
+                for packet in found:
+                    yield packet
+            for packet in await self._loop.run_in_executor(self.executor, self.receiver.finish):
+                yield packet
+        finally:
+            self._stop()
+    
+    async def packets(self):
+        """Itera los paquetes válidos recibidos como (tipo, seq, datos)"""
+        # Cortar la iteración cierra la captura enseguida (no cuando se libere el generador)
+        async with contextlib.aclosing(self._raw_packets()) as raw:
+            async for packet in raw:
+                ptype, seq, data, valid = self.protocol.decode_packet(packet)
+                if valid:
+                    yield ptype, seq, data
+    
+    async def files(self):
+        """Itera las rutas de los archivos completados"""
+        async with contextlib.aclosing(self._raw_packets()) as raw:
+            async for packet in raw:
+                path = await self._loop.run_in_executor(
+                    self.executor, self.receiver._handle_packet, packet, self.output_dir)
+                if path:
+                    yield path
+    
+    def _stop(self):
+        """Cierra la captura al terminar una iteración (el backend sigue disponible)"""
+        if self.stream is None:
+            return
+        self.stream.stop_stream()
+        self.stream.close()
+        self.stream = None
+        self._chunks = None
+        if self.receiver.frontend:
+            print(f"   Demodulación activa: {100 * self.receiver.duty_cycle():.1f}% del tiempo")
+        if self.dropped:
+            print(f"   ⚠ Bloques descartados: {self.dropped}")
+    
+    def close(self):
+        self._stop()
+        self.receiver.close()
+
+class AsyncAudioSender:
+    """Emisor para asyncio: prepara el audio en un executor y reproduce por callback"""
+    
+    def __init__(self, backend=None, executor=None, profile=None, device_rate=None):
+        self.sender = AudioStreamSender(backend, profile=profile, device_rate=device_rate)
+        self.protocol = self.sender.protocol
+        self.executor = executor  # None = executor por defecto del loop
+    
+    def _render(self, filename):
+        """Comprime, empaqueta y genera el PCM de toda la transferencia (a la frecuencia del dispositivo)"""
+        sender = self.sender
+        if sender.data_protocol is sender.protocol:
+            file_basename, buffer, offsets = sender.prepare_frames(filename)
+            pcm, _ = sender.render_frames(buffer, offsets)
+            return pcm.tobytes(), len(offsets) - 3
+        
+        # Otro perfil: SYN con el de por defecto y pausas para que el receptor cambie
+        file_basename, buffer, offsets = sender.prepare_frames(filename, SYN_FLAG_PROFILE)
+        pcm, _ = sender.render_frames(buffer, offsets[1:], sender.data_protocol)
+        syn = sender._syn_pcm(buffer[offsets[0]:offsets[1]].tobytes())
+        return syn + pcm.tobytes() + sender._guard(), len(offsets) - 3
+    
+    async def send(self, filename):
+        """Envía un archivo; termina cuando se reprodujo la última muestra"""
+        loop = asyncio.get_running_loop()
+        pcm, n_packets = await loop.run_in_executor(self.executor, self._render, filename)
+        
+        done = loop.create_future()
+        position = 0
+        
+        def finish():
+            if not done.done():
+                done.set_result(None)
+        
+        def on_audio(in_data, frame_count, time_info, status):
+            # Hilo de PortAudio: copiar el siguiente bloque del PCM ya generado
+            nonlocal position
+            chunk = pcm[position:position + frame_count * 2]
+            position += len(chunk)
+            if len(chunk) < frame_count * 2:
+                loop.call_soon_threadsafe(finish)
+                return (chunk + bytes(frame_count * 2 - len(chunk)), CALLBACK_COMPLETE)
+            return (chunk, CALLBACK_CONTINUE)
+        
+        if not self.sender.audio.realtime:
+            # Archivo/pipe/memoria: escritura directa en el executor
+            stream = self.sender.audio.open(rate=self.sender.device_rate, output=True)
+            try:
+                await loop.run_in_executor(self.executor, stream.write, pcm)
+            finally:
+                stream.close()
+            return n_packets
+        
+        stream = self.sender.audio.open(
+            rate=self.sender.device_rate,
+            output=True,
+            stream_callback=on_audio
+        )
+        stream.start_stream()
+        try:
+            await done
+        finally:
+            stream.stop_stream()
+            stream.close()
+        
+        return n_packets
+    
+    def close(self):
+        self.sender.close()
+
+async def _main(argv):
+    if argv[0] == 'send':
+        sender = AsyncAudioSender()
+        try:
+            # Un solo dispositivo de salida: las transferencias van en orden
+            for path in argv[1:]:
+                await sender.send(path)
+        finally:
+            sender.close()
+    else:
+        async with AsyncAudioReceiver(argv[1] if len(argv) > 1 else ".") as receiver:
+            async for path in receiver.files():
+                print(f"✓ Transferencia completa: {path}")
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('send', 'listen'):
+        print("Uso: python3 audio_async.py send <archivo> [archivo...]")
+        print("     python3 audio_async.py listen [directorio_salida]")
+        sys.exit(1)
+    
+    try:
+        asyncio.run(_main(sys.argv[1:]))
+    except KeyboardInterrupt:
+        print("\n✓ Detenido")
@@ -0,0 +1,208 @@
+import sys
+import wave
+import queue
+import numpy as np
+
+# Valores de retorno de stream_callback (mismos que PyAudio)
+CALLBACK_CONTINUE = 0
+CALLBACK_COMPLETE = 1
+
+class AudioBackend:
+    """Interfaz de E/S de audio: PCM int16 mono, al estilo de PyAudio.
+
+    open() devuelve un stream con read(frames), write(data), stop_stream() y
+    close(). read() devuelve b'' cuando la entrada se terminó.
+    """
+    realtime = False  # True si read/write siguen el reloj del dispositivo
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        raise NotImplementedError
+
+    def read(self, frames, exception_on_overflow=False):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+    def terminate(self):
+        self.close()
+
+class PyAudioBackend(AudioBackend):
+    """Tarjeta de sonido vía PyAudio (tiempo real)"""
+    realtime = True
+
+    def __init__(self):
+        import pyaudio
+        self._pyaudio = pyaudio
+        self.audio = pyaudio.PyAudio()
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        kwargs = {}
+        if frames_per_buffer:
+            kwargs['frames_per_buffer'] = frames_per_buffer
+        if stream_callback:
+            kwargs['stream_callback'] = stream_callback
+        return self.audio.open(
+            format=self._pyaudio.paInt16,
+            channels=1,
+            rate=rate,
+            input=input,
+            output=output,
+            **kwargs
+        )
+
+    def terminate(self):
+        self.audio.terminate()
+
+class WavFileBackend(AudioBackend):
+    """Lee una captura WAV o escribe la transmisión a un WAV, sin esperar al reloj"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.wav = None
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        if input:
+            self.wav = wave.open(self.filename, 'r')
+            if self.wav.getframerate() != rate or self.wav.getsampwidth() != 2 or self.wav.getnchannels() != 1:
+                raise ValueError(f"{self.filename}: se esperaba WAV mono 16 bits a {rate} Hz")
+        else:
+            self.wav = wave.open(self.filename, 'w')
+            self.wav.setnchannels(1)
+            self.wav.setsampwidth(2)
+            self.wav.setframerate(rate)
+        return self
+
+    def read(self, frames, exception_on_overflow=False):
+        return self.wav.readframes(frames)
+
+    def write(self, data):
+        self.wav.writeframes(data)
+
+    def close(self):
+        if self.wav:
+            self.wav.close()
+            self.wav = None
+
+class PipeBackend(AudioBackend):
+    """PCM crudo s16le por stdin/stdout (p.ej. con arecord/aplay o sox)"""
+
+    def __init__(self, infile=None, outfile=None):
+        self.infile = infile or sys.stdin.buffer
+        self.outfile = outfile or sys.stdout.buffer
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        return self
+
+    def read(self, frames, exception_on_overflow=False):
+        # Un pipe puede entregar lecturas parciales: completar el bloque
+        data = bytearray()
+        while len(data) < frames * 2:
+            block = self.infile.read(frames * 2 - len(data))
+            if not block:
+                break
+            data.extend(block)
+        return bytes(data[:len(data) - len(data) % 2])
+
+    def write(self, data):
+        self.outfile.write(data)
+        self.outfile.flush()
+
+class MemoryBackend(AudioBackend):
+    """Audio en memoria: entrada desde bytes/array int16, salida acumulada en self.output"""
+
+    def __init__(self, data=b''):
+        if isinstance(data, np.ndarray):
+            data = data.astype(np.int16).tobytes()
+        self.data = bytes(data)
+        self.position = 0
+        self.output = bytearray()
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        return self
+
+    def read(self, frames, exception_on_overflow=False):
+        chunk = self.data[self.position:self.position + frames * 2]
+        self.position += len(chunk)
+        return chunk
+
+    def write(self, data):
+        self.output.extend(data)
+
+    def getvalue(self):
+        return bytes(self.output)
+
+class NullBackend(AudioBackend):
+    """Descarta la salida; la entrada está vacía (fin inmediato)"""
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        return self
+
+    def read(self, frames, exception_on_overflow=False):
+        return b''
+
+    def write(self, data):
+        pass
+
+class LoopbackBackend(AudioBackend):
+    """Canal de audio simulado entre dos extremos (pruebas full-duplex).
+
+    Lo que escribe un extremo lo lee el otro. Con loss, cada write se pierde
+    (llega como silencio) con esa probabilidad. read() nunca termina: sin datos
+    devuelve silencio, como un micrófono abierto.
+    """
+
+    def __init__(self, loss=0.0, seed=None):
+        self.loss = loss
+        self.rng = np.random.default_rng(seed)
+        self.inbox = queue.Queue()
+        self.pending = b''
+        self.peer = None
+
+    @classmethod
+    def pair(cls, loss=0.0, seed=None):
+        a = cls(loss, seed)
+        b = cls(loss, None if seed is None else seed + 1)
+        a.peer = b
+        b.peer = a
+        return a, b
+
+    def open(self, rate, input=False, output=False, frames_per_buffer=None, stream_callback=None):
+        return self
+
+    def read(self, frames, exception_on_overflow=False):
+        size = frames * 2
+        try:
+            while len(self.pending) < size:
+                self.pending += self.inbox.get(timeout=0.01)
+        except queue.Empty:
+            pass
+        chunk = self.pending[:size]
+        self.pending = self.pending[size:]
+        return chunk + bytes(size - len(chunk))
+
+    def write(self, data):
+        if self.rng.random() < self.loss:
+            data = bytes(len(data))
+        self.peer.inbox.put(bytes(data))
+
+def open_backend(spec):
+    """Crea un backend desde un argumento de línea de comandos.
+
+    None → PyAudio, '-' → pipe stdin/stdout, 'null' → nulo, '*.wav' → archivo WAV
+    """
+    if spec is None:
+        return PyAudioBackend()
+    if spec == '-':
+        return PipeBackend()
+    if spec == 'null':
+        return NullBackend()
+    if spec.lower().endswith('.wav'):
+        return WavFileBackend(spec)
+    raise ValueError(f"Backend de audio desconocido: {spec}")
@@ -0,0 +1,130 @@
+import bz2
+import lzma
+import zlib
+
+class Codec:
+    """Codec de compresión identificado por un byte (el que viaja en el SYN).
+    
+    decompressor (opcional) crea un descompresor incremental (decompress(trozo) y,
+    si hace falta, flush()) para descomprimir mientras llegan los paquetes.
+    """
+    def __init__(self, codec_id, name, compress, decompress, decompressor=None):
+        self.codec_id = codec_id
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+        self.decompressor = decompressor
+    
+    def stream_decompressor(self):
+        """Descompresor incremental; sin uno propio junta todo y descomprime al final"""
+        if self.decompressor is None:
+            return _BufferedDecompressor(self.decompress)
+        return _StreamDecompressor(self.decompressor())
+
+class _StreamDecompressor:
+    def __init__(self, obj):
+        self.obj = obj
+    
+    def decompress(self, data):
+        return self.obj.decompress(data)
+    
+    def flush(self):
+        # zlib necesita flush(); bz2 y lzma entregan todo en decompress()
+        data = self.obj.flush() if hasattr(self.obj, 'flush') else b''
+        if hasattr(self.obj, 'eof') and not self.obj.eof:
+            raise ValueError("Datos comprimidos incompletos")
+        return data
+
+class _BufferedDecompressor:
+    def __init__(self, decompress):
+        self.decompress_all = decompress
+        self.data = bytearray()
+    
+    def decompress(self, data):
+        self.data.extend(data)
+        return b''
+    
+    def flush(self):
+        return self.decompress_all(bytes(self.data))
+
+class _Passthrough:
+    def decompress(self, data):
+        return bytes(data)
+
+CODECS = {}
+
+def register_codec(codec_id, name, compress, decompress, decompressor=None):
+    """Registra un codec; el ID debe caber en un byte y no repetirse"""
+    if not 0 <= codec_id <= 255 or codec_id in CODECS:
+        raise ValueError(f"ID de codec inválido o repetido: {codec_id}")
+    CODECS[codec_id] = Codec(codec_id, name, compress, decompress, decompressor)
+    return CODECS[codec_id]
+
+def get_codec(codec_id):
+    if codec_id not in CODECS:
+        raise ValueError(f"Codec desconocido: {codec_id}")
+    return CODECS[codec_id]
+
+def codec_by_name(name):
+    for codec in CODECS.values():
+        if codec.name == name:
+            return codec
+    raise ValueError(f"Codec desconocido: {name}")
+
+def _lzma_filters(preset):
+    # LZMA2 crudo: sin la cabecera .xz (~60 bytes), los filtros los fija el ID
+    return [{'id': lzma.FILTER_LZMA2, 'preset': preset}]
+
+# 0 y 1 coinciden con el antiguo flag de compresión del SYN (0 = no, 1 = zlib 9)
+STORED = 0
+ZLIB = 1
+
+register_codec(STORED, 'stored', bytes, bytes, _Passthrough)
+register_codec(ZLIB, 'zlib-9', lambda d: zlib.compress(d, level=9), zlib.decompress, zlib.decompressobj)
+register_codec(2, 'zlib-1', lambda d: zlib.compress(d, level=1), zlib.decompress, zlib.decompressobj)
+register_codec(3, 'zlib-6', lambda d: zlib.compress(d, level=6), zlib.decompress, zlib.decompressobj)
+register_codec(4, 'bz2-1', lambda d: bz2.compress(d, compresslevel=1), bz2.decompress, bz2.BZ2Decompressor)
+register_codec(5, 'bz2-9', lambda d: bz2.compress(d, compresslevel=9), bz2.decompress, bz2.BZ2Decompressor)
+register_codec(6, 'lzma-6',
+               lambda d: lzma.compress(d, format=lzma.FORMAT_RAW, filters=_lzma_filters(6)),
+               lambda d: lzma.decompress(d, format=lzma.FORMAT_RAW, filters=_lzma_filters(6)),
+               lambda: lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=_lzma_filters(6)))
+register_codec(7, 'lzma-9',
+               lambda d: lzma.compress(d, format=lzma.FORMAT_RAW, filters=_lzma_filters(9)),
+               lambda d: lzma.decompress(d, format=lzma.FORMAT_RAW, filters=_lzma_filters(9)),
+               lambda: lzma.LZMADecompressor(format=lzma.FORMAT_RAW, filters=_lzma_filters(9)))
+
+def _sample(data, sample_size):
+    """Muestra representativa: todo si es chico, si no 4 tramos repartidos"""
+    if len(data) <= sample_size:
+        return data
+    piece = sample_size // 4
+    step = (len(data) - piece) // 3
+    return b''.join(data[i * step:i * step + piece] for i in range(4))
+
+def select_codec(data, sample_size=65536, candidates=None):
+    """Elige el codec que deja menos bytes (menos tiempo de aire) y comprime con él.
+    
+    Prueba los candidatos sobre una muestra y solo comprime el archivo completo con
+    el mejor. Si el resultado no es menor que el original (JPEG, zip...), se envía
+    sin comprimir. Devuelve (codec_id, datos).
+    """
+    sample = _sample(data, sample_size)
+    if candidates is None:
+        candidates = [c for c in CODECS if c != STORED]
+    
+    best_id = STORED
+    best_size = len(sample)
+    for codec_id in candidates:
+        size = len(get_codec(codec_id).compress(sample))
+        if size < best_size:
+            best_id = codec_id
+            best_size = size
+    
+    if best_id == STORED:
+        return STORED, data
+    
+    compressed = get_codec(best_id).compress(data)
+    if len(compressed) >= len(data):
+        return STORED, data
+    return best_id, compressed
@@ -0,0 +1,68 @@
+import os
+import json
+import hashlib
+
+class DecodeCache:
+    """Cache persistente de paquetes ya demodulados, por archivo WAV.
+    
+    Cada entrada guarda ruta, tamaño, mtime y SHA-256 del WAV junto con el paquete
+    decodificado. Si tamaño y mtime coinciden se usa sin leer el archivo; si solo
+    cambió el mtime se compara el hash antes de demodular.
+    """
+    def __init__(self, path, protocol):
+        self.path = path
+        self.protocol = protocol
+        self.profile = getattr(protocol, 'profile', type(protocol).__name__)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                # Otro protocolo demodula distinto: la cache no sirve
+                if saved.get('profile') == self.profile:
+                    self.entries = saved.get('entries', {})
+            except (ValueError, OSError):
+                self.entries = {}
+    
+    def _digest(self, filename):
+        sha = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                sha.update(block)
+        return sha.hexdigest()
+    
+    def decode_from_audio(self, filename):
+        """Como protocol.decode_from_audio, pero sin volver a demodular archivos ya vistos"""
+        st = os.stat(filename)
+        key = os.path.abspath(filename)
+        entry = self.entries.get(key)
+        
+        if entry and entry['size'] == st.st_size:
+            if entry['mtime'] == st.st_mtime_ns:
+                self.hits += 1
+                return bytes.fromhex(entry['packet'])
+            digest = self._digest(filename)
+            if digest == entry['sha256']:
+                entry['mtime'] = st.st_mtime_ns
+                self.hits += 1
+                return bytes.fromhex(entry['packet'])
+        else:
+            digest = self._digest(filename)
+        
+        self.misses += 1
+        packet = self.protocol.decode_from_audio(filename)
+        self.entries[key] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'sha256': digest,
+            'packet': packet.hex()
+        }
+        return packet
+    
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'profile': self.profile, 'entries': self.entries}, f)
+        os.replace(tmp, self.path)
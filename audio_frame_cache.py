@@ -0,0 +1,78 @@
+import os
+import collections
+
+# Claves especiales para los paquetes de control de una sesión
+SYN_SEQ = -1
+FIN_SEQ = -2
+
+class FrameCache:
+    """Audio PCM ya generado de cada paquete, por (sesión, secuencia).
+    
+    Los más usados quedan en memoria (LRU) hasta budget bytes; al pasarse, los más
+    viejos se mueven a disco (un archivo .pcm por paquete en spill_dir) en vez de
+    descartarse. Una retransmisión reproduce el PCM tal cual: no hay que releer,
+    comprimir ni modular de nuevo.
+    """
+    def __init__(self, budget=64 * 1024 * 1024, spill_dir=None):
+        self.budget = budget
+        self.spill_dir = spill_dir
+        self.frames = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+    
+    def _spill_path(self, session, seq):
+        return os.path.join(self.spill_dir, f"{session:08x}", f"{seq}.pcm")
+    
+    def put(self, session, seq, pcm):
+        """Guarda el PCM (bytes int16) de un paquete"""
+        key = (session, seq)
+        if key in self.frames:
+            self.size -= len(self.frames.pop(key))
+        self.frames[key] = bytes(pcm)
+        self.size += len(self.frames[key])
+        
+        while self.size > self.budget and self.frames:
+            (old_session, old_seq), old_pcm = self.frames.popitem(last=False)
+            self.size -= len(old_pcm)
+            if self.spill_dir:
+                path = self._spill_path(old_session, old_seq)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(old_pcm)
+                self.spilled += 1
+    
+    def get(self, session, seq):
+        """PCM de un paquete, o None si no está ni en memoria ni en disco"""
+        key = (session, seq)
+        if key in self.frames:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return self.frames[key]
+        
+        if self.spill_dir and os.path.exists(self._spill_path(session, seq)):
+            with open(self._spill_path(session, seq), 'rb') as f:
+                pcm = f.read()
+            self.hits += 1
+            self.put(session, seq, pcm)
+            return pcm
+        
+        self.misses += 1
+        return None
+    
+    def has_session(self, session, seqs):
+        """True si están en cache SYN, FIN y todas las secuencias pedidas"""
+        return all(key in self.frames or (self.spill_dir and os.path.exists(self._spill_path(*key)))
+                   for key in [(session, SYN_SEQ), (session, FIN_SEQ)] + [(session, seq) for seq in seqs])
+    
+    def drop_session(self, session):
+        """Libera una sesión terminada (memoria y disco)"""
+        for key in [k for k in self.frames if k[0] == session]:
+            self.size -= len(self.frames.pop(key))
+        if self.spill_dir:
+            directory = os.path.join(self.spill_dir, f"{session:08x}")
+            if os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+                os.rmdir(directory)
@@ -0,0 +1,77 @@
+import numpy as np
+
+def read_frame(protocol, buffer, position):
+    """Lee el paquete cuyo preámbulo empieza en buffer[position], cabecera primero.
+    
+    Devuelve (paquete, fin) con fin = muestra siguiente al paquete. Si todavía no
+    llegó entero devuelve (None, fin esperado). Si la cabecera es imposible (se
+    descarta sin demodular el resto) o el checksum no coincide, (None, None).
+    """
+    n = protocol.samples_per_bit
+    data_start = position + 4 * n
+    header_end = data_start + protocol.frame_symbols(3) * n
+    if header_end > len(buffer):
+        return None, header_end
+    header = protocol.frame_header(buffer, data_start)
+    if header is None:
+        return None, None  # cabecera imposible: ruido
+    if len(header) < protocol.header_size(header):
+        return None, data_start + protocol.frame_symbols(protocol.header_size(header)) * n
+    
+    frame_end = data_start + protocol.frame_symbols(protocol.frame_length(header)) * n
+    if frame_end > len(buffer) + n // 8:
+        return None, frame_end
+    packet, _ = protocol.decode_frame(buffer, data_start, header)
+    if packet is None or not protocol.decode_packet(packet)[3]:
+        return None, None
+    return packet, frame_end
+
+class FrameReader:
+    """Extrae paquetes completos de un flujo de audio que llega por bloques.
+    
+    Busca preámbulos con protocol.find_preambles, valida la cabecera y con ella
+    sabe cuántas muestras ocupa el paquete: si todavía no llegaron espera sin
+    descartar nada, y al decodificarlo consume exactamente hasta su final. Las
+    supertramas se entregan como sus paquetes DATA.
+    """
+    def __init__(self, protocol, interval_symbols=16):
+        self.protocol = protocol
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.interval = interval_symbols * protocol.samples_per_bit
+        self.pending = 0  # muestras nuevas desde la última búsqueda
+    
+    def feed(self, audio_chunk):
+        """Agrega audio; devuelve la lista de paquetes válidos (bytes) que se completaron"""
+        self.buffer = np.append(self.buffer, audio_chunk)
+        self.pending += len(audio_chunk)
+        if self.pending < self.interval:
+            return []
+        self.pending = 0
+        return self._scan()
+    
+    def flush(self):
+        """Busca en lo que quede del buffer (fin de la entrada)"""
+        return self._scan()
+    
+    def _scan(self):
+        n = self.protocol.samples_per_bit
+        found = []
+        end = 0  # hasta dónde se consumió
+        keep = None  # comienzo de un paquete que todavía no llegó entero
+        
+        for position in self.protocol.find_preambles(self.buffer):
+            if position < end - n // 2:
+                continue  # preámbulo falso dentro de un paquete ya decodificado
+            packet, frame_end = read_frame(self.protocol, self.buffer, position)
+            if packet is not None:
+                found.extend(self.protocol.expand_frame(packet))
+                end = frame_end
+            elif frame_end is not None:
+                keep = position
+                break
+        
+        # Descartar lo procesado; sin paquete pendiente se guarda lo justo para un preámbulo
+        if keep is None:
+            keep = max(end, len(self.buffer) - 5 * n)
+        self.buffer = self.buffer[max(keep, 0):]
+        return found
@@ -0,0 +1,94 @@
+import collections
+import numpy as np
+
+class AudioFrontend:
+    """Etapa previa del receptor: squelch por energía en banda + control automático de ganancia.
+    
+    Mide la energía de cada bloque en la banda de los tonos (FFT chica) y la compara
+    con un piso de ruido adaptativo; un bloque con tonos (pico muy sobre la media de
+    la banda) cuenta como señal aunque el piso todavía no se conozca. Mientras no
+    haya señal devuelve un array vacío y el receptor no busca preámbulos ni
+    demodula. Al abrir entrega también los bloques previos (pre-roll) para no
+    perder el comienzo del preámbulo, y se queda abierto un rato después de la
+    señal (hangover) para terminar el último paquete.
+    """
+    def __init__(self, sample_rate, band, open_ratio=4.0, tonal_ratio=12.0, hangover=0.5, preroll=2,
+                 target_rms=0.3, max_gain=1000.0):
+        self.sample_rate = sample_rate
+        self.band = band
+        self.open_ratio = open_ratio  # energía / piso para abrir (≈ 6 dB)
+        self.tonal_ratio = tonal_ratio  # pico / media en la banda para considerar tonos
+        self.hangover = int(hangover * sample_rate)  # muestras abierto tras la señal
+        self.preroll = collections.deque(maxlen=preroll)
+        self.target_rms = target_rms
+        self.max_gain = max_gain
+        
+        self.noise_floor = None
+        self.gain = 1.0
+        self.hold_gain = False  # congelar el AGC (p.ej. durante un barrido de sondeo)
+        self.open = False
+        self.quiet = 0  # muestras seguidas por debajo del umbral
+        
+        # Estadísticas
+        self.blocks = 0
+        self.passed = 0
+        self._masks = {}
+    
+    def _band_mask(self, n):
+        if n not in self._masks:
+            freqs = np.fft.rfftfreq(n, 1 / self.sample_rate)
+            self._masks[n] = (freqs >= self.band[0]) & (freqs <= self.band[1])
+        return self._masks[n]
+    
+    def band_power(self, block):
+        """Potencia media del bloque dentro de la banda de los tonos y relación pico/media"""
+        bins = np.abs(np.fft.rfft(block)[self._band_mask(len(block))]) ** 2
+        total = np.sum(bins)
+        return 2 * total / len(block) ** 2, bins.max() * len(bins) / max(total, 1e-20)
+    
+    def process(self, block):
+        """Procesa un bloque; devuelve el audio a demodular (vacío si el squelch está cerrado)"""
+        self.blocks += 1
+        if len(block) == 0:
+            return block
+        power, peak_ratio = self.band_power(block)
+        tonal = peak_ratio > self.tonal_ratio
+        
+        # Piso de ruido solo con bloques sin tonos: baja rápido, sube lento
+        if not tonal:
+            if self.noise_floor is None:
+                self.noise_floor = power
+            elif power < self.noise_floor:
+                self.noise_floor = 0.5 * self.noise_floor + 0.5 * power
+            elif not self.open:
+                self.noise_floor = 0.99 * self.noise_floor + 0.01 * power
+        
+        signal = tonal or (self.noise_floor is not None and power > self.open_ratio * max(self.noise_floor, 1e-12))
+        if signal:
+            self.quiet = 0
+            if not self.open:
+                self.open = True
+                # Ganancia inicial directa desde el primer bloque con señal
+                self.gain = min(self.target_rms / np.sqrt(power), self.max_gain)
+                block = np.concatenate(list(self.preroll) + [block])
+                self.preroll.clear()
+            elif not self.hold_gain:
+                # Ataque rápido si la señal sube, liberación lenta si baja
+                wanted = min(self.target_rms / np.sqrt(power), self.max_gain)
+                rate = 0.5 if wanted < self.gain else 0.05
+                self.gain += rate * (wanted - self.gain)
+        elif self.open:
+            self.quiet += len(block)
+            if self.quiet > self.hangover:
+                self.open = False
+        
+        if not self.open:
+            self.preroll.append(block)
+            return block[:0]
+        
+        self.passed += 1
+        return (block * self.gain).astype(np.float32)
+    
+    def duty_cycle(self):
+        """Fracción de bloques que pasaron al demodulador"""
+        return self.passed / max(self.blocks, 1)
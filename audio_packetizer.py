@@ -0,0 +1,214 @@
+import numpy as np
+
+# Empaquetado en bloque: todos los paquetes [tipo][seq][len][datos][checksum(2B)]
+# en un único buffer uint8 contiguo, con offsets[i]:offsets[i+1] = paquete i.
+
+def frame_payload(payload, packet_size, packet_type, start_seq=0, stream_id=0):
+    """Divide el payload en paquetes y los arma todos de una vez.
+    
+    stream_id va en los 4 bits altos del tipo (0 = formato de siempre).
+    Devuelve (buffer, offsets). Cabeceras, copia de datos y checksums se calculan
+    vectorizados sobre todos los paquetes, sin bucles en Python.
+    """
+    payload = np.frombuffer(bytes(payload), dtype=np.uint8)
+    n_packets = -(-len(payload) // packet_size)
+    if n_packets == 0:
+        return np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.int64)
+    
+    lengths = np.full(n_packets, packet_size, dtype=np.int64)
+    lengths[-1] = len(payload) - (n_packets - 1) * packet_size
+    offsets = np.zeros(n_packets + 1, dtype=np.int64)
+    np.cumsum(lengths + 5, out=offsets[1:])
+    starts = offsets[:-1]
+    
+    buffer = np.zeros(offsets[-1], dtype=np.uint8)
+    buffer[starts] = packet_type.value | (stream_id << 4)
+    buffer[starts + 1] = (start_seq + np.arange(n_packets)) & 0xFF
+    buffer[starts + 2] = lengths
+    
+    # Byte i del payload va al paquete i // packet_size, después de su cabecera
+    index = np.arange(len(payload))
+    buffer[index + 3 + 5 * (index // packet_size)] = payload
+    
+    _write_checksums(buffer, offsets)
+    return buffer, offsets
+
+# Supertrama: un preámbulo y una cabecera compacta para varios paquetes de datos.
+# Cabecera [stream(4b)|tipo(4b)][seq del primero][cantidad][largo][largo del último][CRC-8]
+# y después cada subtrama [datos][CRC-8 de sus datos]: una subtrama dañada no
+# invalida las demás.
+SUPER_HEADER = 6
+# Los receptores por trozos (audio_scanner, audio_shm_ring) solapan lo que dura la
+# supertrama más larga: con 8 paquetes de 64 bytes, unos 5.6 s
+MAX_SUPERFRAME = 8
+
+def _crc8_table(poly=0x07):
+    table = np.zeros(256, dtype=np.uint8)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly if crc & 0x80 else crc << 1) & 0xFF
+        table[i] = crc
+    return table
+
+CRC8_TABLE = _crc8_table()
+
+def crc8_rows(rows, lengths=None):
+    """CRC-8 (polinomio 0x07) de cada fila de una matriz uint8, todas a la vez.
+    
+    lengths: bytes válidos de cada fila (el resto se ignora). Se recorre por
+    columnas, vectorizado sobre las filas.
+    """
+    rows = np.asarray(rows, dtype=np.uint8)
+    crc = np.zeros(len(rows), dtype=np.uint8)
+    for j in range(rows.shape[1]):
+        if lengths is None:
+            crc = CRC8_TABLE[crc ^ rows[:, j]]
+        else:
+            inside = j < lengths
+            crc[inside] = CRC8_TABLE[crc[inside] ^ rows[inside, j]]
+    return crc
+
+def frame_superframes(payload, packet_size, count, packet_type, start_seq=0, stream_id=0):
+    """Divide el payload en paquetes y los agrupa en supertramas de hasta count.
+    
+    Devuelve (buffer, offsets) con una supertrama por entrada, armadas de una vez
+    como en frame_payload.
+    """
+    if not 1 <= count <= MAX_SUPERFRAME or not 1 <= packet_size <= 255:
+        raise ValueError(f"Supertrama inválida: {count} paquetes de {packet_size} bytes")
+    payload = np.frombuffer(bytes(payload), dtype=np.uint8)
+    n_packets = -(-len(payload) // packet_size)
+    if n_packets == 0:
+        return np.zeros(0, dtype=np.uint8), np.zeros(1, dtype=np.int64)
+    
+    lengths = np.full(n_packets, packet_size, dtype=np.int64)
+    lengths[-1] = len(payload) - (n_packets - 1) * packet_size
+    group = np.arange(n_packets) // count
+    n_groups = group[-1] + 1
+    firsts = np.arange(n_groups) * count
+    sizes = SUPER_HEADER + np.add.reduceat(lengths + 1, firsts)
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    starts = offsets[:-1]
+    
+    buffer = np.zeros(offsets[-1], dtype=np.uint8)
+    headers = np.zeros((n_groups, SUPER_HEADER), dtype=np.uint8)
+    headers[:, 0] = packet_type.value | (stream_id << 4)
+    headers[:, 1] = (start_seq + firsts) & 0xFF
+    headers[:, 2] = np.diff(np.append(firsts, n_packets))
+    headers[:, 3] = packet_size
+    headers[:, 4] = lengths[np.append(firsts[1:], n_packets) - 1]
+    headers[:, 5] = crc8_rows(headers[:, :5])
+    buffer[starts[:, None] + np.arange(SUPER_HEADER)] = headers
+    
+    # Subtrama i: después de la cabecera de su grupo y de las anteriores (todas completas)
+    sub_starts = starts[group] + SUPER_HEADER + (np.arange(n_packets) % count) * (packet_size + 1)
+    index = np.arange(len(payload))
+    buffer[sub_starts[index // packet_size] + index % packet_size] = payload
+    rows = np.zeros((n_packets, packet_size), dtype=np.uint8)
+    rows.ravel()[:len(payload)] = payload
+    buffer[sub_starts + lengths] = crc8_rows(rows, lengths)
+    return buffer, offsets
+
+def superframe_length(header):
+    """Bytes de la supertrama a partir de su cabecera"""
+    count, size, last = header[2], header[3], header[4]
+    return SUPER_HEADER + (count - 1) * (size + 1) + last + 1
+
+def split_superframe(packet):
+    """Subtramas de una supertrama: (seq del primero, [datos], array de bool con su CRC)"""
+    packet = np.frombuffer(bytes(packet), dtype=np.uint8)
+    count, size, last = int(packet[2]), int(packet[3]), int(packet[4])
+    lengths = np.full(count, size, dtype=np.int64)
+    lengths[-1] = last
+    starts = SUPER_HEADER + np.arange(count) * (size + 1)
+    rows = np.zeros((count, size + 1), dtype=np.uint8)
+    body = packet[SUPER_HEADER:]
+    rows.ravel()[:len(body)] = body
+    valid = crc8_rows(rows, lengths) == packet[starts + lengths]
+    return int(packet[1]), [packet[s:s + n].tobytes() for s, n in zip(starts, lengths)], valid
+
+def _frame_sums(buffer, offsets):
+    """Suma de bytes de cada paquete sin el checksum (sumas acumuladas)"""
+    acc = np.zeros(len(buffer) + 1, dtype=np.int64)
+    np.cumsum(buffer, out=acc[1:])
+    return (acc[offsets[1:] - 2] - acc[offsets[:-1]]) & 0xFFFF
+
+def _write_checksums(buffer, offsets):
+    sums = _frame_sums(buffer, offsets)
+    buffer[offsets[1:] - 2] = sums >> 8
+    buffer[offsets[1:] - 1] = sums & 0xFF
+
+def single_frame(packet):
+    """Un paquete ya armado (bytes) como (buffer, offsets)"""
+    return np.frombuffer(packet, dtype=np.uint8), np.array([0, len(packet)], dtype=np.int64)
+
+def join_frames(*parts):
+    """Concatena varios (buffer, offsets) en uno"""
+    buffers = [buffer for buffer, offsets in parts]
+    all_offsets = [np.zeros(1, dtype=np.int64)]
+    base = 0
+    for buffer, offsets in parts:
+        all_offsets.append(np.asarray(offsets[1:], dtype=np.int64) + base)
+        base += len(buffer)
+    return np.concatenate(buffers), np.concatenate(all_offsets)
+
+def select_frames(buffer, offsets, indices):
+    """Extrae un subconjunto de paquetes (p.ej. para retransmitir)"""
+    return join_frames(*[(buffer[offsets[i]:offsets[i + 1]], np.array([0, offsets[i + 1] - offsets[i]]))
+                         for i in indices])
+
+def unwrap_seq(seq, previous):
+    """Recupera la secuencia completa a partir de la de 8 bits (la más cercana a previous+1)"""
+    base = previous + 1
+    candidate = base - ((base - seq) % 256)
+    if base - candidate > 128:
+        candidate += 256
+    return candidate
+
+def seq_runs(seqs):
+    """Parte secuencias crecientes en tramos que unwrap_seq sigue sin ambigüedad.
+    
+    Dentro de un tramo cada secuencia está a lo sumo 128 de la anterior; cada
+    tramo empieza con un SYN que dice la secuencia completa del primero.
+    """
+    runs = []
+    for seq in seqs:
+        if runs and seq - runs[-1][-1] <= 128:
+            runs[-1].append(seq)
+        else:
+            runs.append([seq])
+    return runs or [[]]
+
+def split_frames(buffer, offsets):
+    """Lista de paquetes como bytes"""
+    return [buffer[offsets[i]:offsets[i + 1]].tobytes() for i in range(len(offsets) - 1)]
+
+def frames_to_symbols(buffer, offsets, bits_per_symbol):
+    """Convierte todos los paquetes a símbolos de una vez.
+    
+    Cada paquete se rellena con ceros hasta completar su último símbolo, igual que
+    bits_to_symbols. Devuelve (símbolos, symbol_offsets).
+    """
+    # Solo se desempaqueta el tramo pedido: offsets puede ser una parte del buffer
+    offsets = np.asarray(offsets, dtype=np.int64)
+    bits = np.unpackbits(np.asarray(buffer[offsets[0]:offsets[-1]], dtype=np.uint8))
+    offsets = offsets - offsets[0]
+    bit_starts = offsets[:-1] * 8
+    bit_ends = offsets[1:] * 8
+    counts = -(-(bit_ends - bit_starts) // bits_per_symbol)
+    symbol_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=symbol_offsets[1:])
+    
+    # Posición de cada símbolo dentro de su paquete
+    frame = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(symbol_offsets[-1]) - symbol_offsets[frame]
+    symbols = np.zeros(symbol_offsets[-1], dtype=np.int64)
+    for k in range(bits_per_symbol):
+        index = bit_starts[frame] + local * bits_per_symbol + k
+        inside = index < bit_ends[frame]
+        bit = np.zeros(len(index), dtype=np.int64)
+        bit[inside] = bits[index[inside]]
+        symbols = (symbols << 1) | bit
+    return symbols, symbol_offsets
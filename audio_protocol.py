@@ -1,7 +1,8 @@
 import numpy as np
 import wave
-import zlib
 from enum import Enum
+from audio_packetizer import frames_to_symbols, single_frame, frame_payload, split_frames
+from audio_codecs import ZLIB, STORED, get_codec, codec_by_name, select_codec
 
 class PacketType(Enum):
     DATA = 0
@@ -9,6 +10,7 @@ class PacketType(Enum):
     NACK = 2
     SYN = 3
     FIN = 4
+    MAP = 5
 
 class AudioProtocol:
     def __init__(self, sample_rate=44100):
@@ -26,6 +28,9 @@ class AudioProtocol:
         
         self.packet_size = 32  # bytes por paquete
         self.max_retries = 3
+        
+        # Tono de cada símbolo, precalculado (fila i = generate_tone(i))
+        self.tone_table = np.array([self.generate_tone(symbol) for symbol in self.freqs])
     
     def encode_packet(self, packet_type, seq_num, data):
         """Codifica un paquete: [tipo(1B)][seq(1B)][len(1B)][data][checksum(2B)]"""
@@ -47,7 +52,10 @@ class AudioProtocol:
         if len(packet) < 5:
             return None, None, None, False
         
-        packet_type = PacketType(packet[0])
+        try:
+            packet_type = PacketType(packet[0])
+        except ValueError:
+            return None, None, None, False
         seq_num = packet[1]
         data_len = packet[2]
         data = packet[3:3+data_len]
@@ -86,22 +94,11 @@ class AudioProtocol:
     
     def encode_to_audio(self, packet, filename):
         """Codifica paquete a audio"""
-        # Convertir a bits
-        bits = []
-        for byte in packet:
-            for i in range(8):
-                bits.append((byte >> (7-i)) & 1)
-        
-        # Convertir a símbolos
-        symbols = self.bits_to_symbols(bits)
-        
-        # Generar audio
-        audio = []
-        for symbol in symbols:
-            audio.extend(self.generate_tone(symbol))
+        # Convertir a símbolos (vectorizado) y generar audio desde la tabla de tonos
+        symbols, _ = frames_to_symbols(*single_frame(packet), 2)
+        audio = self.tone_table[symbols].ravel()
         
         # Normalizar
-        audio = np.array(audio)
         audio = (audio * 32767).astype(np.int16)
         
         # Guardar
@@ -154,43 +151,49 @@ class AudioProtocol:
         
         return bytes(packet)
     
-    def compress_data(self, data):
-        """Comprime datos con zlib"""
-        return zlib.compress(data, level=9)
+    def compress_data(self, data, codec_id=ZLIB):
+        """Comprime datos con el codec indicado (zlib por defecto)"""
+        return get_codec(codec_id).compress(data)
     
-    def decompress_data(self, data):
-        """Descomprime datos con zlib"""
-        return zlib.decompress(data)
+    def decompress_data(self, data, codec_id=ZLIB):
+        """Descomprime datos con el codec indicado (zlib por defecto)"""
+        return get_codec(codec_id).decompress(data)
     
-    def send_file(self, filename, output_prefix="tx", compress=True):
-        """Envía archivo dividido en paquetes con compresión opcional"""
+    def send_file(self, filename, output_prefix="tx", compress=True, codec=None):
+        """Envía archivo dividido en paquetes con compresión opcional.
+        
+        Sin codec se elige automáticamente el que deja menos bytes (o ninguno si
+        los datos no se pueden comprimir).
+        """
         with open(filename, 'rb') as f:
             data = f.read()
         
         original_size = len(data)
         
         # Comprimir si está habilitado
+        codec_id = STORED
         if compress:
-            data = self.compress_data(data)
-            print(f"Compresión: {original_size} → {len(data)} bytes ({100*(1-len(data)/original_size):.1f}% reducción)")
+            if codec is None:
+                codec_id, data = select_codec(data)
+            else:
+                codec_id = codec_by_name(codec).codec_id
+                data = self.compress_data(data, codec_id)
+            print(f"Compresión ({get_codec(codec_id).name}): {original_size} → {len(data)} bytes ({100*(1-len(data)/max(original_size, 1)):.1f}% reducción)")
         
-        # Dividir en paquetes
-        packets = []
-        for i in range(0, len(data), self.packet_size):
-            chunk = data[i:i+self.packet_size]
-            packets.append(chunk)
+        # Dividir en paquetes (todos armados de una vez en un buffer)
+        buffer, offsets = frame_payload(data, self.packet_size, PacketType.DATA)
+        packets = split_frames(buffer, offsets)
         
         print(f"Enviando {len(data)} bytes en {len(packets)} paquetes...")
         
-        # Enviar SYN con flag de compresión
-        syn_data = bytes([1 if compress else 0])
+        # Enviar SYN con el ID del codec (0 = sin compresión)
+        syn_data = bytes([codec_id])
         syn_packet = self.encode_packet(PacketType.SYN, 0, syn_data)
         self.encode_to_audio(syn_packet, f"{output_prefix}_syn.wav")
         print(f"✓ SYN generado: {output_prefix}_syn.wav")
         
         # Enviar paquetes de datos
-        for seq, chunk in enumerate(packets):
-            data_packet = self.encode_packet(PacketType.DATA, seq, chunk)
+        for seq, data_packet in enumerate(packets):
             self.encode_to_audio(data_packet, f"{output_prefix}_data_{seq:04d}.wav")
             print(f"✓ Paquete {seq+1}/{len(packets)}: {output_prefix}_data_{seq:04d}.wav")
         
@@ -218,9 +221,10 @@ if __name__ == '__main__':
     import sys
     
     if len(sys.argv) < 2:
-        print("Uso: python3 audio_protocol.py <archivo> [--no-compress]")
+        print("Uso: python3 audio_protocol.py <archivo> [--no-compress] [--codec=zlib-9|bz2-9|lzma-9|...]")
         sys.exit(1)
     
     compress = '--no-compress' not in sys.argv
+    codec = next((a.split('=', 1)[1] for a in sys.argv[2:] if a.startswith('--codec=')), None)
     protocol = AudioProtocol()
-    protocol.send_file(sys.argv[1], compress=compress)
+    protocol.send_file(sys.argv[1], compress=compress, codec=codec)
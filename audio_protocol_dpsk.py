@@ -0,0 +1,167 @@
+import wave
+import numpy as np
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic
+from audio_packetizer import frames_to_symbols
+
+MODES = {1: 'DBPSK', 2: 'DQPSK', 3: 'D8PSK'}
+
+class AudioProtocolDPSK(AudioProtocolUltrasonic):
+    """Modulación por desplazamiento de fase diferencial sobre una sola portadora.
+    
+    Cada símbolo es un salto de fase (código Gray) respecto del anterior, así que
+    la demodulación compara símbolos consecutivos y no necesita recuperar la fase
+    de la portadora. Mismo formato de paquete, símbolos de 4 ms y preámbulo de 4
+    símbolos que el modo ultrasónico: funciona con find_frame, FrameReader y el
+    escáner. La portadora se redondea a un número entero de ciclos por símbolo.
+    """
+    def __init__(self, sample_rate=44100, carrier=18500, bits_per_symbol=2, verbose=True):
+        if bits_per_symbol not in MODES:
+            raise ValueError(f"bits_per_symbol debe ser 1, 2 o 3 (no {bits_per_symbol})")
+        super().__init__(sample_rate, verbose=False)
+        
+        self.bits_per_symbol = bits_per_symbol
+        self.bit_rate = bits_per_symbol / self.bit_duration
+        self.order = 1 << bits_per_symbol
+        symbol_rate = 1 / self.bit_duration
+        self.carrier = int(round(carrier / symbol_rate) * symbol_rate)
+        self.profile = f"DPSK-{self.carrier}-{bits_per_symbol}"
+        self.preamble_threshold = 0.6  # correlación normalizada mínima con el preámbulo
+        
+        n = self.samples_per_bit
+        t = np.arange(n) / sample_rate
+        self.carrier_i = np.cos(2 * np.pi * self.carrier * t).astype(np.float32)
+        self.carrier_q = np.sin(2 * np.pi * self.carrier * t).astype(np.float32)
+        self.reference = np.exp(-2j * np.pi * self.carrier * t).astype(np.complex64)
+        
+        # Código Gray: símbolos vecinos en fase difieren en un solo bit
+        self.gray = np.array([i ^ (i >> 1) for i in range(self.order)])
+        self.gray_inverse = np.argsort(self.gray)
+        
+        # Preámbulo: fases 0, π, 0, π (el último es la referencia del primer dato)
+        self.preamble_phases = np.array([0, 1, 0, 1]) * (self.order // 2)
+        preamble = np.exp(1j * 2 * np.pi * np.repeat(self.preamble_phases, n) / self.order)
+        self.preamble_template = (preamble * np.exp(2j * np.pi * self.carrier * np.tile(t, 4))).astype(np.complex64)
+        
+        if verbose:
+            print(f"AudioProtocol DPSK inicializado:")
+            print(f"  Modo: {MODES[bits_per_symbol]} sobre {self.carrier} Hz")
+            print(f"  Velocidad: {self.bit_rate:.0f} bits/seg ({self.bit_rate / 8:.2f} bytes/seg)")
+            print(f"  Bits por símbolo: {bits_per_symbol}")
+    
+    def _modulate_phases(self, phases):
+        """Audio de una secuencia de fases absolutas (en pasos de 2π/orden)"""
+        angle = 2 * np.pi * np.asarray(phases) / self.order
+        # cos(ωt + φ) = cos(ωt)·cos(φ) - sin(ωt)·sin(φ), para todos los símbolos a la vez
+        audio = np.outer(np.cos(angle), self.carrier_i) - np.outer(np.sin(angle), self.carrier_q)
+        return audio.astype(np.float32).ravel()
+    
+    def generate_preamble(self):
+        """Genera preámbulo de sincronización (fases 0, π, 0, π)"""
+        return self._modulate_phases(self.preamble_phases)
+    
+    def modulate_frames(self, buffer, offsets):
+        """Genera el audio de varios paquetes (buffer/offsets de audio_packetizer) de una vez.
+        
+        Devuelve (audio float32, sample_offsets) como en el modo ultrasónico.
+        """
+        symbols, symbol_offsets = frames_to_symbols(buffer, offsets, self.bits_per_symbol)
+        
+        # Fase absoluta = fase del último símbolo del preámbulo + saltos acumulados del paquete
+        steps = self.gray[symbols]
+        accumulated = np.concatenate(([0], np.cumsum(steps)))
+        frame = np.repeat(np.arange(len(symbol_offsets) - 1), np.diff(symbol_offsets))
+        phases = (self.preamble_phases[-1] + accumulated[1:] - accumulated[symbol_offsets[frame]]) % self.order
+        
+        # Insertar el preámbulo delante de cada paquete
+        n_frames = len(symbol_offsets) - 1
+        counts = np.diff(symbol_offsets) + 4
+        frame_starts = np.zeros(n_frames + 1, dtype=np.int64)
+        np.cumsum(counts, out=frame_starts[1:])
+        stream = np.empty(frame_starts[-1], dtype=np.int64)
+        data_positions = np.ones(len(stream), dtype=bool)
+        for i, phase in enumerate(self.preamble_phases):
+            stream[frame_starts[:-1] + i] = phase
+            data_positions[frame_starts[:-1] + i] = False
+        stream[data_positions] = phases
+        
+        return self._modulate_phases(stream), frame_starts * self.samples_per_bit
+    
+    def detect_symbols(self, audio):
+        """Demodulación diferencial de bloques consecutivos (vectorizado).
+        
+        El primer bloque es la referencia: devuelve un símbolo menos que bloques.
+        """
+        n = self.samples_per_bit
+        n_blocks = len(audio) // n
+        if n_blocks < 2:
+            return np.zeros(0, dtype=np.int64)
+        blocks = np.asarray(audio[:n_blocks * n], dtype=np.float32).reshape(n_blocks, n)
+        
+        # Componente compleja de la portadora en cada bloque; el salto de fase es
+        # el ángulo de z[k]·conj(z[k-1]), independiente de la fase de la portadora
+        z = blocks @ self.reference
+        steps = np.round(np.angle(z[1:] * np.conj(z[:-1])) * self.order / (2 * np.pi)).astype(np.int64) % self.order
+        return self.gray_inverse[steps]
+    
+    def demodulate(self, audio, start, n_symbols):
+        """Símbolos de n_symbols bloques desde audio[start], con el bloque anterior como referencia"""
+        n = self.samples_per_bit
+        segment = audio[max(start - n, 0):start + n_symbols * n]
+        if len(segment) < (n_symbols + 1) * n:
+            segment = np.concatenate([segment, np.zeros((n_symbols + 1) * n - len(segment), dtype=segment.dtype)])
+        return self.detect_symbols(segment)
+    
+    def sliding_energies(self, audio):
+        """Correlación normalizada (0-1) con el preámbulo para cada posición de inicio.
+        
+        La magnitud de la correlación compleja no depende de la fase con que llega
+        la portadora. Se calcula con FFT, lineal-logarítmico en la longitud.
+        """
+        m = len(self.preamble_template)
+        audio = np.asarray(audio, dtype=np.float64)
+        if len(audio) < m:
+            return np.zeros(0)
+        size = 1 << int(np.ceil(np.log2(len(audio) + m)))
+        spectrum = np.fft.fft(audio, size) * np.fft.fft(np.conj(self.preamble_template[::-1]), size)
+        correlation = np.abs(np.fft.ifft(spectrum)[m - 1:len(audio)])
+        
+        power = np.concatenate(([0], np.cumsum(audio ** 2)))
+        window = power[m:] - power[:-m]
+        return correlation / np.sqrt(window * m / 2 + 1e-9)
+    
+    def find_preambles(self, audio, energies=None):
+        """Devuelve las posiciones (muestra) donde empieza un preámbulo"""
+        n = self.samples_per_bit
+        score = energies if energies is not None else self.sliding_energies(audio)
+        positions = np.flatnonzero(score > self.preamble_threshold)
+        if len(positions) == 0:
+            return []
+        breaks = np.flatnonzero(np.diff(positions) > n // 4) + 1
+        return [int(run[np.argmax(score[run])]) for run in np.split(positions, breaks)]
+    
+    def decode_from_audio(self, filename):
+        """Decodifica un WAV con un paquete DPSK"""
+        with wave.open(filename, 'r') as wav:
+            frames = wav.readframes(wav.getnframes())
+            audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32767.0
+        
+        packet, _, _ = self.find_frame(audio)
+        if packet is not None:
+            return packet
+        # Sin checksum válido: lo que haya después de un preámbulo al principio
+        n = self.samples_per_bit
+        return self.symbols_to_bytes(self.demodulate(audio, 4 * n, len(audio) // n - 4))
+
+if __name__ == '__main__':
+    import sys
+    
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) < 1:
+        print("Uso: python3 audio_protocol_dpsk.py <archivo> [--bits=1|2|3] [--carrier=18500] [--no-compress] [--codec=...]")
+        sys.exit(1)
+    
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    protocol = AudioProtocolDPSK(carrier=float(options.get('carrier', 18500)),
+                                 bits_per_symbol=int(options.get('bits', 2)))
+    protocol.send_file(args[0], output_prefix="tx_dpsk", compress='--no-compress' not in sys.argv,
+                       codec=options.get('codec'))
@@ -1,7 +1,9 @@
 import numpy as np
 import wave
-import zlib
 from enum import Enum
+from audio_packetizer import (frames_to_symbols, single_frame, frame_payload, split_frames, SUPER_HEADER,
+                              MAX_SUPERFRAME, crc8_rows, superframe_length, split_superframe)
+from audio_codecs import ZLIB, STORED, get_codec, codec_by_name, select_codec
 
 class PacketType(Enum):
     DATA = 0
@@ -9,34 +11,109 @@ class PacketType(Enum):
     NACK = 2
     SYN = 3
     FIN = 4
+    MAP = 5
+    SUPER = 6  # supertrama: varios paquetes DATA con un solo preámbulo (ver audio_packetizer)
+
+# Multiplexado: el ID de stream va en los 4 bits altos del byte de tipo
+MAX_STREAMS = 16
+
+# Flags del SYN (byte después de la sesión)
+SYN_FLAG_SOUNDING = 0x01
+SYN_FLAG_PROFILE = 0x02  # después de los flags va el ID del perfil de los datos
+# Al final van 3 bytes con la secuencia completa del primer DATA que sigue y 3 con
+# el total de paquetes (retransmisiones: los DATA no son 0, 1, 2...)
+SYN_FLAG_SEQ = 0x04
+
+# NACKs por paquete de retorno (2 bytes cada uno)
+MAX_NACKS = 16
+
+def parse_syn(data):
+    """Campos de los datos de un SYN: codec, filename, session, flags, profile, base y total.
+    
+    Los que el SYN no trae quedan en su valor por defecto (base 0, total None).
+    """
+    data = bytes(data)
+    name_len = data[1] if len(data) > 1 else 0
+    at = 2 + name_len
+    syn = {'codec': data[0] if len(data) > 0 else STORED,
+           'filename': data[2:at].decode('utf-8', errors='ignore'),
+           'session': int.from_bytes(data[at:at + 4], 'big') if len(data) >= at + 4 else 0,
+           'flags': data[at + 4] if len(data) > at + 4 else 0,
+           'profile': 0, 'base': 0, 'total': None}
+    at += 5
+    if syn['flags'] & SYN_FLAG_PROFILE and len(data) > at:
+        syn['profile'] = data[at]
+        at += 1
+    if syn['flags'] & SYN_FLAG_SEQ and len(data) >= at + 6:
+        syn['base'] = int.from_bytes(data[at:at + 3], 'big')
+        syn['total'] = int.from_bytes(data[at + 3:at + 6], 'big')
+    return syn
+
+# Perfiles por frecuencia de muestreo del módem. El ID (posición en la lista) va
+# en el SYN; '44k' es el de por defecto y el que todos los receptores entienden.
+PROFILES = [
+    ('44k', {'sample_rate': 44100}),
+    # Mismos tonos sin que el sistema remuestree (interfaces USB a 48 kHz)
+    ('48k', {'sample_rate': 48000}),
+    # Sobre 20 kHz: 16 tonos (4 bits/símbolo) de 20 a 27.5 kHz, 1000 bits/seg
+    ('96k', {'sample_rate': 96000, 'base_freq': 20000, 'bits_per_symbol': 4, 'spacing': 500}),
+]
+
+def profile_id(name):
+    """ID de un perfil por nombre (ValueError si no existe)"""
+    for i, (profile, _) in enumerate(PROFILES):
+        if profile == name:
+            return i
+    raise ValueError(f"Perfil desconocido: {name} (disponibles: {', '.join(p for p, _ in PROFILES)})")
 
 class AudioProtocolUltrasonic:
-    def __init__(self, sample_rate=44100):
+    def __init__(self, sample_rate=44100, base_freq=17000, bits_per_symbol=3, spacing=485, verbose=True):
         self.sample_rate = sample_rate
         self.bit_duration = 0.004  # 4ms por símbolo = 250 símbolos/seg
         self.samples_per_bit = int(sample_rate * self.bit_duration)
         
-        # 8 frecuencias ultrasónicas (17-20.4 kHz, espaciadas cada 485 Hz)
-        # 8 frecuencias = 3 bits por símbolo
+        # Por defecto 8 frecuencias ultrasónicas (17-20.4 kHz, espaciadas cada 485 Hz)
+        # 8 frecuencias = 3 bits por símbolo. Otra base_freq da una banda separada
+        # (p.ej. el canal de retorno del modo ARQ)
+        self.bits_per_symbol = bits_per_symbol
         self.freqs = {}
-        base_freq = 17000
-        for i in range(8):
-            self.freqs[i] = base_freq + (i * 485)
+        for i in range(1 << bits_per_symbol):
+            self.freqs[i] = base_freq + (i * spacing)
+        self.top = len(self.freqs) - 1  # símbolo de la frecuencia más alta (preámbulo)
         
         # 3 bits/símbolo * 250 símbolos/seg = 750 bits/seg = 93.75 bytes/seg
+        self.bit_rate = bits_per_symbol / self.bit_duration
         
         self.packet_size = 64  # bytes por paquete (aumentado)
         self.max_retries = 3
         
-        print(f"AudioProtocol Ultrasónico inicializado:")
-        print(f"  Rango de frecuencias: {self.freqs[0]}-{self.freqs[7]} Hz")
-        print(f"  Velocidad: 750 bits/seg (93.75 bytes/seg)")
-        print(f"  Bits por símbolo: 3")
+        # Tonos candidatos para el sondeo del canal (los de por defecto son los índices 2 en adelante)
+        self.candidate_freqs = [base_freq + (i - 2) * spacing for i in range(len(self.freqs) + 4)]
+        self.sounding_slots = 4  # símbolos por tono candidato (y de silencio al final)
+        if self.candidate_freqs[-1] >= sample_rate / 2:
+            raise ValueError(f"Tonos hasta {self.candidate_freqs[-1]} Hz: no entran a {sample_rate} Hz")
+        
+        self._build_tables(np.ones(len(self.freqs)))
+        
+        if verbose:
+            print(f"AudioProtocol Ultrasónico inicializado:")
+            print(f"  Rango de frecuencias: {self.freqs[0]}-{self.freqs[self.top]} Hz")
+            print(f"  Velocidad: {self.bit_rate:.0f} bits/seg ({self.bit_rate / 8:.2f} bytes/seg)")
+            print(f"  Bits por símbolo: {bits_per_symbol}")
+    
+    @classmethod
+    def from_profile(cls, name, verbose=True):
+        """Protocolo de un perfil de PROFILES (por nombre)"""
+        protocol = cls(verbose=verbose, **PROFILES[profile_id(name)][1])
+        protocol.profile = name
+        return protocol
     
-    def encode_packet(self, packet_type, seq_num, data):
-        """Codifica un paquete: [tipo(1B)][seq(1B)][len(1B)][data][checksum(2B)]"""
+    def encode_packet(self, packet_type, seq_num, data, stream_id=0):
+        """Codifica un paquete: [stream(4b)|tipo(4b)][seq(1B)][len(1B)][data][checksum(2B)]"""
+        if not 0 <= stream_id < MAX_STREAMS:
+            raise ValueError(f"ID de stream inválido: {stream_id}")
         packet = bytearray()
-        packet.append(packet_type.value)
+        packet.append(packet_type.value | (stream_id << 4))
         packet.append(seq_num & 0xFF)
         packet.append(len(data) & 0xFF)
         packet.extend(data)
@@ -53,7 +130,15 @@ class AudioProtocolUltrasonic:
         if len(packet) < 5:
             return None, None, None, False
         
-        packet_type = PacketType(packet[0])
+        try:
+            packet_type = PacketType(packet[0] & 0x0F)
+        except ValueError:
+            return None, None, None, False
+        if packet_type == PacketType.SUPER:
+            # Solo se verifica la cabecera: cada subtrama lleva su CRC (expand_frame)
+            valid = (len(packet) >= SUPER_HEADER and self._super_header_valid(packet)
+                     and len(packet) == superframe_length(packet))
+            return packet_type, packet[1], packet[SUPER_HEADER:], valid
         seq_num = packet[1]
         data_len = packet[2]
         data = packet[3:3+data_len]
@@ -65,12 +150,60 @@ class AudioProtocolUltrasonic:
         valid = received_checksum == calculated_checksum
         return packet_type, seq_num, data, valid
     
+    def _super_header_valid(self, header):
+        return header[2] > 0 and crc8_rows(np.frombuffer(bytes(header[:5]), dtype=np.uint8)[None])[0] == header[5]
+    
+    def expand_frame(self, packet):
+        """Paquetes DATA de una supertrama (solo las subtramas con CRC correcto); otro paquete, tal cual"""
+        if packet[0] & 0x0F != PacketType.SUPER.value:
+            return [packet]
+        stream_id = self.packet_stream_id(packet)
+        first, datas, valid = split_superframe(packet)
+        return [self.encode_packet(PacketType.DATA, (first + i) & 0xFF, data, stream_id)
+                for i, (data, ok) in enumerate(zip(datas, valid)) if ok]
+    
+    def header_size(self, header):
+        """Bytes de cabecera según el tipo (la de una supertrama es más larga)"""
+        return SUPER_HEADER if header[0] & 0x0F == PacketType.SUPER.value else 3
+    
+    def length_possible(self, header):
+        """False si ningún emisor arma un paquete de ese tipo con ese largo (cabecera de ruido)"""
+        packet_type, length = header[0] & 0x0F, header[2]
+        if packet_type == PacketType.DATA.value:
+            return length <= self.packet_size
+        if packet_type == PacketType.FIN.value:
+            return length == 0
+        if packet_type == PacketType.ACK.value:
+            return length in (0, 3)  # sin datos o acumulado + flags (ARQ)
+        if packet_type == PacketType.NACK.value:
+            return length % 2 == 0 and length <= 2 * MAX_NACKS
+        if packet_type == PacketType.MAP.value:
+            return length % 2 == 1 and length <= 1 + 2 * len(self.candidate_freqs)
+        if packet_type == PacketType.SYN.value:
+            return length >= 6  # codec, largo del nombre y sesión
+        return True  # supertrama: la valida su CRC-8
+    
+    def frame_length(self, header):
+        """Bytes del paquete completo a partir de su cabecera"""
+        if header[0] & 0x0F == PacketType.SUPER.value:
+            return superframe_length(header)
+        return 3 + header[2] + 2
+    
+    def max_frame_samples(self):
+        """Muestras del paquete más largo (preámbulo incluido): 255 bytes de datos o una supertrama"""
+        longest = max(3 + 255 + 2, SUPER_HEADER + MAX_SUPERFRAME * (self.packet_size + 1))
+        return (4 + self.frame_symbols(longest)) * self.samples_per_bit
+    
+    def packet_stream_id(self, packet):
+        """ID de stream de un paquete (0 si no se usa multiplexado)"""
+        return packet[0] >> 4
+    
     def bits_to_symbols(self, bits):
-        """Convierte bits a símbolos de 3 bits"""
+        """Convierte bits a símbolos de bits_per_symbol bits"""
         symbols = []
-        for i in range(0, len(bits), 3):
+        for i in range(0, len(bits), self.bits_per_symbol):
             symbol = 0
-            for j in range(3):
+            for j in range(self.bits_per_symbol):
                 if i+j < len(bits):
                     symbol = (symbol << 1) | bits[i+j]
                 else:
@@ -82,13 +215,33 @@ class AudioProtocolUltrasonic:
         """Convierte símbolos a bits"""
         bits = []
         for symbol in symbols:
-            for i in range(2, -1, -1):
+            for i in range(self.bits_per_symbol - 1, -1, -1):
                 bits.append((symbol >> i) & 1)
         return bits
     
+    def _build_tables(self, weights):
+        """Reconstruye las tablas que dependen de los tonos (tras cambiar self.freqs)"""
+        # Tablas DFT por tamaño de bloque (cache para detect_symbols)
+        self._goertzel_tables = {}
+        
+        # Ecualización en recepción: peso de la energía de cada tono
+        self.tone_weights = np.asarray(weights, dtype=np.float64)
+        
+        # Tono de cada símbolo, precalculado (fila i = generate_tone(i))
+        self.tone_table = np.array([self.generate_tone(symbol) for symbol in self.freqs], dtype=np.float32)
+    
+    def set_tone_map(self, freqs, weights=None):
+        """Usa otro juego de tonos (mismo número de símbolos) y, opcionalmente, pesos por tono"""
+        if len(freqs) != len(self.freqs):
+            raise ValueError(f"Se esperaban {len(self.freqs)} tonos, hay {len(freqs)}")
+        self.freqs = {i: f for i, f in enumerate(freqs)}
+        self._build_tables(np.ones(len(freqs)) if weights is None else weights)
+    
     def generate_tone(self, symbol):
         """Genera tono ultrasónico para un símbolo"""
-        freq = self.freqs[symbol]
+        return self._tone_at(self.freqs[symbol])
+    
+    def _tone_at(self, freq):
         t = np.linspace(0, self.bit_duration, self.samples_per_bit, False)
         # Sin ventana para mejor detección
         tone = np.sin(2 * np.pi * freq * t)
@@ -96,32 +249,41 @@ class AudioProtocolUltrasonic:
     
     def generate_preamble(self):
         """Genera preámbulo de sincronización (patrón conocido)"""
-        # Patrón: 0, 7, 0, 7 (frecuencias extremas para sincronización)
+        # Patrón: 0, top, 0, top (frecuencias extremas para sincronización; 0, 7, 0, 7 con 8 tonos)
         preamble = []
-        for symbol in [0, 7, 0, 7]:
+        for symbol in [0, self.top, 0, self.top]:
             preamble.extend(self.generate_tone(symbol))
         return np.array(preamble)
     
-    def encode_to_audio(self, packet, filename):
-        """Codifica paquete a audio ultrasónico con preámbulo"""
-        # Generar preámbulo
-        audio = list(self.generate_preamble())
+    def modulate_frames(self, buffer, offsets):
+        """Genera el audio de varios paquetes (buffer/offsets de audio_packetizer) de una vez.
         
-        # Convertir a bits
-        bits = []
-        for byte in packet:
-            for i in range(8):
-                bits.append((byte >> (7-i)) & 1)
+        Cada paquete lleva su preámbulo. Devuelve (audio float32, sample_offsets) donde
+        audio[sample_offsets[i]:sample_offsets[i+1]] es el paquete i.
+        """
+        symbols, symbol_offsets = frames_to_symbols(buffer, offsets, self.bits_per_symbol)
         
-        # Convertir a símbolos
-        symbols = self.bits_to_symbols(bits)
+        # Insertar el preámbulo 0,top,0,top delante de cada paquete
+        n_frames = len(symbol_offsets) - 1
+        counts = np.diff(symbol_offsets) + 4
+        frame_starts = np.zeros(n_frames + 1, dtype=np.int64)
+        np.cumsum(counts, out=frame_starts[1:])
+        stream = np.empty(frame_starts[-1], dtype=np.int64)
+        for i, symbol in enumerate([0, self.top, 0, self.top]):
+            stream[frame_starts[:-1] + i] = symbol
+        data_positions = np.ones(len(stream), dtype=bool)
+        for i in range(4):
+            data_positions[frame_starts[:-1] + i] = False
+        stream[data_positions] = symbols
         
-        # Generar audio de datos
-        for symbol in symbols:
-            audio.extend(self.generate_tone(symbol))
+        audio = self.tone_table[stream].ravel()
+        return audio, frame_starts * self.samples_per_bit
+    
+    def encode_to_audio(self, packet, filename):
+        """Codifica paquete a audio ultrasónico con preámbulo"""
+        audio, _ = self.modulate_frames(*single_frame(packet))
         
         # Normalizar
-        audio = np.array(audio)
         audio = (audio * 32767 * 0.9).astype(np.int16)
         
         # Guardar
@@ -131,6 +293,212 @@ class AudioProtocolUltrasonic:
             wav.setframerate(self.sample_rate)
             wav.writeframes(audio.tobytes())
     
+    def _goertzel_table(self, n):
+        """Tabla DFT equivalente a Goertzel (una columna por tono) para bloques de n muestras"""
+        table = self._goertzel_tables.get(n)
+        if table is None:
+            ks = [int(0.5 + (n * f) / self.sample_rate) for f in self.freqs.values()]
+            table = np.exp(-2j * np.pi * np.outer(np.arange(n), ks) / n).astype(np.complex64)
+            self._goertzel_tables[n] = table
+        return table
+    
+    def detect_symbols(self, audio):
+        """Detecta los símbolos de bloques consecutivos de samples_per_bit muestras (vectorizado)"""
+        n_symbols = len(audio) // self.samples_per_bit
+        if n_symbols == 0:
+            return np.zeros(0, dtype=np.int64)
+        blocks = np.asarray(audio[:n_symbols * self.samples_per_bit], dtype=np.float32)
+        blocks = blocks.reshape(n_symbols, self.samples_per_bit)
+        
+        # Misma energía que Goertzel en el bin k de cada tono, para todos los bloques a la vez
+        energy = np.abs(blocks @ self._goertzel_table(self.samples_per_bit)) ** 2
+        return np.argmax(energy * self.tone_weights, axis=1)
+    
+    def symbols_to_bytes(self, symbols):
+        """Convierte símbolos a bytes (vectorizado; descarta los bits de relleno)"""
+        symbols = np.asarray(symbols, dtype=np.uint8)
+        shifts = np.arange(self.bits_per_symbol - 1, -1, -1, dtype=np.uint8)
+        bits = ((symbols[:, None] >> shifts) & 1).ravel()
+        return np.packbits(bits[:len(bits) // 8 * 8]).tobytes()
+    
+    def frame_symbols(self, n_bytes):
+        """Número de símbolos que ocupa un paquete de n_bytes (sin preámbulo)"""
+        return -(-n_bytes * 8 // self.bits_per_symbol)
+    
+    def sliding_energies(self, audio):
+        """Energía de cada tono para una ventana de samples_per_bit que empieza en cada muestra.
+        
+        Usa sumas acumuladas de x[n]·e^(-jωn): |C[p+N] - C[p]| es la magnitud de
+        Goertzel de la ventana en p, así el costo es lineal en la longitud del audio.
+        """
+        n = self.samples_per_bit
+        audio = np.asarray(audio, dtype=np.float64)
+        if len(audio) < n:
+            return np.zeros((0, len(self.freqs)))
+        t = np.arange(len(audio))
+        energies = np.empty((len(audio) - n + 1, len(self.freqs)))
+        for i, f in enumerate(self.freqs.values()):
+            k = int(0.5 + (n * f) / self.sample_rate)
+            acc = np.concatenate(([0], np.cumsum(audio * np.exp(-2j * np.pi * k * t / n))))
+            energies[:, i] = np.abs(acc[n:] - acc[:-n]) ** 2 * self.tone_weights[i]
+        return energies
+    
+    def find_preambles(self, audio, energies=None):
+        """Devuelve las posiciones (muestra) donde empieza un preámbulo 0,top,0,top"""
+        n = self.samples_per_bit
+        if energies is None:
+            energies = self.sliding_energies(audio)
+        if len(energies) <= 3 * n:
+            return []
+        symbols = np.argmax(energies, axis=1)
+        span = len(energies) - 3 * n
+        top = self.top
+        match = ((symbols[:span] == 0) & (symbols[n:n + span] == top) &
+                 (symbols[2 * n:2 * n + span] == 0) & (symbols[3 * n:3 * n + span] == top))
+        if not match.any():
+            return []
+        
+        # Fracción de energía en el tono esperado: elegir la mejor alineación de cada racha
+        total = energies.sum(axis=1) + 1e-12
+        purity = energies[:, 0] / total
+        purity_hi = energies[:, top] / total
+        score = purity[:span] + purity_hi[n:n + span] + purity[2 * n:2 * n + span] + purity_hi[3 * n:3 * n + span]
+        
+        positions = np.flatnonzero(match)
+        # Con ruido una racha puede cortarse: huecos cortos no separan rachas
+        breaks = np.flatnonzero(np.diff(positions) > n // 4) + 1
+        starts = []
+        for run in np.split(positions, breaks):
+            starts.append(int(run[np.argmax(score[run])]))
+        return starts
+    
+    def demodulate(self, audio, start, n_symbols):
+        """Símbolos de n_symbols bloques desde audio[start] (rellena con ceros si falta el final)"""
+        n = self.samples_per_bit
+        segment = audio[start:start + n_symbols * n]
+        if len(segment) < n_symbols * n:
+            segment = np.concatenate([segment, np.zeros(n_symbols * n - len(segment), dtype=segment.dtype)])
+        return self.detect_symbols(segment)
+    
+    def frame_header(self, audio, start):
+        """Cabecera (tipo, seq, largo) del paquete en audio[start], o None si no es válida.
+        
+        La de una supertrama sigue 3 bytes más, con su CRC-8; si ese resto todavía
+        no llegó devuelve solo los 3 primeros (menos que header_size).
+        """
+        n = self.samples_per_bit
+        header_symbols = self.frame_symbols(3)
+        if start + header_symbols * n > len(audio):
+            return None
+        header = self.symbols_to_bytes(self.demodulate(audio, start, header_symbols))
+        if header[0] & 0x0F not in [t.value for t in PacketType] or not self.length_possible(header):
+            return None
+        if header[0] & 0x0F == PacketType.SUPER.value:
+            super_symbols = self.frame_symbols(SUPER_HEADER)
+            if start + super_symbols * n > len(audio):
+                return header
+            header += self.symbols_to_bytes(self.demodulate(audio, start + header_symbols * n,
+                                                            super_symbols - header_symbols))
+            if not self._super_header_valid(header):
+                return None
+        return header
+    
+    def decode_frame(self, audio, start, header=None):
+        """Decodifica el paquete cuyo primer símbolo de datos empieza en audio[start].
+        
+        Demodula primero la cabecera (tipo, seq, largo; o usa la ya leída con
+        frame_header) y con ella el largo exacto del paquete. Devuelve (paquete,
+        símbolos), o (None, 0) si la cabecera no es válida o falta audio. El
+        checksum lo verifica decode_packet.
+        """
+        n = self.samples_per_bit
+        if header is None:
+            header = self.frame_header(audio, start)
+        if header is None or len(header) < self.header_size(header):
+            return None, 0
+        
+        # Al final de la grabación el último símbolo puede quedar corto por unas muestras
+        length = self.frame_length(header)
+        n_symbols = self.frame_symbols(length)
+        if start + n_symbols * n - len(audio) > n // 8:
+            return None, 0
+        
+        # La cabecera ocupa símbolos enteros: se demodula solo el resto, en una pasada
+        # (una supertrama entera de una vez)
+        header_symbols = self.frame_symbols(len(header))
+        rest = self.demodulate(audio, start + header_symbols * n, n_symbols - header_symbols)
+        packet = bytes(header) + self.symbols_to_bytes(rest)
+        return packet[:length], n_symbols
+    
+    def find_frame(self, audio, start=0):
+        """Busca el primer paquete válido desde audio[start:].
+        
+        Devuelve (paquete, inicio_preámbulo, fin) en muestras, o (None, None, None).
+        """
+        n = self.samples_per_bit
+        region = audio[start:]
+        for position in self.find_preambles(region):
+            packet, n_symbols = self.decode_frame(region, position + 4 * n)
+            if packet is not None and self.decode_packet(packet)[3]:
+                return packet, start + position, start + position + (4 + n_symbols) * n
+        return None, None, None
+    
+    def generate_sounding(self):
+        """Barrido de sondeo: preámbulo, cada tono candidato y un tramo de silencio"""
+        slot = self.sounding_slots * self.samples_per_bit
+        parts = [self.generate_preamble()]
+        for freq in self.candidate_freqs:
+            parts.append(np.tile(self._tone_at(freq), self.sounding_slots))
+        parts.append(np.zeros(slot))
+        return np.concatenate(parts)
+    
+    def sounding_length(self):
+        """Muestras del barrido después del preámbulo"""
+        return (len(self.candidate_freqs) + 1) * self.sounding_slots * self.samples_per_bit
+    
+    def measure_sounding(self, audio):
+        """Mide SNR y respuesta de cada tono candidato en un barrido recibido.
+        
+        audio empieza después del preámbulo. Devuelve (snr, respuesta) por candidato;
+        el ruido es la energía en cada frecuencia durante el tramo de silencio.
+        """
+        n = self.samples_per_bit
+        slot = self.sounding_slots * n
+        ks = [int(0.5 + (n * f) / self.sample_rate) for f in self.candidate_freqs]
+        table = np.exp(-2j * np.pi * np.outer(np.arange(n), ks) / n)
+        
+        def band_power(segment):
+            blocks = segment[:slot].reshape(self.sounding_slots, n)
+            return (np.abs(blocks @ table) ** 2).mean(axis=0)
+        
+        noise = band_power(audio[len(self.candidate_freqs) * slot:]) + 1e-9
+        signal = np.array([band_power(audio[i * slot:(i + 1) * slot])[i]
+                           for i in range(len(self.candidate_freqs))])
+        snr = signal / noise
+        response = np.sqrt(signal / signal.max())
+        return snr, response
+    
+    def choose_tone_map(self, snr, response):
+        """Elige los mejores tonos candidatos; devuelve (índices, pesos de ecualización)"""
+        best = np.sort(np.argsort(snr)[::-1][:len(self.freqs)])
+        
+        # Igualar el nivel recibido de los tonos elegidos (pesos <= 1, mínimo 1/16)
+        gains = response[best] ** 2
+        weights = np.clip(gains.min() / np.maximum(gains, 1e-12), 1 / 16, 1)
+        return [int(i) for i in best], weights
+    
+    def encode_tone_map(self, indices, weights):
+        """Datos del paquete MAP: [n][índices de candidatos][pesos * 255]"""
+        return (bytes([len(indices)]) + bytes(indices) +
+                bytes(int(round(w * 255)) for w in weights))
+    
+    def apply_tone_map(self, data):
+        """Aplica un mapa recibido en un paquete MAP"""
+        count = data[0]
+        indices = list(data[1:1 + count])
+        weights = [w / 255 for w in data[1 + count:1 + 2 * count]]
+        self.set_tone_map([self.candidate_freqs[i] for i in indices], weights)
+    
     def decode_from_audio(self, filename):
         """Decodifica audio ultrasónico a paquete con detección de preámbulo"""
         # Leer audio
@@ -142,42 +510,8 @@ class AudioProtocolUltrasonic:
         preamble_samples = 4 * self.samples_per_bit
         audio = audio[preamble_samples:]
         
-        # Decodificar símbolos usando Goertzel algorithm (más eficiente que FFT)
-        symbols = []
-        for i in range(0, len(audio), self.samples_per_bit):
-            chunk = audio[i:i+self.samples_per_bit]
-            if len(chunk) < self.samples_per_bit:
-                break
-            
-            # Calcular energía para cada frecuencia usando Goertzel
-            max_energy = 0
-            detected_symbol = 0
-            
-            for symbol, target_freq in self.freqs.items():
-                # Goertzel algorithm
-                k = int(0.5 + (len(chunk) * target_freq) / self.sample_rate)
-                omega = (2.0 * np.pi * k) / len(chunk)
-                coeff = 2.0 * np.cos(omega)
-                
-                q0 = 0.0
-                q1 = 0.0
-                q2 = 0.0
-                
-                for sample in chunk:
-                    q0 = coeff * q1 - q2 + sample
-                    q2 = q1
-                    q1 = q0
-                
-                # Calcular magnitud
-                real = q1 - q2 * np.cos(omega)
-                imag = q2 * np.sin(omega)
-                energy = real * real + imag * imag
-                
-                if energy > max_energy:
-                    max_energy = energy
-                    detected_symbol = symbol
-            
-            symbols.append(detected_symbol)
+        # Decodificar símbolos usando Goertzel (vectorizado sobre todos los bloques)
+        symbols = self.detect_symbols(audio).tolist()
         
         # Convertir a bits
         bits = self.symbols_to_bits(symbols)
@@ -193,43 +527,49 @@ class AudioProtocolUltrasonic:
         
         return bytes(packet)
     
-    def compress_data(self, data):
-        """Comprime datos con zlib"""
-        return zlib.compress(data, level=9)
+    def compress_data(self, data, codec_id=ZLIB):
+        """Comprime datos con el codec indicado (zlib por defecto)"""
+        return get_codec(codec_id).compress(data)
     
-    def decompress_data(self, data):
-        """Descomprime datos con zlib"""
-        return zlib.decompress(data)
+    def decompress_data(self, data, codec_id=ZLIB):
+        """Descomprime datos con el codec indicado (zlib por defecto)"""
+        return get_codec(codec_id).decompress(data)
     
-    def send_file(self, filename, output_prefix="tx_ultra", compress=True):
-        """Envía archivo dividido en paquetes con compresión opcional"""
+    def send_file(self, filename, output_prefix="tx_ultra", compress=True, codec=None):
+        """Envía archivo dividido en paquetes con compresión opcional.
+        
+        Sin codec se elige automáticamente el que deja menos bytes (o ninguno si
+        los datos no se pueden comprimir).
+        """
         with open(filename, 'rb') as f:
             data = f.read()
         
         original_size = len(data)
         
         # Comprimir si está habilitado
+        codec_id = STORED
         if compress:
-            data = self.compress_data(data)
-            print(f"Compresión: {original_size} → {len(data)} bytes ({100*(1-len(data)/original_size):.1f}% reducción)")
+            if codec is None:
+                codec_id, data = select_codec(data)
+            else:
+                codec_id = codec_by_name(codec).codec_id
+                data = self.compress_data(data, codec_id)
+            print(f"Compresión ({get_codec(codec_id).name}): {original_size} → {len(data)} bytes ({100*(1-len(data)/max(original_size, 1)):.1f}% reducción)")
         
-        # Dividir en paquetes
-        packets = []
-        for i in range(0, len(data), self.packet_size):
-            chunk = data[i:i+self.packet_size]
-            packets.append(chunk)
+        # Dividir en paquetes (todos armados de una vez en un buffer)
+        buffer, offsets = frame_payload(data, self.packet_size, PacketType.DATA)
+        packets = split_frames(buffer, offsets)
         
         print(f"Enviando {len(data)} bytes en {len(packets)} paquetes...")
         
-        # Enviar SYN con flag de compresión
-        syn_data = bytes([1 if compress else 0])
+        # Enviar SYN con el ID del codec (0 = sin compresión)
+        syn_data = bytes([codec_id])
         syn_packet = self.encode_packet(PacketType.SYN, 0, syn_data)
         self.encode_to_audio(syn_packet, f"{output_prefix}_syn.wav")
         print(f"✓ SYN generado: {output_prefix}_syn.wav")
         
         # Enviar paquetes de datos
-        for seq, chunk in enumerate(packets):
-            data_packet = self.encode_packet(PacketType.DATA, seq, chunk)
+        for seq, data_packet in enumerate(packets):
             self.encode_to_audio(data_packet, f"{output_prefix}_data_{seq:04d}.wav")
             print(f"✓ Paquete {seq+1}/{len(packets)}: {output_prefix}_data_{seq:04d}.wav")
         
@@ -239,9 +579,9 @@ class AudioProtocolUltrasonic:
         print(f"✓ FIN generado: {output_prefix}_fin.wav")
         
         # Calcular tiempo estimado
-        total_bytes = sum(len(self.encode_packet(PacketType.DATA, i, p)) for i, p in enumerate(packets))
+        total_bytes = len(buffer)
         total_bytes += len(syn_packet) + len(fin_packet)
-        estimated_time = (total_bytes * 8) / 750  # 750 bits/seg
+        estimated_time = (total_bytes * 8) / self.bit_rate
         print(f"\n⏱ Tiempo estimado de transmisión: {estimated_time:.1f} segundos")
         
         return len(packets)
@@ -257,9 +597,10 @@ if __name__ == '__main__':
     import sys
     
     if len(sys.argv) < 2:
-        print("Uso: python3 audio_protocol_ultrasonic.py <archivo> [--no-compress]")
+        print("Uso: python3 audio_protocol_ultrasonic.py <archivo> [--no-compress] [--codec=zlib-9|bz2-9|lzma-9|...]")
         sys.exit(1)
     
     compress = '--no-compress' not in sys.argv
+    codec = next((a.split('=', 1)[1] for a in sys.argv[2:] if a.startswith('--codec=')), None)
     protocol = AudioProtocolUltrasonic()
-    protocol.send_file(sys.argv[1], compress=compress)
+    protocol.send_file(sys.argv[1], compress=compress, codec=codec)
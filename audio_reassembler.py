@@ -0,0 +1,146 @@
+import os
+from audio_codecs import STORED, get_codec
+
+class Reassembler:
+    """Rearma un archivo en orden mientras llegan los paquetes.
+    
+    Los paquetes contiguos pasan por el descompresor incremental del codec y se
+    escriben en <ruta>.part en cuanto llegan. Los que llegan adelantados esperan en
+    una ventana de window paquetes en memoria; pasada la ventana se guardan en
+    spill_dir (o, con fetch, se vuelven a pedir a quien ya los tiene en disco).
+    Cuando se cierra el último hueco, finish() renombra el .part al nombre final.
+    """
+    def __init__(self, path, codec_id=STORED, window=256, spill_dir=None, fetch=None):
+        self.path = path
+        self.part_path = path + '.part'
+        self.decompressor = get_codec(codec_id).stream_decompressor()
+        self.window = window
+        self.spill_dir = spill_dir or path + '.spill'
+        self.fetch = fetch
+        self.file = open(self.part_path, 'wb')
+        
+        self.next = 0  # primer paquete que falta escribir
+        self.expected = None
+        self.held = {}  # paquetes adelantados en memoria: {seq: datos}
+        self.spilled = set()  # adelantados fuera de memoria
+        self.written = 0  # bytes descomprimidos escritos
+        self.error = None  # error del descompresor (se informa en finish)
+    
+    def _spill_path(self, seq):
+        return os.path.join(self.spill_dir, f"{seq}.pkt")
+    
+    def has(self, seq):
+        return seq < self.next or seq in self.held or seq in self.spilled
+    
+    def add(self, seq, data):
+        """Agrega un paquete (los repetidos se ignoran); devuelve True si era nuevo"""
+        if self.has(seq) or (self.expected is not None and seq >= self.expected):
+            return False
+        
+        if seq == self.next:
+            self._write(data)
+            self._drain()
+        elif len(self.held) < self.window:
+            self.held[seq] = bytes(data)
+        else:
+            # Ventana llena: sale de memoria el más adelantado (es el último que se va a usar)
+            farthest = max(self.held)
+            if seq < farthest:
+                self.held[seq] = bytes(data)
+                seq, data = farthest, self.held.pop(farthest)
+            self._spill(seq, data)
+        return True
+    
+    def _spill(self, seq, data):
+        self.spilled.add(seq)
+        if self.fetch:
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self._spill_path(seq), 'wb') as f:
+            f.write(data)
+    
+    def _unspill(self, seq):
+        self.spilled.discard(seq)
+        if self.fetch:
+            return self.fetch(seq)
+        with open(self._spill_path(seq), 'rb') as f:
+            data = f.read()
+        os.remove(self._spill_path(seq))
+        return data
+    
+    def _write(self, data):
+        self.next += 1
+        if self.error:
+            return
+        try:
+            output = self.decompressor.decompress(data)
+        except Exception as e:
+            self.error = e
+            return
+        self.file.write(output)
+        self.written += len(output)
+    
+    def _drain(self):
+        """Escribe los paquetes que quedaron contiguos"""
+        while True:
+            if self.next in self.held:
+                self._write(self.held.pop(self.next))
+            elif self.next in self.spilled:
+                self._write(self._unspill(self.next))
+            else:
+                return
+    
+    def set_expected(self, expected):
+        self.expected = expected
+    
+    def missing(self):
+        """Paquetes faltantes (solo se conocen todos después del FIN)"""
+        if self.expected is None:
+            return None
+        return [seq for seq in range(self.next, self.expected) if not self.has(seq)]
+    
+    def is_complete(self):
+        return self.expected is not None and self.next >= self.expected
+    
+    def skip_gaps(self):
+        """Escribe lo que haya saltando los huecos (entrega parcial, sin retransmisión)"""
+        while self.held or self.spilled:
+            self.next = min(list(self.held) + list(self.spilled))
+            self._drain()
+        if self.expected is not None:
+            self.next = max(self.next, self.expected)
+    
+    def finish(self):
+        """Cierra el archivo y lo pasa a su nombre final; devuelve la ruta.
+        
+        Si los datos no se pudieron descomprimir descarta el .part y lanza el error.
+        """
+        if self.error is None:
+            try:
+                output = self.decompressor.flush()
+                self.file.write(output)
+                self.written += len(output)
+            except Exception as e:
+                self.error = e
+        if self.error:
+            self.abort()
+            raise self.error
+        self.file.close()
+        os.replace(self.part_path, self.path)
+        self._remove_spill()
+        return self.path
+    
+    def abort(self):
+        """Descarta lo escrito (el .part y lo desbordado a disco)"""
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+        self._remove_spill()
+    
+    def _remove_spill(self):
+        if self.fetch or not os.path.isdir(self.spill_dir):
+            return
+        for name in os.listdir(self.spill_dir):
+            os.remove(os.path.join(self.spill_dir, name))
+        os.rmdir(self.spill_dir)
@@ -1,19 +1,26 @@
 import sys
+import glob
 from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType
+from audio_codecs import STORED, get_codec
+from audio_decode_cache import DecodeCache
+from audio_reassembler import Reassembler
 
-def receive_file(input_prefix, output_file, request_retransmit=True):
-    """Recibe archivo desde paquetes de audio ultrasónico"""
-    protocol = AudioProtocolUltrasonic()
-    compressed = False
+def receive_file(input_prefix, output_file, request_retransmit=True, use_cache=True, protocol=None):
+    """Recibe archivo desde paquetes de audio ultrasónico (o DPSK, pasando el protocolo)"""
+    protocol = protocol or AudioProtocolUltrasonic()
+    codec_id = STORED
+    
+    # Cache de demodulación: una segunda pasada solo procesa los WAV nuevos
+    decoder = DecodeCache(f"{input_prefix}_decode_cache.json", protocol) if use_cache else protocol
     
     # Recibir SYN
     print("Esperando SYN...")
     try:
-        syn_packet = protocol.decode_from_audio(f"{input_prefix}_syn.wav")
+        syn_packet = decoder.decode_from_audio(f"{input_prefix}_syn.wav")
         ptype, seq, data, valid = protocol.decode_packet(syn_packet)
         if ptype == PacketType.SYN and valid:
-            compressed = data[0] == 1 if len(data) > 0 else False
-            print(f"✓ SYN recibido (compresión: {'sí' if compressed else 'no'})")
+            codec_id = data[0] if len(data) > 0 else STORED
+            print(f"✓ SYN recibido (compresión: {get_codec(codec_id).name})")
         else:
             print("✗ Error en SYN")
             return False
@@ -21,8 +28,8 @@ def receive_file(input_prefix, output_file, request_retransmit=True):
         print(f"✗ Error leyendo SYN: {e}")
         return False
     
-    # Recibir paquetes de datos
-    received_packets = {}
+    # Los paquetes se descomprimen y escriben en orden a medida que llegan
+    reassembler = Reassembler(output_file, codec_id)
     expected_packets = None
     seq = 0
     
@@ -30,11 +37,11 @@ def receive_file(input_prefix, output_file, request_retransmit=True):
     print("\nRecibiendo paquetes...")
     while True:
         try:
-            packet = protocol.decode_from_audio(f"{input_prefix}_data_{seq:04d}.wav")
+            packet = decoder.decode_from_audio(f"{input_prefix}_data_{seq:04d}.wav")
             ptype, pkt_seq, data, valid = protocol.decode_packet(packet)
             
             if ptype == PacketType.DATA and valid:
-                received_packets[pkt_seq] = data
+                reassembler.add(pkt_seq, data)
                 print(f"✓ Paquete {pkt_seq} recibido ({len(data)} bytes)")
             else:
                 print(f"✗ Error en paquete {seq} (checksum inválido)")
@@ -50,60 +57,74 @@ def receive_file(input_prefix, output_file, request_retransmit=True):
     
     # Recibir FIN
     try:
-        fin_packet = protocol.decode_from_audio(f"{input_prefix}_fin.wav")
+        fin_packet = decoder.decode_from_audio(f"{input_prefix}_fin.wav")
         ptype, fin_seq, data, valid = protocol.decode_packet(fin_packet)
         if ptype == PacketType.FIN and valid:
             expected_packets = fin_seq
+            reassembler.set_expected(expected_packets)
             print(f"✓ FIN recibido (esperados {expected_packets} paquetes)")
         else:
             print("✗ Error en FIN")
     except Exception as e:
         print(f"✗ Error leyendo FIN: {e}")
     
+    # Paquetes retransmitidos (audio_retransmit.py) completan los huecos
+    for retx_file in sorted(glob.glob(f"{input_prefix}_retx_*.wav")):
+        try:
+            packet = decoder.decode_from_audio(retx_file)
+            ptype, pkt_seq, data, valid = protocol.decode_packet(packet)
+        except Exception as e:
+            print(f"⚠ No se pudo leer {retx_file}: {e}")
+            continue
+        if ptype == PacketType.DATA and valid and reassembler.add(pkt_seq, data):
+            print(f"✓ Paquete {pkt_seq} recibido por retransmisión ({len(data)} bytes)")
+    
+    if use_cache:
+        decoder.save()
+        print(f"Cache: {decoder.hits} archivos reutilizados, {decoder.misses} demodulados")
+    
     # Verificar paquetes faltantes
     if expected_packets is not None:
-        missing = []
-        for i in range(expected_packets):
-            if i not in received_packets:
-                missing.append(i)
+        missing = reassembler.missing()
         
         if missing:
             print(f"\n⚠ Faltan {len(missing)} paquetes: {missing[:10]}{'...' if len(missing) > 10 else ''}")
             
             if request_retransmit:
                 print("\nGenerando NACKs para solicitar retransmisión...")
+                reassembler.abort()
                 protocol.generate_nack(missing, "rx_ultra")
                 print(f"\n📢 Reproduce los archivos rx_ultra_nack_*.wav en el emisor")
                 return False
         else:
             print(f"\n✓ Todos los paquetes recibidos correctamente")
     
-    # Reconstruir datos
-    received_data = bytearray()
-    for i in sorted(received_packets.keys()):
-        received_data.extend(received_packets[i])
-    
-    # Descomprimir si es necesario
-    if compressed:
-        try:
-            received_data = protocol.decompress_data(bytes(received_data))
-            print(f"✓ Datos descomprimidos: {len(received_data)} bytes")
-        except Exception as e:
-            print(f"✗ Error descomprimiendo: {e}")
-            return False
-    
-    # Guardar archivo
-    with open(output_file, 'wb') as f:
-        f.write(received_data)
+    # Sin retransmisión se entrega lo recibido, salteando los huecos
+    reassembler.skip_gaps()
+    try:
+        reassembler.finish()
+    except Exception as e:
+        print(f"✗ Error descomprimiendo: {e}")
+        return False
+    if codec_id != STORED:
+        print(f"✓ Datos descomprimidos: {reassembler.written} bytes")
     
-    print(f"\n✓ Archivo guardado: {output_file} ({len(received_data)} bytes)")
+    print(f"\n✓ Archivo guardado: {output_file} ({reassembler.written} bytes)")
     return True
 
 if __name__ == '__main__':
     if len(sys.argv) < 3:
-        print("Uso: python3 audio_receiver_ultrasonic.py <prefijo_entrada> <archivo_salida> [--no-retransmit]")
+        print("Uso: python3 audio_receiver_ultrasonic.py <prefijo_entrada> <archivo_salida> [--no-retransmit] [--no-cache] [--dpsk=1|2|3] [--carrier=18500]")
         print("Ejemplo: python3 audio_receiver_ultrasonic.py tx_ultra archivo_recuperado.txt")
         sys.exit(1)
     
     request_retransmit = '--no-retransmit' not in sys.argv
-    receive_file(sys.argv[1], sys.argv[2], request_retransmit)
+    use_cache = '--no-cache' not in sys.argv
+    
+    # --dpsk=N: paquetes generados con audio_protocol_dpsk.py (N bits por símbolo)
+    options = dict(a[2:].split('=', 1) for a in sys.argv[3:] if a.startswith('--') and '=' in a)
+    protocol = None
+    if 'dpsk' in options:
+        from audio_protocol_dpsk import AudioProtocolDPSK
+        protocol = AudioProtocolDPSK(carrier=float(options.get('carrier', 18500)), bits_per_symbol=int(options['dpsk']))
+    receive_file(sys.argv[1], sys.argv[2], request_retransmit, use_cache, protocol)
@@ -0,0 +1,95 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+class Resampler:
+    """Conversión de frecuencia de muestreo polifásica (relación racional up/down).
+    
+    Un filtro pasabajos FIR (sinc con ventana de Kaiser) partido en up fases:
+    cada muestra de salida es el producto de una sola fase con las muestras de
+    entrada que cubre, calculado para todo el bloque de una vez. Sirve por
+    bloques (process) sin discontinuidades entre ellos y sin retardo: la salida
+    k corresponde a la entrada k·from_rate/to_rate.
+    """
+    def __init__(self, from_rate, to_rate, taps=128, cutoff=0.97, beta=7.0):
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        g = math.gcd(int(from_rate), int(to_rate))
+        self.up = int(to_rate) // g
+        self.down = int(from_rate) // g
+        # taps cruces por cero del sinc (a la menor de las dos frecuencias), repartidos en up fases
+        self.taps = -(-taps * max(self.up, self.down) // self.up)
+        
+        # Filtro a la frecuencia intermedia (up · from_rate), corte en la menor Nyquist
+        length = self.taps * self.up
+        self.center = length // 2
+        fc = cutoff / (2 * max(self.up, self.down))
+        t = np.arange(length) - self.center
+        h = 2 * fc * np.sinc(2 * fc * t) * np.kaiser(2 * self.center + 1, beta)[:length]
+        h *= self.up / h.sum()  # ganancia unitaria en continua (compensa los ceros insertados)
+        # phases[p, j] multiplica a la entrada base - (taps - 1) + j (orden de la ventana)
+        self.phases = h.reshape(self.taps, self.up).T[:, ::-1].astype(np.float32)
+        
+        # Estado entre bloques: entrada pendiente desde la muestra absoluta self.start
+        self.history = np.zeros(self.taps, dtype=np.float32)
+        self.start = -self.taps
+        self.received = 0  # muestras de entrada recibidas
+        self.produced = 0  # muestras de salida entregadas
+    
+    def _output(self, count, block=8192):
+        """Calcula las próximas count muestras de salida con lo que hay en history"""
+        out = np.empty(count, dtype=np.float32)
+        windows = sliding_window_view(self.history, self.taps)
+        # Por tramos: cada uno arma una matriz (salidas x taps) de fases y otra de entradas
+        for first in range(0, count, block):
+            k = self.produced + first + np.arange(min(block, count - first), dtype=np.int64)
+            t = k * self.down + self.center
+            base = t // self.up - self.start
+            out[first:first + len(k)] = np.einsum('ij,ij->i', self.phases[t % self.up],
+                                                  windows[base - (self.taps - 1)])
+        self.produced += count
+        return out
+    
+    def _available(self, total):
+        """Muestras de salida calculables con total muestras de entrada"""
+        # La salida k necesita hasta la entrada (k·down + center) // up
+        last = total * self.up - self.center - 1
+        return max(last // self.down + 1 - self.produced, 0) if last >= 0 else 0
+    
+    def process(self, samples):
+        """Agrega un bloque de entrada; devuelve la salida que ya se puede calcular"""
+        samples = np.asarray(samples, dtype=np.float32)
+        self.history = np.concatenate([self.history, samples])
+        self.received += len(samples)
+        out = self._output(self._available(self.received))
+        self._trim()
+        return out
+    
+    def flush(self):
+        """Completa la salida al final de la entrada (como si siguiera en silencio)"""
+        total = -(-self.received * self.up // self.down)
+        pad = self.taps // 2 + 1
+        self.history = np.concatenate([self.history, np.zeros(pad, dtype=np.float32)])
+        out = self._output(max(total - self.produced, 0))
+        self.history = self.history[:len(self.history) - pad]
+        self._trim()
+        return out
+    
+    def _trim(self):
+        """Descarta la entrada que ya no va a usar ninguna salida futura"""
+        t = self.produced * self.down + self.center
+        keep = t // self.up - (self.taps - 1) - self.start
+        if keep > 0:
+            self.history = self.history[keep:]
+            self.start += keep
+
+def resample(audio, from_rate, to_rate, **kwargs):
+    """Remuestrea una señal entera: ceil(len · to_rate / from_rate) muestras"""
+    if from_rate == to_rate:
+        return np.asarray(audio, dtype=np.float32)
+    resampler = Resampler(from_rate, to_rate, **kwargs)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
+
+def scale_offsets(offsets, from_rate, to_rate):
+    """Posiciones (muestras) de una señal remuestreada, p.ej. los límites de cada paquete"""
+    return (np.asarray(offsets, dtype=np.int64) * to_rate + from_rate // 2) // from_rate
@@ -0,0 +1,224 @@
+import sys
+import os
+import json
+import wave
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType, parse_syn
+from audio_codecs import STORED
+from audio_packetizer import unwrap_seq
+
+# Protocolo de cada proceso del pool (se crea una vez por worker)
+_protocol = None
+
+def _init_worker():
+    global _protocol
+    _protocol = AudioProtocolUltrasonic(verbose=False)
+
+def scan_chunk(task):
+    """Busca y decodifica paquetes en un trozo de la grabación (corre en un worker).
+    
+    task = (archivo, inicio, muestras_propias, solapamiento). El worker lee su propio
+    trozo del WAV, así no se envían arrays entre procesos. Solo reporta los paquetes
+    cuyo preámbulo empieza en su zona propia; el solapamiento es para terminar de
+    decodificar los que cruzan el borde.
+    """
+    filename, chunk_start, owned, overlap = task
+    if _protocol is None:
+        _init_worker()
+    
+    with wave.open(filename, 'r') as wav:
+        wav.setpos(chunk_start)
+        frames = wav.readframes(owned + overlap)
+    audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32767.0
+    return scan_audio(_protocol, audio, owned, chunk_start)
+
+def scan_audio(protocol, audio, owned, offset=0):
+    """Paquetes cuyo preámbulo empieza en audio[:owned] (posiciones sumando offset)"""
+    n = protocol.samples_per_bit
+    found = []
+    resume = 0
+    # Preámbulos solo en la zona propia: el solapamiento se demodula únicamente
+    # para terminar los paquetes que cruzan el borde
+    search = audio[:owned + 5 * n]
+    energies = protocol.sliding_energies(search)
+    for start in protocol.find_preambles(search, energies):
+        if start >= owned:
+            break
+        if start < resume - n // 2:
+            continue  # preámbulo falso dentro de un paquete ya decodificado
+        
+        packet, n_symbols = protocol.decode_frame(audio, start + 4 * n)
+        if packet is None:
+            continue  # cabecera imposible: ruido
+        
+        ptype, seq, data, valid = protocol.decode_packet(packet)
+        if not valid:
+            found.append({'start': offset + start, 'type': ptype.name, 'seq': seq, 'valid': False})
+            continue
+        
+        resume = start + (4 + n_symbols) * n
+        # Una supertrama se reporta como sus paquetes DATA (los de CRC correcto)
+        for sub in protocol.expand_frame(packet):
+            ptype, seq, data, valid = protocol.decode_packet(sub)
+            found.append({
+                'start': offset + start,
+                'end': offset + resume,
+                'type': ptype.name,
+                'stream': protocol.packet_stream_id(sub),
+                'seq': seq,
+                'data': bytes(data),
+                'packet': bytes(sub),
+                'valid': True
+            })
+    return found
+
+def _unique_path(output_dir, name):
+    path = os.path.join(output_dir, name)
+    root, ext = os.path.splitext(path)
+    index = 1
+    while os.path.exists(path):
+        path = f"{root}_{index}{ext}"
+        index += 1
+    return path
+
+def _save_transfer(protocol, transfer, output_dir):
+    """Reensambla una transferencia SYN..FIN; devuelve la ruta guardada o None"""
+    expected = transfer['expected']
+    packets = transfer['packets']
+    if expected is None:
+        expected = max(packets) + 1 if packets else 0
+    missing = [i for i in range(expected) if i not in packets]
+    transfer['missing'] = missing
+    if missing:
+        return None
+    
+    data = b''.join(packets[i] for i in range(expected))
+    if transfer['codec'] != STORED:
+        try:
+            data = protocol.decompress_data(data, transfer['codec'])
+        except Exception:
+            transfer['missing'] = None
+            return None
+    
+    path = _unique_path(output_dir, transfer['name'])
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def scan_recording(filename, output_dir=".", chunk_seconds=30, workers=None):
+    """Extrae todas las transferencias de una grabación larga.
+    
+    Devuelve (archivos recuperados, reporte por paquete).
+    """
+    protocol = AudioProtocolUltrasonic(verbose=False)
+    n = protocol.samples_per_bit
+    
+    with wave.open(filename, 'r') as wav:
+        if wav.getframerate() != protocol.sample_rate or wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{filename}: se esperaba WAV mono 16 bits a {protocol.sample_rate} Hz")
+        total = wav.getnframes()
+    
+    # El solapamiento cubre el paquete más largo posible (una supertrama)
+    owned = int(chunk_seconds * protocol.sample_rate)
+    overlap = protocol.max_frame_samples() + n
+    tasks = [(filename, start, owned, overlap) for start in range(0, total, owned)]
+    
+    print(f"Escaneando {filename}: {total / protocol.sample_rate:.1f} s en {len(tasks)} trozos...")
+    
+    report = []
+    seen = set()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        for frames in pool.map(scan_chunk, tasks, chunksize=1):
+            for frame in frames:
+                # Deduplicar en los bordes: el mismo paquete desde dos trozos (las
+                # subtramas de una supertrama comparten el comienzo: cuenta el paquete)
+                key = (frame['start'] // n, frame.get('packet'))
+                if frame['valid'] and any((key[0] + d, key[1]) in seen for d in (-1, 0, 1)):
+                    continue
+                if frame['valid']:
+                    seen.add(key)
+                report.append(frame)
+    
+    report.sort(key=lambda frame: frame['start'])
+    
+    # Unir los paquetes en transferencias
+    os.makedirs(output_dir, exist_ok=True)
+    recovered = []
+    transfers = {}  # transferencia abierta por ID de stream
+    count = 0
+    
+    def close_transfer(transfer):
+        if transfer is None:
+            return
+        path = _save_transfer(protocol, transfer, output_dir)
+        if path:
+            recovered.append(path)
+            print(f"✓ Transferencia {transfer['index']}: {path}")
+        elif transfer['missing']:
+            print(f"⚠ Transferencia {transfer['index']} ({transfer['name']}): faltan {len(transfer['missing'])} paquetes")
+        else:
+            print(f"✗ Transferencia {transfer['index']} ({transfer['name']}): error descomprimiendo")
+    
+    for frame in report:
+        if not frame['valid']:
+            continue
+        ptype = PacketType[frame['type']]
+        data = frame['data']
+        stream_id = frame['stream']
+        transfer = transfers.get(stream_id)
+        
+        if ptype == PacketType.SYN:
+            close_transfer(transfer)
+            count += 1
+            syn = parse_syn(data)
+            name = os.path.basename(syn['filename']) or f"transfer_{count:04d}.bin"
+            # Una retransmisión dice su primera secuencia completa y el total
+            transfer = {'index': count, 'name': name, 'codec': syn['codec'],
+                        'packets': {}, 'expected': syn['total'], 'last': syn['base'] - 1}
+            transfers[stream_id] = transfer
+        elif transfer is None:
+            continue
+        elif ptype == PacketType.DATA:
+            seq = unwrap_seq(frame['seq'], transfer['last'])
+            transfer['last'] = seq
+            transfer['packets'][seq] = data
+            frame['seq'] = seq
+        elif ptype == PacketType.FIN:
+            if transfer['expected'] is None or frame['seq'] != transfer['expected'] & 0xFF:
+                transfer['expected'] = unwrap_seq(frame['seq'], transfer['last'])
+            frame['transfer'] = transfer['index']
+            close_transfer(transfers.pop(stream_id))
+            continue
+        frame['transfer'] = transfer['index']
+    for transfer in transfers.values():
+        close_transfer(transfer)
+    
+    # Reporte por paquete (sin los datos)
+    rows = []
+    for frame in report:
+        row = {k: v for k, v in frame.items() if k not in ('data', 'packet')}
+        row['time'] = round(frame['start'] / protocol.sample_rate, 3)
+        if 'data' in frame:
+            row['length'] = len(frame['data'])
+        rows.append(row)
+    with open(os.path.join(output_dir, 'scan_report.json'), 'w') as f:
+        json.dump(rows, f, indent=1)
+    
+    valid = sum(1 for frame in report if frame['valid'])
+    print(f"\n✓ {valid} paquetes válidos, {len(report) - valid} inválidos, {len(recovered)} archivos recuperados")
+    return recovered, rows
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) < 1:
+        print("Uso: python3 audio_scanner.py <grabacion.wav> [directorio_salida] [--workers=N] [--chunk=segundos]")
+        sys.exit(1)
+    
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    scan_recording(
+        args[0],
+        args[1] if len(args) > 1 else ".",
+        chunk_seconds=float(options.get('chunk', 30)),
+        workers=int(options['workers']) if 'workers' in options else None
+    )
@@ -0,0 +1,190 @@
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic
+from audio_scanner import scan_audio
+
+def _ring_worker(shm_name, size, tasks, results, protocol_kwargs):
+    """Proceso demodulador: lee su tramo directo de la memoria compartida"""
+    protocol = AudioProtocolUltrasonic(verbose=False, **protocol_kwargs)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((size,), dtype=np.float32, buffer=shm.buf)
+    audio = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            index, band, position, length, owned, start = task
+            # Vista sin copia (el espejo del final hace que el tramo nunca dé la vuelta)
+            audio = ring[position:position + length]
+            frames = [f for f in scan_audio(protocol, audio, owned, start) if f['valid']]
+            results.put((index, band, frames))
+    finally:
+        del ring, audio
+        shm.close()
+
+class SharedRing:
+    """Buffer circular de audio en memoria compartida entre procesos.
+    
+    Las posiciones son absolutas (muestras desde el comienzo). Los primeros mirror
+    elementos se repiten al final del buffer, así cualquier tramo de hasta mirror
+    muestras es contiguo y los workers lo leen sin copiarlo.
+    """
+    def __init__(self, capacity, mirror):
+        self.capacity = capacity
+        self.mirror = mirror
+        self.size = capacity + mirror
+        self.shm = shared_memory.SharedMemory(create=True, size=self.size * 4)
+        self.buffer = np.ndarray((self.size,), dtype=np.float32, buffer=self.shm.buf)
+        self.written = 0
+    
+    def write(self, samples):
+        """Agrega muestras al final (quien llama se asegura de no pisar lo pendiente)"""
+        samples = np.asarray(samples, dtype=np.float32)
+        while len(samples):
+            position = self.written % self.capacity
+            count = min(len(samples), self.capacity - position)
+            self.buffer[position:position + count] = samples[:count]
+            if position < self.mirror:
+                end = min(position + count, self.mirror)
+                self.buffer[self.capacity + position:self.capacity + end] = samples[:end - position]
+            self.written += count
+            samples = samples[count:]
+    
+    def position(self, start):
+        """Índice en el buffer de la muestra absoluta start"""
+        return start % self.capacity
+    
+    def close(self):
+        del self.buffer
+        self.shm.close()
+        self.shm.unlink()
+
+class RingDemodulator:
+    """Demodulación en varios procesos sobre un buffer circular compartido.
+    
+    La captura se escribe una sola vez en memoria compartida; a cada worker se le
+    manda solo (posición, largo) de un tramo de tiempo y devuelve los paquetes
+    decodificados. Con bands, cada worker demodula una sub-banda (base_freq) y
+    todos reciben todos los tramos. Cada tramo reporta los paquetes que empiezan en
+    sus slice muestras propias y se solapa con el siguiente lo que dura el paquete
+    más largo (una supertrama), como los trozos de audio_scanner.py.
+    """
+    def __init__(self, workers=None, bands=None, slice_seconds=1.0, sample_rate=44100):
+        protocol = AudioProtocolUltrasonic(sample_rate, verbose=False)
+        n = protocol.samples_per_bit
+        self.sample_rate = sample_rate
+        self.samples_per_bit = n
+        self.slice = int(slice_seconds * sample_rate)
+        self.overlap = protocol.max_frame_samples() + n
+        self.bands = bands or [None]
+        n_workers = len(self.bands) if bands else (workers or multiprocessing.cpu_count())
+        
+        # Lugar para que todos los workers tengan dos tramos en curso
+        length = self.slice + self.overlap
+        self.ring = SharedRing((2 * n_workers + 2) * length, length)
+        
+        self.results = multiprocessing.Queue()
+        self.task_queues = []
+        self.processes = []
+        for i in range(n_workers):
+            kwargs = {'sample_rate': sample_rate}
+            if bands:
+                kwargs['base_freq'] = bands[i]
+            tasks = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_ring_worker, daemon=True,
+                                              args=(self.ring.shm.name, self.ring.size, tasks, self.results, kwargs))
+            process.start()
+            self.task_queues.append(tasks)
+            self.processes.append(process)
+        
+        self.next_start = 0  # comienzo del próximo tramo a repartir
+        self.next_index = 0
+        self.deliver_index = 0  # próximo tramo a entregar (en orden)
+        self.in_flight = {}  # tramo → [inicio, bandas pendientes, paquetes]
+        self.seen = set()
+    
+    def feed(self, audio_chunk):
+        """Escribe audio en el buffer; devuelve los paquetes (bytes) ya demodulados, en orden"""
+        audio_chunk = np.asarray(audio_chunk, dtype=np.float32)
+        # Sin pisar tramos en curso: si el buffer está lleno se espera a los workers
+        while self._busy() and self.ring.written + len(audio_chunk) - self.ring.capacity > self._oldest():
+            self._collect(block=True)
+        self.ring.write(audio_chunk)
+        
+        while self.ring.written >= self.next_start + self.slice + self.overlap:
+            self._dispatch(self.slice + self.overlap, self.slice)
+        self._collect(block=False)
+        return self._deliver()
+    
+    def flush(self):
+        """Demodula lo que quede (fin de la entrada o silencio) y espera todos los resultados"""
+        remaining = self.ring.written - self.next_start
+        if remaining > 0:
+            self._dispatch(remaining, remaining)
+        while self._busy():
+            self._collect(block=True)
+        return self._deliver()
+    
+    def _busy(self):
+        return any(item[1] for item in self.in_flight.values())
+    
+    def _oldest(self):
+        """Comienzo del tramo más viejo que algún worker todavía está leyendo"""
+        return min(item[0] for item in self.in_flight.values() if item[1])
+    
+    def _dispatch(self, length, owned):
+        start = self.next_start
+        position = self.ring.position(start)
+        self.in_flight[self.next_index] = [start, len(self.bands), []]
+        if len(self.bands) > 1:
+            for band, tasks in enumerate(self.task_queues):
+                tasks.put((self.next_index, band, position, length, owned, start))
+        else:
+            tasks = self.task_queues[self.next_index % len(self.task_queues)]
+            tasks.put((self.next_index, 0, position, length, owned, start))
+        self.next_index += 1
+        self.next_start += owned
+    
+    def _collect(self, block):
+        while self._busy():
+            try:
+                index, band, frames = self.results.get(block=block, timeout=5 if block else None)
+            except queue.Empty:
+                if block and not all(process.is_alive() for process in self.processes):
+                    raise RuntimeError("Un worker de demodulación terminó inesperadamente")
+                return
+            item = self.in_flight[index]
+            item[1] -= 1
+            item[2].extend(frames)
+            if block:
+                return
+    
+    def _deliver(self):
+        """Paquetes de los tramos terminados, en orden de tramo y de posición"""
+        packets = []
+        while self.deliver_index in self.in_flight and self.in_flight[self.deliver_index][1] == 0:
+            _, _, frames = self.in_flight.pop(self.deliver_index)
+            self.deliver_index += 1
+            for frame in sorted(frames, key=lambda frame: frame['start']):
+                # El mismo paquete visto desde dos tramos (o dos bandas) se entrega una vez
+                key = (frame['start'] // self.samples_per_bit, frame['packet'])
+                if any((key[0] + d, key[1]) in self.seen for d in (-1, 0, 1)):
+                    continue
+                self.seen.add(key)
+                packets.append(frame['packet'])
+        # Olvidar lo que ya no se puede repetir
+        horizon = (self.next_start - 2 * (self.slice + self.overlap)) // self.samples_per_bit
+        self.seen = {key for key in self.seen if key[0] >= horizon}
+        return packets
+    
+    def close(self):
+        for tasks in self.task_queues:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
@@ -1,215 +1,550 @@
 import sys
-import pyaudio
+import os
+import copy
+import wave
+import collections
 import numpy as np
-from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType, PROFILES, SYN_FLAG_SOUNDING, parse_syn
+from audio_codecs import CODECS, get_codec
+from audio_transfer_store import PartialTransferStore
+from audio_reassembler import Reassembler
+from audio_packetizer import single_frame, unwrap_seq
+from audio_backends import PyAudioBackend, open_backend
+from audio_frontend import AudioFrontend
+from audio_frame_reader import read_frame
+from audio_shm_ring import RingDemodulator
+from audio_resample import Resampler, resample
+from audio_trace import TraceWriter
 import time
 
+# Registros de traza a la espera de _handle_packet
+MAX_TRACES = 1024
+
 class AudioStreamReceiver:
-    def __init__(self):
-        self.protocol = AudioProtocolUltrasonic()
-        self.audio = pyaudio.PyAudio()
+    def __init__(self, backend=None, output_backend=None, max_streams=8, idle_timeout=120, squelch=True,
+                 workers=0, device_rate=None, tracer=None, verbose=True):
+        # Perfil por defecto (SYN, sondeo); un SYN puede pasar los datos a otro perfil
+        self.verbose = verbose  # mensajes de inicialización de cada protocolo
+        self.base_protocol = AudioProtocolUltrasonic(verbose=verbose)
+        self.protocol = self.base_protocol
+        self.profiles = {}  # protocolos de otros perfiles ya creados
+        # Frecuencia del dispositivo: se remuestrea a la del módem si es otra
+        self.device_rate = device_rate or self.protocol.sample_rate
+        self.resampler = None
+        self.audio = backend or PyAudioBackend()
+        self.output = output_backend or self.audio  # para responder (MAP)
         self.stream = None
         self.buffer = np.array([], dtype=np.float32)
-        self.receiving = False
-        self.filename = None
-        self.compressed = False
-        self.packets = {}
-        self.expected_packets = None
+        self.pending_end = 0  # muestras que necesita el paquete incompleto del buffer
+        # Transferencias en curso por ID de stream: {stream_id: PartialTransfer}.
+        # Los paquetes van a disco; en memoria solo queda el contexto de cada stream.
+        self.transfers = {}
+        self.last_activity = {}
+        self.last_seq = {}  # mayor secuencia recibida por stream (para pasar de 8 bits a completa)
+        self.reassemblers = {}  # por stream: escribe el archivo en orden mientras llega
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self.stores = {}
+        self.sounding_pending = False
+        self.mapped_protocol = None
+        
+        # Traza por paquete (TraceWriter): hora de llegada de cada bloque para ubicar
+        # la primera y última muestra de un paquete; registros a la espera de _handle_packet
+        self.tracer = tracer
+        self.received = 0  # muestras recibidas a la frecuencia del módem
+        self.arrivals = collections.deque(maxlen=4096)  # (muestras hasta el fin del bloque, hora)
+        self.traces = collections.OrderedDict()
+        self.traced_until = 0  # paquetes rechazados ya registrados (no repetirlos)
+        
+        # Squelch + AGC: sin energía en la banda de los tonos no se demodula nada
+        self.squelch = squelch
+        self.frontend = None
+        self.squelch_totals = (0, 0)  # bloques y bloques pasados de los frontends de otros perfiles
+        self._set_protocol(self.protocol)
+        
+        # Con workers > 0 la demodulación corre en esos procesos sobre un buffer compartido
+        self.ring = RingDemodulator(workers, sample_rate=self.protocol.sample_rate) if workers else None
+    
+    def _set_protocol(self, protocol):
+        """Demodula con otro perfil: remuestreo, squelch y buffer nuevos"""
+        self.protocol = protocol
+        self.resampler = None
+        if self.device_rate != protocol.sample_rate:
+            self.resampler = Resampler(self.device_rate, protocol.sample_rate)
+        if self.squelch:
+            if self.frontend:
+                blocks, passed = self.squelch_totals
+                self.squelch_totals = (blocks + self.frontend.blocks, passed + self.frontend.passed)
+            half_spacing = (protocol.candidate_freqs[1] - protocol.candidate_freqs[0]) / 2
+            self.frontend = AudioFrontend(protocol.sample_rate, (
+                protocol.candidate_freqs[0] - half_spacing,
+                protocol.candidate_freqs[-1] + half_spacing))  # tonos acordados en el sondeo de esta sesión
+        self.buffer = np.array([], dtype=np.float32)
+        self.pending_end = 0
+        self.received = 0
+        self.arrivals.clear()
+        self.traced_until = 0
+    
+    def duty_cycle(self):
+        """Fracción de bloques que pasaron al demodulador en toda la escucha (todos los perfiles)"""
+        blocks, passed = self.squelch_totals
+        return (passed + self.frontend.passed) / max(blocks + self.frontend.blocks, 1)
+    
+    def _switch_profile(self, profile):
+        """Pasa al perfil anunciado en un SYN; devuelve False si no se puede recibir"""
+        if profile >= len(PROFILES):
+            print(f"   ⚠ Perfil desconocido ({profile}): se sigue con el de por defecto")
+            return False
+        name = PROFILES[profile][0]
+        if name not in self.profiles:
+            self.profiles[name] = AudioProtocolUltrasonic.from_profile(name, self.verbose)
+        protocol = self.profiles[name]
+        if protocol.candidate_freqs[-1] >= self.device_rate / 2:
+            print(f"   ⚠ El perfil {name} usa tonos hasta {protocol.freqs[protocol.top]} Hz: "
+                  f"no se reciben con el dispositivo a {self.device_rate} Hz (--rate=)")
+            return False
+        if self.ring:
+            print(f"   ⚠ El perfil {name} no se usa con varios procesos (--workers)")
+            return False
+        self._set_protocol(protocol)
+        print(f"   ↻ Perfil {name}: {protocol.freqs[0]}-{protocol.freqs[protocol.top]} Hz, "
+              f"{protocol.bit_rate:.0f} bits/seg")
+        return True
+    
+    def _restore_profile(self):
+        """Vuelve al perfil por defecto (fin de la sesión con otro perfil)"""
+        if self.protocol is not self.base_protocol:
+            self._set_protocol(self.base_protocol)
     
     def listen_continuous(self, output_dir="."):
         """Escucha continuamente por transmisiones"""
         print("🎧 Escuchando transmisiones ultrasónicas...")
         print("   Presiona Ctrl+C para detener\n")
         
-        # Abrir stream de audio
+        # Abrir stream de audio (bloques de 4 símbolos a la frecuencia del dispositivo)
+        frames = int(self.device_rate * self.protocol.bit_duration) * 4
         self.stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.protocol.sample_rate,
+            rate=self.device_rate,
             input=True,
-            frames_per_buffer=self.protocol.samples_per_bit * 4
+            frames_per_buffer=frames
         )
         
         try:
             while True:
-                # Leer audio
-                data = self.stream.read(self.protocol.samples_per_bit * 4, exception_on_overflow=False)
+                # Leer audio (un backend de archivo entrega los bloques sin esperar)
+                data = self.stream.read(frames, exception_on_overflow=False)
+                if not data:
+                    print("\n✓ Fin de la entrada de audio")
+                    for packet in self.finish():
+                        self._handle_packet(packet, output_dir)
+                    break
                 audio_chunk = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32767.0
                 
-                # Agregar al buffer
-                self.buffer = np.append(self.buffer, audio_chunk)
-                
-                # Intentar decodificar si hay suficientes datos
-                if len(self.buffer) >= self.protocol.samples_per_bit * 10:
-                    self._process_buffer(output_dir)
-                    
-                    # Limpiar buffer viejo
-                    if len(self.buffer) > self.protocol.samples_per_bit * 100:
-                        self.buffer = self.buffer[-self.protocol.samples_per_bit * 50:]
+                for packet in self.feed(audio_chunk):
+                    self._handle_packet(packet, output_dir)
         
         except KeyboardInterrupt:
             print("\n\n✓ Escucha detenida")
         finally:
+            if self.frontend:
+                print(f"   Demodulación activa: {100 * self.duty_cycle():.1f}% del tiempo")
             self.close()
     
+    def finish(self):
+        """Fin de la entrada: devuelve los paquetes del audio que quedaba retenido"""
+        found = []
+        if self.resampler:
+            # El remuestreador retiene el final de la señal hasta que termina
+            found += self.feed(self.resampler.flush(), resampled=True)
+        if self.ring:
+            found += self._trace_detected(self.ring.flush())
+        return found
+    
+    def feed(self, audio_chunk, resampled=False):
+        """Agrega audio (a la frecuencia del dispositivo) al buffer y devuelve los paquetes encontrados"""
+        found = []
+        if self.resampler and not resampled:
+            audio_chunk = self.resampler.process(audio_chunk)
+        self.received += len(audio_chunk)
+        if self.tracer:
+            self.arrivals.append((self.received, time.time()))
+        
+        if self.frontend:
+            # El barrido de sondeo mide el nivel de cada tono: el AGC no debe compensarlo
+            self.frontend.hold_gain = self.sounding_pending
+            audio_chunk = self.frontend.process(audio_chunk)
+            if len(audio_chunk) == 0:
+                # Silencio: lo que quedó en el buffer ya no completa ningún paquete
+                self.buffer = self.buffer[:0]
+                self.pending_end = 0
+                # y una sesión con otro perfil ya terminó (o se perdió su FIN)
+                if self.protocol is not self.base_protocol and not self.frontend.open and self.frontend.passed:
+                    self._restore_profile()
+                if self.ring and self.ring.ring.written > self.ring.next_start:
+                    return self._trace_detected(self.ring.flush())
+                return found
+        
+        # Modo multiproceso (sin sondeo: se usan los tonos por defecto)
+        if self.ring:
+            return self._trace_detected(self.ring.feed(audio_chunk))
+        
+        # Agregar al buffer
+        self.buffer = np.append(self.buffer, audio_chunk)
+        
+        # Después de un SYN con sondeo, el barrido llega antes que los datos
+        if self.sounding_pending:
+            self._process_sounding()
+            return found
+        
+        # Un paquete a medias no se vuelve a buscar hasta que llegue su final
+        if len(self.buffer) >= max(self.protocol.samples_per_bit * 10, self.pending_end):
+            packet = self._find_packet()
+            while packet:
+                found.extend(self._expand(packet))
+                # Después de un SYN puede venir el barrido de sondeo: se sigue en el próximo bloque
+                if self.protocol.decode_packet(packet)[0] == PacketType.SYN:
+                    break
+                packet = self._find_packet()
+        
+        return found
+    
+    def _expand(self, packet):
+        """Paquetes de una supertrama (o el mismo paquete); avisa las subtramas dañadas"""
+        packets = self.protocol.expand_frame(packet)
+        if packets == [packet]:
+            return packets
+        if len(packets) < packet[2]:
+            print(f"   ⚠ Supertrama: {packet[2] - len(packets)} de {packet[2]} subtramas con CRC incorrecto")
+        record = self.traces.pop(packet, None)
+        if record:
+            for sub in packets:
+                self._keep_trace(sub, dict(record, superframe=True))
+        return packets
+    
     def _process_buffer(self, output_dir):
         """Procesa el buffer buscando paquetes"""
-        # Buscar preámbulo
-        preamble_pattern = [0, 7, 0, 7]
+        packet = self._find_packet()
+        if packet:
+            for packet in self._expand(packet):
+                self._handle_packet(packet, output_dir)
+    
+    def _process_sounding(self):
+        """Mide el barrido de sondeo, elige el mapa de tonos y lo responde con un MAP"""
+        n = self.protocol.samples_per_bit
+        needed = 4 * n + self.protocol.sounding_length()
         
-        # Intentar decodificar símbolos
-        if len(self.buffer) < self.protocol.samples_per_bit * 20:
+        for position in self.protocol.find_preambles(self.buffer):
+            if position + needed > len(self.buffer):
+                return  # esperar el resto del barrido
+            snr, response = self.protocol.measure_sounding(self.buffer[position + 4 * n:position + needed])
+            if np.sum(snr > 4) < len(self.protocol.freqs) // 2:
+                continue  # preámbulo falso: no parece un barrido
+            
+            indices, weights = self.protocol.choose_tone_map(snr, response)
+            map_data = self.protocol.encode_tone_map(indices, weights)
+            self._send_packet(self.protocol.encode_packet(PacketType.MAP, 0, map_data))
+            
+            self.mapped_protocol = copy.copy(self.protocol)
+            self.mapped_protocol.apply_tone_map(map_data)
+            freqs = [self.protocol.candidate_freqs[i] for i in indices]
+            excluded = [f for i, f in enumerate(self.protocol.candidate_freqs) if i not in indices]
+            print(f"   Sondeo: tonos {freqs[0]}-{freqs[-1]} Hz (excluidos: {excluded})")
+            
+            self.buffer = self.buffer[position + needed:]
+            self.sounding_pending = False
             return
         
-        # Decodificar símbolos del buffer
-        symbols = []
-        for i in range(0, min(len(self.buffer), self.protocol.samples_per_bit * 50), self.protocol.samples_per_bit):
-            chunk = self.buffer[i:i+self.protocol.samples_per_bit]
-            if len(chunk) < self.protocol.samples_per_bit:
-                break
-            
-            symbol = self._detect_symbol(chunk)
-            symbols.append(symbol)
-        
-        # Buscar patrón de preámbulo
-        for i in range(len(symbols) - 4):
-            if symbols[i:i+4] == preamble_pattern:
-                # Encontrado preámbulo, intentar decodificar paquete
-                packet_start = (i + 4) * self.protocol.samples_per_bit
-                packet_audio = self.buffer[packet_start:]
-                
-                if len(packet_audio) >= self.protocol.samples_per_bit * 10:
-                    packet = self._decode_packet_from_buffer(packet_audio)
-                    if packet:
-                        self._handle_packet(packet, output_dir)
-                        # Limpiar buffer hasta después del paquete
-                        self.buffer = self.buffer[packet_start + self.protocol.samples_per_bit * 20:]
-                        return
+        # Sin barrido después de un buen rato: seguir con los tonos por defecto
+        if len(self.buffer) > 3 * needed:
+            print("   ⚠ Sondeo no recibido, se usan los tonos por defecto")
+            self.sounding_pending = False
+    
+    def _send_packet(self, packet):
+        """Responde un paquete por la salida de audio (con los tonos por defecto)"""
+        audio, _ = self.protocol.modulate_frames(*single_frame(packet))
+        # Un símbolo de silencio al final para que el último no quede cortado
+        audio = np.concatenate([audio, np.zeros(self.protocol.samples_per_bit, dtype=audio.dtype)])
+        audio = resample(audio, self.protocol.sample_rate, self.device_rate)
+        stream = self.output.open(rate=self.device_rate, output=True)
+        stream.write((np.clip(audio, -1, 1) * (32767 * 0.9)).astype(np.int16).tobytes())
+        stream.close()
+    
+    def _find_packet(self):
+        """Busca un paquete en el buffer; si lo encuentra, lo consume y lo devuelve.
+        
+        Sin paquete deja en el buffer solo lo necesario: desde el comienzo de un
+        paquete que todavía no llegó entero, o lo justo para un preámbulo.
+        """
+        n = self.protocol.samples_per_bit
+        keep = len(self.buffer) - 5 * n
+        self.pending_end = 0
+        # Con un mapa acordado se prueba primero con esos tonos
+        for protocol in filter(None, [self.mapped_protocol, self.protocol]):
+            packet, position, end = self._find_packet_with(protocol)
+            if packet:
+                self.buffer = self.buffer[end:]
+                return packet
+            if position is not None and position < keep:
+                keep = position
+                self.pending_end = end - n // 8  # el último símbolo puede llegar corto
+        
+        if keep > 0:
+            self.buffer = self.buffer[keep:]
+            self.pending_end = max(self.pending_end - keep, 0)
+        return None
+    
+    def _find_packet_with(self, protocol):
+        """Busca un paquete demodulando con el juego de tonos de protocol.
+        
+        Devuelve (paquete, inicio, fin) del primero válido, (None, inicio, fin
+        esperado) si hay uno incompleto antes, o (None, None, None).
+        """
+        started = time.perf_counter()
+        positions = protocol.find_preambles(self.buffer)
+        search = time.perf_counter() - started
+        for position in positions:
+            # Primero la cabecera: el largo dice cuántos símbolos demodular y consumir
+            started = time.perf_counter()
+            packet, end = read_frame(protocol, self.buffer, position)
+            if self.tracer and (packet is not None or end is None):
+                self._trace_frame(packet, position, end, search, time.perf_counter() - started)
+            if packet is not None:
+                return packet, position, end
+            if end is not None:
+                return None, position, end  # esperar el resto del paquete
+        return None, None, None
+    
+    def _arrival(self, sample):
+        """Hora en que llegó la muestra absoluta sample (None si ya no se recuerda)"""
+        for received, arrived in self.arrivals:
+            if received > sample:
+                return arrived
+        return None
+    
+    def _trace_frame(self, packet, position, end, search, demod):
+        """Registro de un paquete decodificado (se completa en _handle_packet) o rechazado"""
+        first = self.received - len(self.buffer) + position
+        record = {'side': 'rx', 'rate': self.protocol.sample_rate, 'sample': first,
+                  't_first': self._arrival(first), 't_detect': time.time(),
+                  'search': search, 'demod': demod, 'valid': packet is not None}
+        if packet is None:
+            # Cabecera imposible o checksum incorrecto: se registra una vez
+            if first >= self.traced_until:
+                self.traced_until = first + self.protocol.samples_per_bit
+                self.tracer.write(record)
+            return
+        last = min(self.received - len(self.buffer) + end, self.received) - 1
+        record['t_last'] = self._arrival(last)
+        self._keep_trace(packet, record)
+    
+    def _trace_detected(self, packets):
+        """Registros de los paquetes del modo multiproceso (sin posición)"""
+        if self.tracer:
+            for packet in packets:
+                self._keep_trace(packet, {'side': 'rx', 'rate': self.protocol.sample_rate, 't_detect': time.time()})
+        return packets
+    
+    def _keep_trace(self, packet, record):
+        """Guarda un registro hasta que _handle_packet lo complete.
+        
+        Si nadie lo completa (AsyncAudioReceiver.packets no guarda los paquetes)
+        pasado MAX_TRACES se descartan los más viejos, no los que están en curso.
+        """
+        self.traces[packet] = record
+        self.traces.move_to_end(packet)
+        while len(self.traces) > MAX_TRACES:
+            self.traces.popitem(last=False)
     
     def _detect_symbol(self, chunk):
         """Detecta símbolo usando Goertzel"""
-        max_energy = 0
-        detected_symbol = 0
+        return int(self.protocol.detect_symbols(chunk)[0])
+    
+    def _store(self, output_dir):
+        """Store de transferencias incompletas del directorio de salida"""
+        if output_dir not in self.stores:
+            self.stores[output_dir] = PartialTransferStore(
+                os.path.join(output_dir, '.partial'), self.protocol.packet_size)
+        return self.stores[output_dir]
+    
+    def _evict_streams(self):
+        """Descarta los streams inactivos y, si no hay lugar, el más antiguo.
         
-        for symbol, target_freq in self.protocol.freqs.items():
-            k = int(0.5 + (len(chunk) * target_freq) / self.protocol.sample_rate)
-            omega = (2.0 * np.pi * k) / len(chunk)
-            coeff = 2.0 * np.cos(omega)
-            
-            q0 = 0.0
-            q1 = 0.0
-            q2 = 0.0
-            
-            for sample in chunk:
-                q0 = coeff * q1 - q2 + sample
-                q2 = q1
-                q1 = q0
-            
-            real = q1 - q2 * np.cos(omega)
-            imag = q2 * np.sin(omega)
-            energy = real * real + imag * imag
-            
-            if energy > max_energy:
-                max_energy = energy
-                detected_symbol = symbol
-        
-        return detected_symbol
-    
-    def _decode_packet_from_buffer(self, audio):
-        """Decodifica paquete desde buffer de audio"""
-        symbols = []
-        for i in range(0, min(len(audio), self.protocol.samples_per_bit * 30), self.protocol.samples_per_bit):
-            chunk = audio[i:i+self.protocol.samples_per_bit]
-            if len(chunk) < self.protocol.samples_per_bit:
-                break
-            symbols.append(self._detect_symbol(chunk))
-        
-        # Convertir a bits
-        bits = self.protocol.symbols_to_bits(symbols)
-        
-        # Convertir a bytes
-        packet = bytearray()
-        for i in range(0, len(bits), 8):
-            if i + 8 <= len(bits):
-                byte = 0
-                for j in range(8):
-                    byte = (byte << 1) | bits[i+j]
-                packet.append(byte)
-        
-        return bytes(packet)
+        Lo recibido queda en .partial: un nuevo SYN de la misma sesión lo retoma.
+        """
+        now = time.time()
+        for stream_id in [s for s, t in self.last_activity.items() if now - t > self.idle_timeout]:
+            print(f"   ⚠ Stream {stream_id} inactivo: {self.transfers[stream_id].filename} queda pendiente")
+            self._close_stream(stream_id)
+        while len(self.transfers) >= self.max_streams:
+            stream_id = min(self.last_activity, key=self.last_activity.get)
+            print(f"   ⚠ Demasiados streams: {self.transfers[stream_id].filename} queda pendiente")
+            self._close_stream(stream_id)
+    
+    def _close_stream(self, stream_id):
+        # Lo escrito en .part se descarta: al retomar se rearma desde .partial
+        reassembler = self.reassemblers.pop(stream_id, None)
+        if reassembler:
+            reassembler.abort()
+        self.transfers.pop(stream_id, None)
+        self.last_activity.pop(stream_id, None)
+        self.last_seq.pop(stream_id, None)
     
     def _handle_packet(self, packet, output_dir):
-        """Maneja un paquete recibido"""
+        """Maneja un paquete recibido; devuelve la ruta si se completó un archivo"""
+        record = self.traces.pop(packet, None) if self.tracer else None
+        if record is None:
+            return self._apply_packet(packet, output_dir)
+        
+        started = time.perf_counter()
+        path = self._apply_packet(packet, output_dir)
+        ptype, seq, data, valid = self.protocol.decode_packet(packet)
+        record.update({'stream': self.protocol.packet_stream_id(packet), 'seq': seq,
+                       'type': ptype.name if ptype else None, 'len': len(data),
+                       'handle': time.perf_counter() - started, 't_stored': time.time(), 'saved': path})
+        self.tracer.write(record)
+        return path
+    
+    def _apply_packet(self, packet, output_dir):
+        """Aplica un paquete a su transferencia (lo guarda y rearma el archivo)"""
         ptype, seq, data, valid = self.protocol.decode_packet(packet)
         
         if not valid:
-            return
+            return None
+        
+        stream_id = self.protocol.packet_stream_id(packet)
+        transfer = self.transfers.get(stream_id)
+        if transfer:
+            self.last_activity[stream_id] = time.time()
         
         if ptype == PacketType.SYN:
-            self.compressed = data[0] == 1 if len(data) > 0 else False
-            filename_len = data[1] if len(data) > 1 else 0
-            self.filename = data[2:2+filename_len].decode('utf-8', errors='ignore')
-            self.packets = {}
-            self.expected_packets = None
-            self.receiving = True
-            print(f"\n📥 Recibiendo: {self.filename} (compresión: {'sí' if self.compressed else 'no'})")
-        
-        elif ptype == PacketType.DATA and self.receiving:
-            self.packets[seq] = data
-            print(f"   Paquete {seq} recibido ({len(data)} bytes)")
-        
-        elif ptype == PacketType.FIN and self.receiving:
-            self.expected_packets = seq
-            print(f"   FIN recibido (esperados {self.expected_packets} paquetes)")
-            self._save_file(output_dir)
-    
-    def _save_file(self, output_dir):
-        """Guarda el archivo recibido"""
-        if not self.filename:
-            return
+            syn = parse_syn(data)
+            codec_id = syn['codec']
+            if codec_id not in CODECS:
+                print(f"   ⚠ SYN con codec desconocido ({codec_id}): se descarta")
+                return None
+            
+            # Nueva sesión: los tonos vuelven a los de por defecto hasta el sondeo
+            self.mapped_protocol = None
+            self.sounding_pending = bool(syn['flags'] & SYN_FLAG_SOUNDING)
+            # Los datos pueden venir con otro perfil (el SYN siempre con el de por defecto)
+            if syn['profile']:
+                self._switch_profile(syn['profile'])
+            
+            # Un SYN repetido del mismo stream reemplaza su contexto
+            self._close_stream(stream_id)
+            self._evict_streams()
+            
+            # Misma sesión y archivo: se retoma lo guardado (también después de reiniciar)
+            transfer = self._store(output_dir).open(syn['session'], os.path.basename(syn['filename']), codec_id)
+            self.transfers[stream_id] = transfer
+            self.last_activity[stream_id] = time.time()
+            # Una retransmisión dice desde qué secuencia completa sigue y el total
+            self.last_seq[stream_id] = syn['base'] - 1
+            if syn['total'] is not None and not transfer.set_expected(syn['total']):
+                print(f"   ⚠ El SYN anuncia {syn['total']} paquetes, pero ya se sabía que son {transfer.expected}")
+            
+            # Los adelantados que no entran en memoria se vuelven a leer de .partial
+            reassembler = Reassembler(os.path.join(output_dir, transfer.filename), transfer.codec_id, fetch=transfer.read)
+            reassembler.set_expected(transfer.expected)
+            for stored_seq in transfer.received():
+                reassembler.add(stored_seq, transfer.read(stored_seq))
+            self.reassemblers[stream_id] = reassembler
+            label = f" [stream {stream_id}]" if stream_id else ""
+            print(f"\n📥 Recibiendo{label}: {transfer.filename} (compresión: {get_codec(codec_id).name})")
+            if transfer.count():
+                print(f"   Retomando: {transfer.count()} paquetes ya guardados")
         
-        # Verificar paquetes faltantes
-        missing = []
-        for i in range(self.expected_packets):
-            if i not in self.packets:
-                missing.append(i)
+        elif ptype == PacketType.DATA and transfer:
+            seq = unwrap_seq(seq, self.last_seq[stream_id])
+            self.last_seq[stream_id] = max(self.last_seq[stream_id], seq)
+            
+            # Se siguen aceptando paquetes tardíos o retransmitidos después del FIN
+            if transfer.add(seq, data):
+                self.reassemblers[stream_id].add(seq, data)
+                print(f"   Paquete {seq} recibido ({len(data)} bytes) → {transfer.filename}")
+                if transfer.is_complete():
+                    return self._save_file(output_dir, stream_id)
+        
+        elif ptype == PacketType.FIN and transfer:
+            # Con el total ya conocido alcanza con que coincida el byte (el FIN de una
+            # retransmisión puede venir lejos del último DATA)
+            if transfer.expected is not None and seq == transfer.expected & 0xFF:
+                seq = transfer.expected
+            else:
+                seq = unwrap_seq(seq, self.last_seq[stream_id])
+            # La retransmisión (si falta algo) empieza con otro SYN con el perfil por defecto
+            self._restore_profile()
+            # Un FIN que contradice el total ya conocido no puede dar el archivo por completo
+            if not transfer.set_expected(seq):
+                print(f"   ⚠ FIN descartado: {transfer.filename} anuncia {seq} paquetes, "
+                      f"pero ya se sabía que son {transfer.expected}")
+                return None
+            self.reassemblers[stream_id].set_expected(seq)
+            print(f"   FIN recibido: {transfer.filename} (esperados {seq} paquetes)")
+            return self._save_file(output_dir, stream_id)
+        
+        return None
+    
+    def _save_file(self, output_dir, stream_id=0):
+        """Guarda el archivo recibido y devuelve su ruta (None si aún faltan paquetes o falló)"""
+        transfer = self.transfers.get(stream_id)
+        if not transfer or not transfer.filename:
+            return None
         
+        # Verificar paquetes faltantes: se guardan en disco hasta que lleguen
+        missing = transfer.missing()
         if missing:
-            print(f"   ⚠ Faltan {len(missing)} paquetes: {missing[:5]}{'...' if len(missing) > 5 else ''}")
-            self.receiving = False
-            return
+            print(f"   ⚠ Faltan {len(missing)} paquetes: {missing[:5]}{'...' if len(missing) > 5 else ''} (esperando retransmisión)")
+            return None
+        
+        # Todo ya pasó por el descompresor incremental: solo falta cerrar el .part
+        reassembler = self.reassemblers.pop(stream_id)
+        try:
+            output_path = reassembler.finish()
+        except Exception as e:
+            print(f"   ✗ Error descomprimiendo: {e}")
+            transfer.remove()
+            self._close_stream(stream_id)
+            return None
         
-        # Reconstruir datos
-        received_data = bytearray()
-        for i in sorted(self.packets.keys()):
-            received_data.extend(self.packets[i])
-        
-        # Descomprimir si es necesario
-        if self.compressed:
-            try:
-                received_data = self.protocol.decompress_data(bytes(received_data))
-            except Exception as e:
-                print(f"   ✗ Error descomprimiendo: {e}")
-                self.receiving = False
-                return
-        
-        # Guardar archivo
-        import os
-        output_path = os.path.join(output_dir, self.filename)
-        with open(output_path, 'wb') as f:
-            f.write(received_data)
-        
-        print(f"   ✓ Archivo guardado: {output_path} ({len(received_data)} bytes)\n")
-        self.receiving = False
+        print(f"   ✓ Archivo guardado: {output_path} ({reassembler.written} bytes)\n")
+        transfer.remove()
+        self._close_stream(stream_id)
+        if not self.transfers:
+            self.mapped_protocol = None
+        return output_path
     
     def close(self):
+        if self.ring:
+            self.ring.close()
+        if self.tracer:
+            self.tracer.close()
         if self.stream:
             self.stream.stop_stream()
             self.stream.close()
         self.audio.terminate()
 
 if __name__ == '__main__':
-    output_dir = sys.argv[1] if len(sys.argv) > 1 else "."
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    output_dir = args[0] if args else "."
+    
+    # --input=captura.wav reprocesa una grabación a velocidad de CPU; --input=- lee PCM de stdin
+    source = next((a.split('=', 1)[1] for a in sys.argv[1:] if a.startswith('--input=')), None)
     
-    receiver = AudioStreamReceiver()
+    # La respuesta al sondeo (MAP) solo tiene sentido en vivo; al reprocesar se descarta
+    backend = open_backend(source)
+    # --no-squelch demodula todo, incluso el silencio
+    # --workers=N demodula en N procesos sobre un buffer de memoria compartida
+    workers = next((int(a.split('=', 1)[1]) for a in sys.argv[1:] if a.startswith('--workers=')), 0)
+    # --rate=48000|96000 abre el dispositivo a esa frecuencia (necesario para el perfil 96k)
+    rate = next((int(a.split('=', 1)[1]) for a in sys.argv[1:] if a.startswith('--rate=')), None)
+    if rate is None and source and source.lower().endswith('.wav'):
+        # Una grabación se procesa a la frecuencia con que se grabó
+        with wave.open(source) as wav:
+            rate = wav.getframerate()
+    # --trace=traza.jsonl registra cada paquete (resumen: python3 audio_trace.py traza.jsonl)
+    trace = next((a.split('=', 1)[1] for a in sys.argv[1:] if a.startswith('--trace=')), None)
+    receiver = AudioStreamReceiver(backend, backend if source is None else open_backend('null'),
+                                   squelch='--no-squelch' not in sys.argv, workers=workers, device_rate=rate,
+                                   tracer=TraceWriter(trace) if trace else None)
     receiver.listen_continuous(output_dir)
@@ -1,63 +1,90 @@
 import sys
-import pyaudio
+import os
+import time
+import zlib
 import numpy as np
-from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType
+from audio_protocol_ultrasonic import (AudioProtocolUltrasonic, PacketType, MAX_STREAMS, profile_id,
+                                      SYN_FLAG_SOUNDING, SYN_FLAG_PROFILE, SYN_FLAG_SEQ, parse_syn)
+from audio_codecs import select_codec, get_codec
+from audio_packetizer import (frame_payload, frame_superframes, join_frames, select_frames, single_frame, split_frames,
+                              seq_runs, MAX_SUPERFRAME)
+from audio_backends import PyAudioBackend, open_backend
+from audio_frame_cache import FrameCache, SYN_SEQ, FIN_SEQ
+from audio_resample import Resampler, resample, scale_offsets
+from audio_trace import TraceWriter
+
+# Silencio después de un SYN con perfil (el receptor cambia de perfil antes de los datos)
+# y después de su FIN (vuelve al perfil por defecto)
+PROFILE_GUARD = 0.25
 
 class AudioStreamSender:
-    def __init__(self):
+    def __init__(self, backend=None, input_backend=None, frame_cache=None, profile=None, device_rate=None,
+                 tracer=None, superframe=0):
         self.protocol = AudioProtocolUltrasonic()
-        self.audio = pyaudio.PyAudio()
+        # SYN (y sondeo) siempre con el perfil por defecto; los datos con el pedido
+        self.data_protocol = AudioProtocolUltrasonic.from_profile(profile) if profile else self.protocol
+        # Frecuencia del dispositivo: el audio se remuestrea si el módem usa otra
+        self.device_rate = device_rate or self.data_protocol.sample_rate
+        self.audio = backend or PyAudioBackend()
+        self.input = input_backend  # para escuchar la respuesta MAP del sondeo
         self.stream = None
+        # PCM de los paquetes enviados, para retransmitir sin volver a generarlos
+        self.frame_cache = frame_cache if frame_cache is not None else FrameCache()
+        self.sent_sessions = {}  # archivo → (SYN del último envío, total de paquetes)
+        self.tracer = tracer  # TraceWriter: un registro por paquete enviado
+        if not 0 <= superframe <= MAX_SUPERFRAME:
+            raise ValueError(f"Supertrama de {superframe} paquetes: el máximo es {MAX_SUPERFRAME}")
+        self.superframe = superframe  # paquetes DATA por preámbulo (0 = uno por paquete)
     
-    def send_file_stream(self, filename):
-        """Envía archivo por stream de audio en tiempo real"""
-        # Leer archivo
-        with open(filename, 'rb') as f:
-            data = f.read()
+    def send_file_stream(self, filename, only=None, batch=32, sound=False):
+        """Envía archivo por stream de audio en tiempo real.
         
-        original_size = len(data)
+        only: secuencias a reenviar (retransmisión); el receptor completa el archivo
+        con lo que ya tenía guardado de la misma sesión. Van por tramos (ver
+        seq_runs), cada uno con un SYN que dice su primera secuencia y el total. Si
+        el archivo ya se envió con este emisor, los paquetes salen de frame_cache
+        sin volver a generarlos.
+        sound: después del SYN envía un barrido de sondeo y usa los tonos que el
+        receptor elija (paquete MAP); sin respuesta sigue con los de por defecto.
+        Con superframe los datos van en supertramas; una retransmisión, paquete a paquete.
+        """
+        sound = sound and self.input is not None
+        profile = self.data_protocol is not self.protocol
+        if sound and profile:
+            print("⚠ El sondeo no se combina con otro perfil: se envía sin sondeo")
+            sound = False
+        if only is not None and filename in self.sent_sessions:
+            if self.resend_frames(*self.sent_sessions[filename], only):
+                return
         
-        # Comprimir
-        data = self.protocol.compress_data(data)
-        print(f"Compresión: {original_size} → {len(data)} bytes ({100*(1-len(data)/original_size):.1f}% reducción)")
-        
-        # Preparar nombre de archivo (máximo 32 bytes)
-        import os
-        file_basename = os.path.basename(filename)[:32]
-        filename_bytes = file_basename.encode('utf-8')
-        
-        # Dividir en paquetes
-        packets = []
-        for i in range(0, len(data), self.protocol.packet_size):
-            chunk = data[i:i+self.protocol.packet_size]
-            packets.append(chunk)
-        
-        print(f"Enviando '{file_basename}' ({len(data)} bytes en {len(packets)} paquetes)...")
+        flags = (SYN_FLAG_SOUNDING if sound else 0) | (SYN_FLAG_PROFILE if profile else 0)
+        superframe = self.superframe if only is None else 0
+        file_basename, buffer, offsets = self.prepare_frames(filename, flags, superframe=superframe)
+        keys = self._frame_keys(buffer, offsets)
+        n_data = len(offsets) - 3
+        # Con un mapa de tonos el audio vale solo para esta sesión: no se guarda.
+        # Una supertrama tampoco: la cache sirve para reenviar paquetes sueltos
+        if sound or superframe:
+            keys = None
+        else:
+            self.sent_sessions[filename] = (buffer[offsets[0]:offsets[1]].tobytes(), n_data)
         
         # Abrir stream de audio
         self.stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.protocol.sample_rate,
+            rate=self.device_rate,
             output=True
         )
         
-        # Enviar SYN con nombre de archivo
-        syn_data = bytes([1]) + bytes([len(filename_bytes)]) + filename_bytes
-        syn_packet = self.protocol.encode_packet(PacketType.SYN, 0, syn_data)
-        self._send_packet_audio(syn_packet)
-        print(f"✓ SYN enviado con nombre: {file_basename}")
-        
-        # Enviar paquetes de datos
-        for seq, chunk in enumerate(packets):
-            data_packet = self.protocol.encode_packet(PacketType.DATA, seq, chunk)
-            self._send_packet_audio(data_packet)
-            print(f"✓ Paquete {seq+1}/{len(packets)} enviado")
-        
-        # Enviar FIN
-        fin_packet = self.protocol.encode_packet(PacketType.FIN, len(packets), b'')
-        self._send_packet_audio(fin_packet)
-        print(f"✓ FIN enviado")
+        if only is None:
+            self._send_session(file_basename, buffer, offsets, keys, batch, sound, superframe)
+        else:
+            syn_packet = buffer[offsets[0]:offsets[1]].tobytes()
+            for run in seq_runs(sorted(seq for seq in set(only) if seq < n_data)):
+                indices = [1 + seq for seq in run] + [n_data + 1]
+                syn = self._resend_syn(syn_packet, run[0] if run else n_data, n_data)
+                run_buffer, run_offsets = join_frames(single_frame(syn), select_frames(buffer, offsets, indices))
+                run_keys = [None] + [keys[i] for i in indices] if keys else None
+                self._send_session(file_basename, run_buffer, run_offsets, run_keys, batch, sound, 0)
         
         # Cerrar stream
         self.stream.stop_stream()
@@ -65,43 +92,338 @@ class AudioStreamSender:
         
         print(f"\n✓ Transmisión completada")
     
-    def _send_packet_audio(self, packet):
-        """Envía un paquete como audio en tiempo real"""
-        # Generar preámbulo
-        audio = list(self.protocol.generate_preamble())
+    def _send_session(self, file_basename, buffer, offsets, keys, batch, sound, superframe):
+        """Escribe una sesión [SYN, DATA..., FIN] en el stream abierto (perfil y sondeo incluidos)"""
+        profile = self.data_protocol is not self.protocol
+        n_frames = len(offsets) - 1
+        n_data = n_frames - 2
+        start = 0
+        if profile:
+            # SYN con el perfil por defecto (lo entiende cualquier receptor) y una pausa
+            syn_pcm = self._syn_pcm(buffer[offsets[0]:offsets[1]].tobytes())
+            self.stream.write(syn_pcm)
+            if keys and keys[0]:
+                self.frame_cache.put(*keys[0], syn_pcm)
+            print(f"✓ SYN enviado con nombre: {file_basename} (perfil {self.data_protocol.profile})")
+            start = 1
+        if sound:
+            # SYN y barrido con los tonos por defecto; el resto con los acordados
+            syn_pcm, _ = self.render_frames(buffer, offsets[:2])
+            self.stream.write(syn_pcm.tobytes())
+            print(f"✓ SYN enviado con nombre: {file_basename}")
+            self.stream.write(self._pcm(self.protocol.generate_sounding(), self.protocol.sample_rate).tobytes())
+            print(f"✓ Barrido de sondeo enviado ({len(self.protocol.candidate_freqs)} tonos)")
+            self._negotiate_tone_map()
+            start = 1
         
-        # Convertir paquete a bits
-        bits = []
-        for byte in packet:
-            for i in range(8):
-                bits.append((byte >> (7-i)) & 1)
+        unit = "Supertrama" if superframe else "Paquete"
+        labels = ([f"SYN enviado con nombre: {file_basename}"] +
+                  [f"{unit} {i}/{n_data} enviado" for i in range(1, n_frames - 1)] + ["FIN enviado"])
+        self._write_frames(buffer, offsets, labels, batch, start, keys, self.data_protocol)
+        if profile:
+            # Después del FIN el receptor vuelve al perfil por defecto (puede seguir otro SYN)
+            self.stream.write(self._guard())
         
-        # Convertir a símbolos
-        symbols = self.protocol.bits_to_symbols(bits)
+        # El mapa vale solo para esta sesión (el próximo SYN va con los tonos por defecto)
+        if sound:
+            self.protocol.set_tone_map(self.default_freqs)
+    
+    def send_files_stream(self, filenames, max_streams=4, batch=32):
+        """Envía varios archivos a la vez, intercalando sus paquetes.
+        
+        Cada archivo activo usa su propio ID de stream y se envía un paquete de
+        cada uno por turno: un archivo chico no espera a que termine uno grande.
+        Como mucho max_streams archivos en curso; al terminar uno entra el siguiente
+        de la cola con el ID que quedó libre.
+        Siempre con el perfil por defecto y paquete a paquete: el receptor cambia de
+        perfil por sesión y una supertrama no se puede intercalar.
+        """
+        if self.data_protocol is not self.protocol:
+            print(f"⚠ Con varios archivos no se usa el perfil {self.data_protocol.profile}: se envía con el de por defecto")
+        if self.superframe:
+            print("⚠ Con varios archivos no se usan supertramas: se envía paquete a paquete")
+        max_streams = min(max_streams, MAX_STREAMS)
+        queue = list(filenames)
+        active = []  # [stream_id, nombre, buffer, offsets, siguiente paquete, claves de cache]
+        parts = []
+        labels = []
+        keys = []
+        while queue or active:
+            # Completar los streams libres con archivos de la cola
+            free = [i for i in range(max_streams) if i not in [a[0] for a in active]]
+            while queue and free:
+                stream_id = free.pop(0)
+                filename = queue.pop(0)
+                file_basename, buffer, offsets = self.prepare_frames(filename, stream_id=stream_id)
+                frame_keys = self._frame_keys(buffer, offsets)
+                self.sent_sessions[filename] = (buffer[offsets[0]:offsets[1]].tobytes(), len(offsets) - 3)
+                active.append([stream_id, file_basename, buffer, offsets, 0, frame_keys])
+            
+            # Un paquete de cada archivo activo
+            for entry in list(active):
+                stream_id, file_basename, buffer, offsets, index, frame_keys = entry
+                n_frames = len(offsets) - 1
+                parts.append((buffer[offsets[index]:offsets[index + 1]], offsets[index:index + 2] - offsets[index]))
+                keys.append(frame_keys[index])
+                if index == 0:
+                    labels.append(f"[{stream_id}] SYN enviado con nombre: {file_basename}")
+                elif index == n_frames - 1:
+                    labels.append(f"[{stream_id}] FIN enviado ({file_basename})")
+                else:
+                    labels.append(f"[{stream_id}] Paquete {index}/{n_frames - 2} enviado ({file_basename})")
+                entry[4] += 1
+                if entry[4] == n_frames:
+                    active.remove(entry)
+        
+        buffer, offsets = join_frames(*parts)
+        self.stream = self.audio.open(rate=self.device_rate, output=True)
+        self._write_frames(buffer, offsets, labels, batch, keys=keys)
+        self.stream.stop_stream()
+        self.stream.close()
+        
+        print(f"\n✓ Transmisión completada ({len(filenames)} archivos)")
+    
+    def _write_frames(self, buffer, offsets, labels, batch=32, start=0, keys=None, protocol=None):
+        """Genera el audio por lotes de paquetes directamente desde el buffer y lo escribe.
         
-        # Generar audio
-        for symbol in symbols:
-            audio.extend(self.protocol.generate_tone(symbol))
+        keys: (sesión, secuencia) de cada paquete para guardar su PCM en frame_cache.
+        """
+        n_frames = len(offsets) - 1
+        for first in range(start, n_frames, batch):
+            last = min(first + batch, n_frames)
+            rendered = time.time()
+            started = time.perf_counter()
+            pcm, sample_offsets = self.render_frames(buffer, offsets[first:last + 1], protocol)
+            render = (time.perf_counter() - started) / (last - first)  # parte de cada paquete en el lote
+            for i in range(first, last):
+                frame_pcm = pcm[sample_offsets[i - first]:sample_offsets[i - first + 1]].tobytes()
+                played = time.time()
+                self.stream.write(frame_pcm)
+                if self.tracer:
+                    header = buffer[offsets[i]:offsets[i] + 2]
+                    self._trace_frame(int(header[0]) >> 4, PacketType(header[0] & 0x0F), int(header[1]),
+                                      len(frame_pcm) // 2, t_render=rendered, render=render, t_play=played)
+                if keys and keys[i]:
+                    self.frame_cache.put(*keys[i], frame_pcm)
+                print(f"✓ {labels[i]}")
+    
+    def _trace_frame(self, stream_id, ptype, seq, samples, **times):
+        """Registro de un paquete enviado (se llama después de escribirlo)"""
+        record = {'side': 'tx', 'stream': stream_id, 'seq': seq, 'type': ptype.name,
+                  'rate': self.device_rate, 'samples': samples}
+        record.update(times)
+        record['t_played'] = time.time()
+        self.tracer.write(record)
+    
+    def _frame_keys(self, buffer, offsets):
+        """(sesión, secuencia) de cada paquete de un buffer [SYN, DATA..., FIN]"""
+        session = parse_syn(self.protocol.decode_packet(buffer[offsets[0]:offsets[1]].tobytes())[2])['session']
+        # Secuencia completa (el byte del paquete da la vuelta a los 256)
+        seqs = [SYN_SEQ] + list(range(len(offsets) - 3)) + [FIN_SEQ]
+        return [(session, seq) for seq in seqs]
+    
+    def resend_frames(self, syn_packet, total, seqs):
+        """Retransmite paquetes de una sesión desde frame_cache, por tramos (SYN + pedidos + FIN).
         
-        # Normalizar
-        audio = np.array(audio)
-        audio = (audio * 32767 * 0.9).astype(np.int16)
+        Los DATA y el FIN salen de la cache; el SYN de cada tramo se genera (lleva la
+        secuencia de su primer paquete). Devuelve False si algo no está en cache; no
+        se envía nada en ese caso.
+        """
+        session = parse_syn(self.protocol.decode_packet(syn_packet)[2])['session']
+        seqs = sorted(seq for seq in set(seqs) if seq < total)
+        if not self.frame_cache.has_session(session, seqs):
+            return False
         
-        # Enviar por stream
-        self.stream.write(audio.tobytes())
+        self.stream = self.audio.open(rate=self.device_rate, output=True)
+        for run in seq_runs(seqs):
+            started = time.perf_counter()
+            pcm = self._syn_pcm(self._resend_syn(syn_packet, run[0] if run else total, total))
+            played = time.time()
+            self.stream.write(pcm)
+            if self.tracer:
+                self._trace_frame(None, PacketType.SYN, None, len(pcm) // 2, t_render=played,
+                                  render=time.perf_counter() - started, t_play=played)
+            for seq in run + [FIN_SEQ]:
+                pcm = self.frame_cache.get(session, seq)
+                played = time.time()
+                self.stream.write(pcm)
+                if self.tracer:
+                    # Desde la cache: sin modulación
+                    ptype = PacketType.FIN if seq == FIN_SEQ else PacketType.DATA
+                    self._trace_frame(None, ptype, seq if seq >= 0 else None, len(pcm) // 2,
+                                      t_render=played, render=0.0, t_play=played, cached=True)
+            if self.data_protocol is not self.protocol:
+                self.stream.write(self._guard())
+        self.stream.stop_stream()
+        self.stream.close()
+        print(f"✓ Retransmitidos {len(seqs)} paquetes de la sesión {session:08x} (desde cache)")
+        return True
+    
+    def _resend_syn(self, syn_packet, base, total):
+        """SYN de un tramo de retransmisión: el original con la secuencia del primer DATA y el total"""
+        data = bytearray(self.protocol.decode_packet(syn_packet)[2])
+        flags_at = 2 + data[1] + 4
+        if len(data) == flags_at:
+            data.append(0)
+        data[flags_at] |= SYN_FLAG_SEQ
+        data += base.to_bytes(3, 'big') + total.to_bytes(3, 'big')
+        return self.protocol.encode_packet(PacketType.SYN, 0, bytes(data), self.protocol.packet_stream_id(syn_packet))
+    
+    def _syn_pcm(self, syn_packet):
+        """PCM de un SYN (siempre con el perfil por defecto; con otro perfil, más la pausa)"""
+        pcm = self.render_packet(syn_packet).tobytes()
+        if self.data_protocol is not self.protocol:
+            pcm += self._guard()
+        return pcm
+    
+    def _guard(self):
+        """Silencio para que el receptor cambie de perfil"""
+        return bytes(2 * int(PROFILE_GUARD * self.device_rate))
+    
+    def _negotiate_tone_map(self, timeout=3.0):
+        """Espera el paquete MAP del receptor y aplica sus tonos; devuelve True si llegó"""
+        self.default_freqs = list(self.protocol.freqs.values())
+        n = self.protocol.samples_per_bit
+        stream = self.input.open(rate=self.device_rate, input=True)
+        resampler = None
+        if self.device_rate != self.protocol.sample_rate:
+            resampler = Resampler(self.device_rate, self.protocol.sample_rate)
+        audio = np.zeros(0, dtype=np.float32)
+        deadline = time.time() + timeout
+        try:
+            while time.time() < deadline:
+                chunk = stream.read(int(self.device_rate * self.protocol.bit_duration) * 8)
+                if not chunk:
+                    break
+                chunk = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32767.0
+                audio = np.append(audio, resampler.process(chunk) if resampler else chunk)
+                packet, _, _ = self.protocol.find_frame(audio)
+                if packet is None:
+                    continue
+                ptype, seq, data, valid = self.protocol.decode_packet(packet)
+                if ptype == PacketType.MAP:
+                    self.protocol.apply_tone_map(data)
+                    freqs = list(self.protocol.freqs.values())
+                    print(f"✓ Mapa de tonos recibido: {freqs[0]}-{freqs[-1]} Hz")
+                    return True
+        finally:
+            stream.close()
+        
+        print("⚠ Sin respuesta al sondeo, se usan los tonos por defecto")
+        return False
+    
+    def prepare_frames(self, filename, flags=0, stream_id=0, superframe=0):
+        """Lee, comprime y empaqueta un archivo en un único buffer: (nombre, buffer, offsets).
+        
+        Los paquetes son [SYN, DATA..., FIN] del stream stream_id; ver audio_packetizer.
+        Con superframe, los DATA van agrupados de a superframe en supertramas.
+        """
+        # Leer archivo
+        with open(filename, 'rb') as f:
+            data = f.read()
+        
+        original_size = len(data)
+        
+        # Comprimir con el codec que deja menos bytes
+        codec_id, data = select_codec(data)
+        print(f"Compresión ({get_codec(codec_id).name}): {original_size} → {len(data)} bytes ({100*(1-len(data)/max(original_size, 1)):.1f}% reducción)")
+        
+        # Preparar nombre de archivo (máximo 32 bytes)
+        file_basename = os.path.basename(filename)[:32]
+        filename_bytes = file_basename.encode('utf-8')
+        
+        # Dividir en paquetes (todos armados de una vez)
+        if superframe:
+            data_frames = frame_superframes(data, self.protocol.packet_size, superframe, PacketType.SUPER,
+                                            stream_id=stream_id)
+        else:
+            data_frames = frame_payload(data, self.protocol.packet_size, PacketType.DATA, stream_id=stream_id)
+        n_packets = -(-len(data) // self.protocol.packet_size)
+        groups = f", {len(data_frames[1]) - 1} supertramas" if superframe else ""
+        
+        print(f"Enviando '{file_basename}' ({len(data)} bytes en {n_packets} paquetes{groups})...")
+        
+        # Sesión derivada del contenido: reenviar el mismo archivo retoma la misma sesión
+        session = zlib.crc32(filename_bytes + data) & 0xFFFFFFFF
+        
+        # SYN con codec, nombre de archivo, sesión y flags; datos y FIN
+        syn_data = bytes([codec_id]) + bytes([len(filename_bytes)]) + filename_bytes + session.to_bytes(4, 'big')
+        if flags:
+            syn_data += bytes([flags])
+        if flags & SYN_FLAG_PROFILE:
+            syn_data += bytes([profile_id(self.data_protocol.profile)])
+        syn_packet = self.protocol.encode_packet(PacketType.SYN, 0, syn_data, stream_id)
+        fin_packet = self.protocol.encode_packet(PacketType.FIN, n_packets, b'', stream_id)
+        buffer, offsets = join_frames(single_frame(syn_packet), data_frames, single_frame(fin_packet))
+        
+        return file_basename, buffer, offsets
+    
+    def prepare_packets(self, filename):
+        """Lee, comprime y empaqueta un archivo: devuelve (nombre, [SYN, DATA..., FIN])"""
+        file_basename, buffer, offsets = self.prepare_frames(filename)
+        return file_basename, split_frames(buffer, offsets)
+    
+    def render_frames(self, buffer, offsets, protocol=None):
+        """Genera el PCM int16 de varios paquetes a la frecuencia del dispositivo: (pcm, sample_offsets)"""
+        protocol = protocol or self.protocol
+        audio, sample_offsets = protocol.modulate_frames(buffer, offsets)
+        if protocol.sample_rate != self.device_rate:
+            sample_offsets = scale_offsets(sample_offsets, protocol.sample_rate, self.device_rate)
+        return self._pcm(audio, protocol.sample_rate), sample_offsets
+    
+    def _pcm(self, audio, rate):
+        """Audio float a PCM int16 para el dispositivo (remuestreado si hace falta)"""
+        audio = resample(audio, rate, self.device_rate)
+        return (np.clip(audio, -1, 1) * (32767 * 0.9)).astype(np.int16)
+    
+    def render_packet(self, packet):
+        """Genera el audio PCM int16 (preámbulo + símbolos) de un paquete"""
+        return self.render_frames(*single_frame(packet))[0]
+    
+    def _send_packet_audio(self, packet):
+        """Envía un paquete como audio en tiempo real"""
+        self.stream.write(self.render_packet(packet).tobytes())
     
     def close(self):
         if self.stream:
             self.stream.close()
+        if self.tracer:
+            self.tracer.close()
         self.audio.terminate()
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Uso: python3 audio_stream_sender.py <archivo>")
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) < 1:
+        print("Uso: python3 audio_stream_sender.py <archivo> [archivo2 ...] [--output=salida.wav|-|null] [--resend=5,12,...] [--sound]")
+        print("       [--profile=44k|48k|96k] [--rate=frecuencia del dispositivo] [--trace=traza.jsonl]")
+        print(f"       [--superframe=8]   (paquetes por preámbulo, hasta {MAX_SUPERFRAME})")
         sys.exit(1)
     
-    sender = AudioStreamSender()
+    output = next((a.split('=', 1)[1] for a in sys.argv[1:] if a.startswith('--output=')), None)
+    backend = open_backend(output)
+    if output == '-':
+        # stdout lleva el PCM: los mensajes van a stderr
+        sys.stdout = sys.stderr
+    
+    # El sondeo necesita escuchar la respuesta: solo con micrófono
+    sound = '--sound' in sys.argv
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    sender = AudioStreamSender(backend, PyAudioBackend() if sound and output is None else None,
+                               profile=options.get('profile'),
+                               device_rate=int(options['rate']) if 'rate' in options else None,
+                               tracer=TraceWriter(options['trace']) if 'trace' in options else None,
+                               superframe=int(options.get('superframe', 0)))
     try:
-        sender.send_file_stream(sys.argv[1])
+        resend = next((a.split('=', 1)[1] for a in sys.argv[1:] if a.startswith('--resend=')), None)
+        only = [int(seq) for seq in resend.split(',')] if resend else None
+        if len(args) > 1:
+            # Varios archivos: se envían intercalados, cada uno en su stream
+            if sound:
+                print("⚠ Con varios archivos no hay sondeo: se envía con los tonos por defecto")
+            if only is not None:
+                print("⚠ --resend es para un solo archivo: se envían completos")
+            sender.send_files_stream(args)
+        else:
+            sender.send_file_stream(args[0], only, sound=sound)
     finally:
         sender.close()
@@ -0,0 +1,105 @@
+import sys
+import json
+import numpy as np
+
+# Etapas que informa el resumen: {lado: [(nombre, función del registro → segundos o None)]}
+STAGES = {
+    'tx': [
+        ('render', lambda r: r.get('render')),  # modulación (parte del lote)
+        ('espera', lambda r: _span(r, 't_render', 't_play')),  # de generar a empezar a sonar
+        ('play', lambda r: _span(r, 't_play', 't_played')),
+        ('total', lambda r: _span(r, 't_render', 't_played')),
+    ],
+    'rx': [
+        ('aire', lambda r: _span(r, 't_first', 't_last')),  # primera a última muestra del paquete
+        ('detección', lambda r: _span(r, 't_last', 't_detect')),  # última muestra → paquete decodificado
+        ('búsqueda', lambda r: r.get('search')),  # preámbulos en el buffer
+        ('demodulación', lambda r: r.get('demod')),
+        ('rearmado', lambda r: r.get('handle')),  # descompresión y escritura
+        ('a disco', lambda r: _span(r, 't_last', 't_stored')),
+        ('total', lambda r: _span(r, 't_first', 't_stored')),
+    ],
+}
+
+def _span(record, start, end):
+    if record.get(start) is None or record.get(end) is None:
+        return None
+    return record[end] - record[start]
+
+class TraceWriter:
+    """Traza del ciclo de vida de cada paquete: un registro JSON por línea.
+    
+    Los tiempos t_* son de reloj (time.time(), comparables entre emisor y
+    receptor en la misma máquina); las duraciones, en segundos de perf_counter.
+    """
+    def __init__(self, path, flush_every=64):
+        self.path = path
+        self.file = open(path, 'a')
+        self.flush_every = flush_every
+        self.count = 0
+    
+    def write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n')
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.file.flush()
+    
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+def load_trace(path):
+    """Registros de un archivo de traza (ignora líneas cortadas al final)"""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+def summarize(records):
+    """Percentiles por etapa: {lado: {'paquetes', 'rechazados', 'etapas': {etapa: {...}}}}"""
+    summary = {}
+    for side, stages in STAGES.items():
+        side_records = [r for r in records if r.get('side') == side]
+        if not side_records:
+            continue
+        valid = [r for r in side_records if r.get('valid', True)]
+        result = {'paquetes': len(valid), 'rechazados': len(side_records) - len(valid), 'etapas': {}}
+        for name, value in stages:
+            values = np.array([v for v in map(value, valid) if v is not None], dtype=np.float64)
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            result['etapas'][name] = {'n': len(values), 'p50': p50, 'p95': p95, 'p99': p99, 'max': values.max()}
+        summary[side] = result
+    return summary
+
+def print_summary(summary):
+    names = {'tx': 'Emisor', 'rx': 'Receptor'}
+    for side, result in summary.items():
+        rejected = f", {result['rechazados']} rechazados" if result['rechazados'] else ""
+        print(f"\n📊 {names[side]}: {result['paquetes']} paquetes{rejected}")
+        print(f"  {'etapa':14s} {'n':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'máx ms':>9s}")
+        for name, stage in result['etapas'].items():
+            print(f"  {name:14s} {stage['n']:6d} {stage['p50'] * 1000:9.2f} {stage['p95'] * 1000:9.2f} "
+                  f"{stage['p99'] * 1000:9.2f} {stage['max'] * 1000:9.2f}")
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    if len(args) < 1:
+        print("Uso: python3 audio_trace.py <traza.jsonl> [traza2.jsonl ...] [--json]")
+        sys.exit(1)
+    
+    records = []
+    for path in args:
+        records.extend(load_trace(path))
+    summary = summarize(records)
+    if '--json' in sys.argv:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    elif not summary:
+        print("⚠ La traza no tiene registros")
+    else:
+        print_summary(summary)
@@ -0,0 +1,128 @@
+import os
+import json
+
+class PartialTransfer:
+    """Transferencia incompleta en disco: paquetes en ranuras fijas + bitmap de recibidos.
+    
+    Archivos (en el directorio del store, con la misma clave):
+      <clave>.pkt   ranura i = [largo(1B)][datos del paquete i]
+      <clave>.map   1 bit por paquete recibido
+      <clave>.json  nombre, codec, sesión y paquetes esperados
+    """
+    def __init__(self, base_path, meta, packet_size):
+        self.base_path = base_path
+        self.meta = meta
+        self.slot_size = packet_size + 1
+        self.bitmap = bytearray()
+        if os.path.exists(base_path + '.map'):
+            with open(base_path + '.map', 'rb') as f:
+                self.bitmap = bytearray(f.read())
+        for ext in ('.pkt', '.map'):
+            if not os.path.exists(base_path + ext):
+                open(base_path + ext, 'wb').close()
+        self._save_meta()
+    
+    @property
+    def filename(self):
+        return self.meta['filename']
+    
+    @property
+    def codec_id(self):
+        return self.meta['codec']
+    
+    @property
+    def expected(self):
+        return self.meta['expected']
+    
+    def _save_meta(self):
+        tmp = self.base_path + '.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.base_path + '.json')
+    
+    def has(self, seq):
+        return seq // 8 < len(self.bitmap) and bool(self.bitmap[seq // 8] & (0x80 >> (seq % 8)))
+    
+    def count(self):
+        return sum(bin(b).count('1') for b in self.bitmap)
+    
+    def add(self, seq, data):
+        """Guarda un paquete (los repetidos se ignoran); devuelve True si era nuevo"""
+        if self.has(seq):
+            return False
+        
+        # Primero los datos, después el bit: si el proceso muere no queda un bit sin datos
+        with open(self.base_path + '.pkt', 'r+b') as f:
+            f.seek(seq * self.slot_size)
+            f.write(bytes([len(data)]) + bytes(data))
+        
+        index = seq // 8
+        if index >= len(self.bitmap):
+            self.bitmap.extend(bytes(index + 1 - len(self.bitmap)))
+        self.bitmap[index] |= 0x80 >> (seq % 8)
+        with open(self.base_path + '.map', 'r+b') as f:
+            f.seek(index)
+            f.write(self.bitmap[index:index + 1])
+        return True
+    
+    def set_expected(self, expected):
+        """Fija el total de paquetes; devuelve False (y no cambia nada) si ya se sabía otro"""
+        if self.meta['expected'] is not None and self.meta['expected'] != expected:
+            return False
+        self.meta['expected'] = expected
+        self._save_meta()
+        return True
+    
+    def missing(self):
+        """Paquetes faltantes (solo se conocen todos después del FIN)"""
+        if self.expected is None:
+            return None
+        return [i for i in range(self.expected) if not self.has(i)]
+    
+    def is_complete(self):
+        return self.expected is not None and not self.missing()
+    
+    def received(self):
+        """Secuencias guardadas, en orden"""
+        return [seq for seq in range(len(self.bitmap) * 8) if self.has(seq)]
+    
+    def read(self, seq):
+        """Datos de un paquete guardado"""
+        with open(self.base_path + '.pkt', 'rb') as f:
+            f.seek(seq * self.slot_size)
+            length = f.read(1)[0]
+            return f.read(length)
+    
+    def remove(self):
+        for ext in ('.pkt', '.map', '.json'):
+            if os.path.exists(self.base_path + ext):
+                os.remove(self.base_path + ext)
+
+class PartialTransferStore:
+    """Directorio con las transferencias incompletas, por sesión y nombre de archivo"""
+    def __init__(self, directory, packet_size=64):
+        self.directory = directory
+        self.packet_size = packet_size
+        os.makedirs(directory, exist_ok=True)
+    
+    def _key(self, session, filename):
+        safe_name = ''.join(c if c.isalnum() or c in '._-' else '_' for c in filename)
+        return f"{session:08x}_{safe_name}"
+    
+    def open(self, session, filename, codec_id):
+        """Abre (o retoma después de un reinicio) la transferencia de una sesión"""
+        base_path = os.path.join(self.directory, self._key(session, filename))
+        meta = {'session': session, 'filename': filename, 'codec': codec_id, 'expected': None}
+        if os.path.exists(base_path + '.json'):
+            with open(base_path + '.json') as f:
+                meta = json.load(f)
+        return PartialTransfer(base_path, meta, self.packet_size)
+    
+    def pending(self):
+        """Lista las transferencias incompletas guardadas"""
+        transfers = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                with open(os.path.join(self.directory, name)) as f:
+                    transfers.append(json.load(f))
+        return transfers
@@ -0,0 +1,199 @@
+import sys
+import os
+import json
+import time
+import timeit
+import platform
+import tempfile
+import numpy as np
+from audio_protocol import AudioProtocol, PacketType as AudiblePacketType
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType
+from audio_protocol_dpsk import AudioProtocolDPSK
+from audio_backends import NullBackend
+from audio_packetizer import single_frame, frame_payload
+from audio_stream_receiver import AudioStreamReceiver
+from audio_resample import resample
+from audio_scanner import scan_audio
+
+# Tamaños de datos por paquete (bytes) y umbral de regresión por defecto (20% más lento)
+SIZES = [8, 64, 255]
+DEFAULT_THRESHOLD = 0.20
+# Un tramo con solapamiento puede costar hasta esto más que su parte propia
+RING_OVERHEAD = 1.5
+
+def _profiles():
+    """Perfiles de modulación a medir: {nombre: (protocolo, tipo DATA)}"""
+    return {
+        'audible': (AudioProtocol(), AudiblePacketType.DATA),
+        'ultrasonic': (AudioProtocolUltrasonic(verbose=False), PacketType.DATA),
+        'dpsk2': (AudioProtocolDPSK(bits_per_symbol=2, verbose=False), PacketType.DATA),
+    }
+
+def _bits(packet):
+    return [int(b) for b in np.unpackbits(np.frombuffer(packet, dtype=np.uint8))]
+
+def build_cases(workdir):
+    """Lista de casos: (nombre, función sin argumentos, muestras de audio por llamada o 0)"""
+    rng = np.random.default_rng(0)
+    cases = []
+    
+    for profile, (protocol, data_type) in _profiles().items():
+        n = protocol.samples_per_bit
+        cases.append((f"{profile}/generate_tone", lambda p=protocol: p.generate_tone(1), n))
+        
+        for size in SIZES:
+            data = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+            packet = protocol.encode_packet(data_type, 1, data)
+            bits = _bits(packet)
+            wav = os.path.join(workdir, f"{profile}_{size}.wav")
+            protocol.encode_to_audio(packet, wav)
+            with open(wav, 'rb') as f:
+                samples = (len(f.read()) - 44) // 2
+            
+            cases.append((f"{profile}/encode_packet/{size}",
+                          lambda p=protocol, t=data_type, d=data: p.encode_packet(t, 1, d), 0))
+            cases.append((f"{profile}/bits_to_symbols/{size}", lambda p=protocol, b=bits: p.bits_to_symbols(b), 0))
+            cases.append((f"{profile}/encode_to_audio/{size}",
+                          lambda p=protocol, k=packet, w=wav + '.tmp': p.encode_to_audio(k, w), samples))
+            cases.append((f"{profile}/decode_from_audio/{size}", lambda p=protocol, w=wav: p.decode_from_audio(w), samples))
+    
+    # Receptor de streaming (sin dispositivo de audio: NullBackend)
+    receiver = AudioStreamReceiver(NullBackend(), squelch=False, verbose=False)
+    protocol = receiver.protocol
+    n = protocol.samples_per_bit
+    block = protocol.generate_tone(5).astype(np.float32)
+    cases.append(("stream/_detect_symbol", lambda: receiver._detect_symbol(block), n))
+    
+    output_dir = os.path.join(workdir, 'recibidos')
+    os.makedirs(output_dir, exist_ok=True)
+    for size in SIZES:
+        data = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+        audio, _ = protocol.modulate_frames(*single_frame(protocol.encode_packet(PacketType.DATA, 1, data)))
+        # Silencio antes y después, como llega del micrófono
+        buffer = np.concatenate([np.zeros(8 * n), audio, np.zeros(8 * n)]).astype(np.float32)
+        
+        def process(buffer=buffer):
+            receiver.buffer = buffer
+            receiver._process_buffer(output_dir)
+        cases.append((f"stream/_process_buffer/{size}", process, len(buffer)))
+    
+    # Un tramo de RingDemodulator (1 s propio + solapamiento) contra el mismo segundo
+    # solo: las muestras son las propias, el solapamiento no debería costar casi nada
+    payload = rng.integers(0, 256, 64 * 24, dtype=np.uint8).tobytes()
+    audio, _ = protocol.modulate_frames(*frame_payload(payload, 64, PacketType.DATA))
+    owned = protocol.sample_rate  # slice_seconds=1.0
+    audio = audio[:owned + protocol.max_frame_samples() + n].astype(np.float32)
+    cases.append(("ring/scan_audio/slice", lambda a=audio: scan_audio(protocol, a, owned), owned))
+    cases.append(("ring/scan_audio/owned", lambda a=audio[:owned]: scan_audio(protocol, a, owned), owned))
+    
+    # Remuestreo dispositivo → módem (1 s de audio a la frecuencia del dispositivo)
+    for rate in (48000, 96000):
+        audio = rng.standard_normal(rate).astype(np.float32) * 0.1
+        cases.append((f"resample/{rate}-44100", lambda a=audio, r=rate: resample(a, r, 44100), rate))
+    
+    return cases
+
+def measure(function, repeat=5, min_time=0.2):
+    """Segundos por llamada: mínimo de repeat mediciones de al menos min_time cada una"""
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    times = [elapsed] + timer.repeat(repeat - 1, number)
+    return min(times) / number
+
+def run_benchmarks(name_filter=None, repeat=5, min_time=0.2):
+    """Corre los casos (opcionalmente solo los que contienen name_filter) y devuelve los resultados"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, function, samples in build_cases(workdir):
+            if name_filter and name_filter not in name:
+                continue
+            seconds = measure(function, repeat, min_time)
+            results[name] = {
+                'seconds_per_op': seconds,
+                'ops_per_sec': 1 / seconds,
+                'samples_per_sec': samples / seconds if samples else None,
+            }
+            samples_text = f"{samples / seconds / 1e6:9.2f} Msamples/s" if samples else ""
+            print(f"  {name:40s} {1 / seconds:12.1f} ops/s {samples_text}")
+    
+    return {
+        'meta': {
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'system': platform.system(),
+        },
+        'results': results,
+    }
+
+def check_ring(current):
+    """Costo de un tramo con solapamiento sobre el de sus muestras propias; False si se pasa"""
+    results = current['results']
+    if 'ring/scan_audio/slice' not in results or 'ring/scan_audio/owned' not in results:
+        return True
+    ratio = results['ring/scan_audio/slice']['seconds_per_op'] / results['ring/scan_audio/owned']['seconds_per_op']
+    ok = ratio <= RING_OVERHEAD
+    print(f"\n{'✓' if ok else '✗'} Tramo con solapamiento: x{ratio:.2f} del costo de su parte propia"
+          f" (máximo x{RING_OVERHEAD})")
+    return ok
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD, name_filter=None):
+    """Compara ops/s contra una línea base; devuelve la lista de regresiones (nombre, relación)"""
+    regressions = []
+    print(f"\n📊 Comparación con la línea base ({baseline['meta']['date']}, umbral {threshold:.0%}):")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"  + {name:38s} (nuevo)")
+            continue
+        ratio = result['ops_per_sec'] / base['ops_per_sec']
+        if ratio < 1 - threshold:
+            marker = "✗"
+            regressions.append((name, ratio))
+        elif ratio > 1 + threshold:
+            marker = "↑"
+        else:
+            marker = "✓"
+        print(f"  {marker} {name:38s} {ratio:6.2f}x")
+    
+    for name in baseline['results']:
+        if name not in current['results'] and (not name_filter or name_filter in name):
+            print(f"  ⚠ {name:38s} (ya no se mide)")
+    return regressions
+
+if __name__ == '__main__':
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print("Uso: python3 benchmark.py [--save=resultados.json] [--baseline=base.json] [--threshold=0.2] [--filter=texto] [--quick]")
+        print("Ejemplo: python3 benchmark.py --save=base.json   (después: --baseline=base.json)")
+        sys.exit(0)
+    
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    quick = '--quick' in sys.argv
+    
+    print("⏱ Microbenchmarks del protocolo")
+    current = run_benchmarks(options.get('filter'), repeat=2 if quick else 5, min_time=0.05 if quick else 0.2)
+    
+    ring_ok = check_ring(current)
+    
+    if 'save' in options:
+        with open(options['save'], 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"\n✓ Resultados guardados: {options['save']}")
+    
+    if 'baseline' in options:
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, float(options.get('threshold', DEFAULT_THRESHOLD)),
+                              options.get('filter'))
+        if regressions:
+            print(f"\n✗ {len(regressions)} regresiones de rendimiento")
+            sys.exit(1)
+        print("\n✓ Sin regresiones")
+    if not ring_ok:
+        sys.exit(1)
@@ -0,0 +1,60 @@
+import os
+import asyncio
+import tempfile
+import contextlib
+from audio_async import AsyncAudioReceiver
+from audio_backends import NullBackend, WavFileBackend
+from audio_stream_sender import AudioStreamSender
+from test_stream_receiver import _source
+
+# Receptor asyncio: iterar de nuevo después de cortar y bloques descartados
+
+class _TrackedWav(WavFileBackend):
+    """WAV que no se puede volver a abrir después de terminate (como PyAudio)"""
+    terminated = False
+    
+    def open(self, rate, **kwargs):
+        assert not self.terminated
+        return super().open(rate, **kwargs)
+    
+    def terminate(self):
+        super().terminate()
+        self.terminated = True
+
+def test_iterate_again_after_break():
+    with tempfile.TemporaryDirectory() as directory:
+        src = _source(directory, 5)
+        wav = os.path.join(directory, 'rec.wav')
+        sender = AudioStreamSender(WavFileBackend(wav))
+        sender.send_file_stream(src)
+        sender.close()
+        backend = _TrackedWav(wav)
+        
+        async def main():
+            receiver = AsyncAudioReceiver(os.path.join(directory, 'out'), backend)
+            os.makedirs(receiver.output_dir)
+            async with contextlib.aclosing(receiver.packets()) as packets:
+                async for packet in packets:
+                    break
+            assert receiver.stream is None and not backend.terminated
+            async with receiver:
+                return [path async for path in receiver.files()]
+        
+        assert asyncio.run(main()) == [os.path.join(directory, 'out', 'src.bin')]
+        assert backend.terminated
+
+def test_full_queue_counts_dropped_blocks():
+    async def main():
+        receiver = AsyncAudioReceiver(".", NullBackend(), max_queue=2)
+        receiver._chunks = asyncio.Queue(maxsize=2)
+        for i in range(5):
+            receiver._push_chunk(bytes([i]))
+        return receiver.dropped, receiver._chunks.get_nowait()
+    
+    # Se descartan los más viejos: quedan los dos últimos
+    assert asyncio.run(main()) == (3, bytes([3]))
+
+if __name__ == '__main__':
+    test_iterate_again_after_break()
+    test_full_queue_counts_dropped_blocks()
+    print("✓ Receptor asyncio")
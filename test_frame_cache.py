@@ -0,0 +1,61 @@
+import os
+import tempfile
+from audio_frame_cache import FrameCache, SYN_SEQ, FIN_SEQ
+
+# LRU en memoria hasta budget, desborde a disco y recarga en get
+
+def _pcm(seq):
+    return bytes([seq % 256]) * 100
+
+def test_eviction_without_spill_dir():
+    cache = FrameCache(budget=300)
+    for seq in range(5):
+        cache.put(1, seq, _pcm(seq))
+    # Entran 3 paquetes: los 2 más viejos se descartan
+    assert cache.size == 300 and list(cache.frames) == [(1, 2), (1, 3), (1, 4)]
+    assert cache.get(1, 0) is None
+    assert cache.get(1, 4) == _pcm(4)
+    assert (cache.hits, cache.misses, cache.spilled) == (1, 1, 0)
+    
+    # Usar uno lo protege: sale el menos usado
+    cache.get(1, 2)
+    cache.put(1, 5, _pcm(5))
+    assert list(cache.frames) == [(1, 4), (1, 2), (1, 5)]
+    
+    # Reemplazar un paquete no cuenta dos veces su tamaño
+    cache.put(1, 5, _pcm(5))
+    assert cache.size == 300
+
+def test_spill_and_reload():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = FrameCache(budget=300, spill_dir=directory)
+        for seq in [SYN_SEQ, 0, 1, 2, FIN_SEQ]:
+            cache.put(7, seq, _pcm(seq))
+        # Los 2 más viejos pasaron a disco con su contenido
+        assert cache.spilled == 2 and cache.size == 300
+        session_dir = os.path.join(directory, f"{7:08x}")
+        on_disk = {}
+        for name in os.listdir(session_dir):
+            with open(os.path.join(session_dir, name), 'rb') as f:
+                on_disk[name] = f.read()
+        assert on_disk == {f"{SYN_SEQ}.pcm": _pcm(SYN_SEQ), "0.pcm": _pcm(0)}
+        assert sum(len(pcm) for pcm in on_disk.values()) == 200
+        assert cache.has_session(7, [0, 1, 2])
+        assert not cache.has_session(7, [3])
+        
+        # get desde disco: cuenta como acierto y vuelve a memoria (sale otro)
+        assert cache.get(7, 0) == _pcm(0)
+        assert (7, 0) in cache.frames and cache.spilled == 3 and cache.size == 300
+        assert cache.get(7, 3) is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        
+        # Liberar la sesión borra memoria y disco
+        cache.drop_session(7)
+        assert cache.size == 0 and not cache.frames
+        assert not os.path.exists(session_dir)
+        assert cache.get(7, 0) is None
+
+if __name__ == '__main__':
+    test_eviction_without_spill_dir()
+    test_spill_and_reload()
+    print("✓ FrameCache")
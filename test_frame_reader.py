@@ -0,0 +1,39 @@
+import numpy as np
+from audio_frame_reader import FrameReader
+from audio_packetizer import join_frames, single_frame
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType
+
+# Cabeceras imposibles (ruido con forma de preámbulo) no deben frenar al lector
+
+def _garbage_then_valid(header):
+    """Audio de un paquete con cabecera header seguido de un DATA válido; devuelve (audio, DATA)"""
+    protocol = AudioProtocolUltrasonic()
+    packet = protocol.encode_packet(PacketType.DATA, 7, bytes(range(64)))
+    garbage = bytes(header) + bytes(8)
+    audio, _ = protocol.modulate_frames(*join_frames(single_frame(garbage), single_frame(packet)))
+    return protocol, audio, packet
+
+def test_impossible_length_does_not_stall():
+    for header in ([PacketType.DATA.value, 0, 140], [PacketType.ACK.value, 0, 174],
+                   [PacketType.FIN.value, 0, 200]):
+        protocol, audio, packet = _garbage_then_valid(header)
+        assert not protocol.length_possible(bytes(header))
+        # Sin flush: el DATA sale apenas llega, sin esperar el final que anunciaba la basura
+        reader = FrameReader(protocol)
+        found = []
+        n = protocol.samples_per_bit
+        padded = np.concatenate([audio, np.zeros(20 * n, dtype=np.float32)])
+        for i in range(0, len(padded), 4 * n):
+            found += reader.feed(padded[i:i + 4 * n])
+        assert found == [packet]
+
+def test_possible_lengths():
+    protocol = AudioProtocolUltrasonic()
+    for packet_type, length in ((PacketType.DATA, 64), (PacketType.FIN, 0), (PacketType.ACK, 3),
+                                (PacketType.NACK, 32), (PacketType.SYN, 20)):
+        assert protocol.length_possible(bytes([packet_type.value, 0, length]))
+
+if __name__ == '__main__':
+    test_impossible_length_does_not_stall()
+    test_possible_lengths()
+    print("✓ Cabeceras de largo imposible descartadas")
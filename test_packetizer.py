@@ -0,0 +1,26 @@
+import numpy as np
+from audio_packetizer import frame_payload, split_frames
+from audio_protocol_ultrasonic import AudioProtocolUltrasonic, PacketType
+
+# El empaquetado en bloque debe dar exactamente los bytes de encode_packet
+
+def test_frame_payload_matches_encode_packet():
+    protocol = AudioProtocolUltrasonic()
+    rng = np.random.default_rng(5)
+    # Último paquete corto o completo, seq que da la vuelta, con y sin stream
+    for size, start_seq, stream_id in ((64 * 300 + 17, 0, 0), (64 * 5, 250, 3), (1, 7, 15)):
+        payload = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+        buffer, offsets = frame_payload(payload, 64, PacketType.DATA, start_seq, stream_id)
+        expected = [protocol.encode_packet(PacketType.DATA, (start_seq + i) & 0xFF, payload[i * 64:(i + 1) * 64], stream_id)
+                    for i in range(-(-size // 64))]
+        assert buffer.tobytes() == b''.join(expected)
+        assert split_frames(buffer, offsets) == expected
+
+def test_frame_payload_empty():
+    buffer, offsets = frame_payload(b'', 64, PacketType.DATA)
+    assert len(buffer) == 0 and list(offsets) == [0]
+
+if __name__ == '__main__':
+    test_frame_payload_matches_encode_packet()
+    test_frame_payload_empty()
+    print("✓ frame_payload igual a encode_packet")
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import numpy as np
+from audio_codecs import CODECS, STORED, get_codec
+from audio_reassembler import Reassembler
+
+# Rearmado en orden con llegada desordenada, ventana chica y cada codec
+
+def _payload(size=40000, seed=0):
+    """Texto repetitivo pero no trivial: todos los codecs lo comprimen a muchos paquetes"""
+    rng = np.random.default_rng(seed)
+    words = [b'audio', b'paquete', b'tono', b'trama', b'ruido', b'archivo', b'sesion', b'banda']
+    pairs = zip(rng.integers(0, 8, size // 6), rng.integers(0, 99, size // 6))
+    data = b' '.join(words[i] + str(j).encode() for i, j in pairs)
+    return data[:size]
+
+def _packets(codec_id, data, size=64):
+    compressed = get_codec(codec_id).compress(data)
+    return [compressed[i:i + size] for i in range(0, len(compressed), size)]
+
+def _shuffled(n, seed=1):
+    return list(np.random.default_rng(seed).permutation(n))
+
+def test_round_trip_every_codec_shuffled():
+    data = _payload()
+    for codec_id in CODECS:
+        packets = _packets(codec_id, data)
+        window = 8
+        assert len(packets) > 4 * window
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.bin')
+            reassembler = Reassembler(path, codec_id, window=window)
+            spilled = 0
+            for seq in _shuffled(len(packets)):
+                assert reassembler.add(seq, packets[seq])
+                assert len(reassembler.held) <= window
+                assert not reassembler.add(seq, packets[seq])  # repetido
+                spilled = max(spilled, len(reassembler.spilled))
+            # Pasada la ventana los adelantados fueron a disco; ya se escribieron todos
+            assert spilled > 0 and not reassembler.spilled
+            assert reassembler.missing() is None
+            reassembler.set_expected(len(packets))
+            assert reassembler.is_complete() and reassembler.missing() == []
+            assert reassembler.finish() == path
+            with open(path, 'rb') as f:
+                assert f.read() == data, get_codec(codec_id).name
+            assert sorted(os.listdir(directory)) == ['out.bin']  # sin .part ni .spill
+
+def test_spill_to_disk_and_fetch():
+    data = _payload(20000, seed=2)
+    packets = _packets(STORED, data)
+    order = list(range(1, len(packets))) + [0]  # el primero llega último: todo queda adelantado
+    with tempfile.TemporaryDirectory() as directory:
+        # Sin fetch: lo que no entra en la ventana se guarda en spill_dir
+        path = os.path.join(directory, 'disk.bin')
+        reassembler = Reassembler(path, STORED, window=4)
+        for seq in order[:-1]:
+            reassembler.add(seq, packets[seq])
+        assert len(reassembler.held) == 4
+        assert len(os.listdir(reassembler.spill_dir)) == len(packets) - 1 - 4
+        # La ventana se queda con los más cercanos al hueco
+        assert sorted(reassembler.held) == [1, 2, 3, 4]
+        reassembler.add(0, packets[0])
+        reassembler.set_expected(len(packets))
+        reassembler.finish()
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        assert not os.path.exists(reassembler.spill_dir)
+        
+        # Con fetch no se escribe nada aparte: se piden de nuevo al salir del hueco
+        path = os.path.join(directory, 'fetch.bin')
+        fetched = []
+        reassembler = Reassembler(path, STORED, window=4, fetch=lambda seq: fetched.append(seq) or packets[seq])
+        for seq in order:
+            reassembler.add(seq, packets[seq])
+        assert sorted(fetched) == list(range(5, len(packets)))
+        assert not os.path.exists(reassembler.spill_dir)
+        reassembler.set_expected(len(packets))
+        reassembler.finish()
+        with open(path, 'rb') as f:
+            assert f.read() == data
+
+def test_truncated_stream_is_rejected():
+    # Sin el último paquete el descompresor no llega al fin del stream: finish falla
+    data = _payload()
+    for codec_id in CODECS:
+        if codec_id == STORED:
+            continue
+        packets = _packets(codec_id, data)[:-1]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.bin')
+            reassembler = Reassembler(path, codec_id, window=8)
+            for seq in _shuffled(len(packets)):
+                reassembler.add(seq, packets[seq])
+            reassembler.set_expected(len(packets))
+            failed = False
+            try:
+                reassembler.finish()
+            except Exception:
+                failed = True
+            assert failed, get_codec(codec_id).name
+            assert os.listdir(directory) == []
+
+def test_skip_gaps_and_late_packets():
+    data = _payload(5000, seed=3)
+    packets = _packets(STORED, data)
+    lost = {3, 10, 11}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'out.bin')
+        reassembler = Reassembler(path, STORED, window=4)
+        for seq in _shuffled(len(packets)):
+            if seq not in lost:
+                reassembler.add(seq, packets[seq])
+        reassembler.set_expected(len(packets))
+        assert reassembler.missing() == sorted(lost)
+        # Nada más allá del total
+        assert not reassembler.add(len(packets), b'x')
+        reassembler.skip_gaps()
+        assert reassembler.is_complete()
+        reassembler.finish()
+        with open(path, 'rb') as f:
+            assert f.read() == b''.join(p for seq, p in enumerate(packets) if seq not in lost)
+
+if __name__ == '__main__':
+    test_round_trip_every_codec_shuffled()
+    test_spill_to_disk_and_fetch()
+    test_truncated_stream_is_rejected()
+    test_skip_gaps_and_late_packets()
+    print("✓ Reassembler")
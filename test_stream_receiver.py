@@ -0,0 +1,154 @@
+import os
+import tempfile
+import numpy as np
+from audio_backends import NullBackend, WavFileBackend
+from audio_packetizer import split_frames
+from audio_protocol_ultrasonic import PacketType
+from audio_stream_sender import AudioStreamSender
+from audio_stream_receiver import AudioStreamReceiver, MAX_TRACES
+
+# Pruebas del receptor de streaming aplicando los paquetes directamente (sin audio)
+
+def _source(directory, n_packets, seed=0):
+    """Archivo aleatorio (no comprime) de n_packets paquetes de 64 bytes"""
+    path = os.path.join(directory, 'src.bin')
+    with open(path, 'wb') as f:
+        f.write(np.random.default_rng(seed).integers(0, 256, n_packets * 64, dtype=np.uint8).tobytes())
+    return path
+
+def test_fin_conflicting_total_is_ignored():
+    with tempfile.TemporaryDirectory() as directory:
+        src = _source(directory, 300)
+        out = os.path.join(directory, 'out')
+        os.makedirs(out)
+        sender = AudioStreamSender(NullBackend())
+        receiver = AudioStreamReceiver(NullBackend(), NullBackend(), squelch=False)
+        
+        # Primera transmisión sin el paquete 280: el FIN fija 300 paquetes
+        packets = split_frames(*sender.prepare_frames(src)[1:])
+        for i, packet in enumerate(packets):
+            if i != 1 + 280:
+                assert receiver._apply_packet(packet, out) is None
+        transfer = receiver.transfers[0]
+        assert transfer.expected == 300
+        assert transfer.missing() == [280]
+        
+        # Otro SYN de la misma sesión y un FIN con otro total: se descarta
+        receiver._apply_packet(packets[0], out)
+        fin = sender.protocol.encode_packet(PacketType.FIN, 200, b'')
+        assert receiver._apply_packet(fin, out) is None
+        assert receiver.transfers[0].expected == 300
+        assert not os.path.exists(os.path.join(out, 'src.bin'))
+
+def test_syn_unknown_codec_is_dropped():
+    with tempfile.TemporaryDirectory() as directory:
+        src = _source(directory, 3)
+        out = os.path.join(directory, 'out')
+        os.makedirs(out)
+        sender = AudioStreamSender(NullBackend())
+        receiver = AudioStreamReceiver(NullBackend(), NullBackend(), squelch=False)
+        syn = sender.protocol.decode_packet(split_frames(*sender.prepare_frames(src)[1:])[0])[2]
+        
+        # Mismo SYN con un codec que el receptor no conoce: no abre nada
+        packet = sender.protocol.encode_packet(PacketType.SYN, 0, bytes([9]) + syn[1:])
+        assert receiver._apply_packet(packet, out) is None
+        assert receiver.transfers == {}
+        assert os.listdir(out) == []
+        
+        # y el receptor sigue recibiendo
+        paths = [receiver._apply_packet(packet, out) for packet in split_frames(*sender.prepare_frames(src)[1:])]
+        assert paths[-1] == os.path.join(out, 'src.bin')
+
+def test_trace_records_evict_oldest():
+    # Registros que nadie completa no se acumulan, pero los recientes siguen ahí
+    receiver = AudioStreamReceiver(NullBackend(), NullBackend(), squelch=False)
+    packets = [i.to_bytes(4, 'big') for i in range(MAX_TRACES + 10)]
+    for packet in packets:
+        receiver._keep_trace(packet, {'side': 'rx'})
+    assert len(receiver.traces) == MAX_TRACES
+    assert packets[0] not in receiver.traces and packets[9] not in receiver.traces
+    assert packets[10] in receiver.traces and packets[-1] in receiver.traces
+
+def _resend(directory, lost, from_cache):
+    """Transmisión de 300 paquetes sin lost y retransmisión por audio; devuelve el archivo recibido"""
+    src = _source(directory, 300, seed=1)
+    out = os.path.join(directory, 'out')
+    os.makedirs(out)
+    wav = os.path.join(directory, 'resend.wav')
+    
+    # Primera transmisión aplicada directo al receptor (queda en .partial)
+    sender = AudioStreamSender(WavFileBackend(wav))
+    if from_cache:
+        sender.audio = NullBackend()
+        sender.send_file_stream(src)
+        sender.audio = WavFileBackend(wav)
+    receiver = AudioStreamReceiver(NullBackend(), NullBackend(), squelch=False)
+    for i, packet in enumerate(split_frames(*sender.prepare_frames(src)[1:])):
+        if i - 1 not in lost:
+            receiver._apply_packet(packet, out)
+    assert receiver.transfers[0].missing() == sorted(lost)
+    
+    # Retransmisión grabada en un WAV; otro receptor (como después de reiniciar) la escucha
+    sender.send_file_stream(src, only=lost)
+    sender.close()
+    receiver = AudioStreamReceiver(WavFileBackend(wav), NullBackend(), squelch=False)
+    receiver.listen_continuous(out)
+    with open(src, 'rb') as f:
+        original = f.read()
+    path = os.path.join(out, 'src.bin')
+    with open(path, 'rb') as f:
+        return f.read() == original
+
+def test_resend_above_256():
+    # 5 y 280 quedan en tramos distintos: cada uno con su SYN
+    with tempfile.TemporaryDirectory() as directory:
+        assert _resend(directory, [5, 280], from_cache=False)
+
+def test_resend_from_cache_above_256():
+    with tempfile.TemporaryDirectory() as directory:
+        assert _resend(directory, [280], from_cache=True)
+
+def test_resampled_tail():
+    # El FIN queda al final del WAV a 96 kHz: sale del remuestreador al terminar la entrada
+    with tempfile.TemporaryDirectory() as directory:
+        src = _source(directory, 10)
+        out = os.path.join(directory, 'out')
+        os.makedirs(out)
+        wav = os.path.join(directory, 'tail.wav')
+        sender = AudioStreamSender(WavFileBackend(wav), device_rate=96000)
+        sender.send_file_stream(src)
+        sender.close()
+        receiver = AudioStreamReceiver(WavFileBackend(wav), NullBackend(), device_rate=96000)
+        receiver.listen_continuous(out)
+        with open(src, 'rb') as f, open(os.path.join(out, 'src.bin'), 'rb') as g:
+            assert f.read() == g.read()
+
+def test_duty_cycle_across_profiles():
+    # Al volver al perfil por defecto el frontend es otro: la estadística es de toda la escucha
+    with tempfile.TemporaryDirectory() as directory:
+        src = _source(directory, 18)
+        out = os.path.join(directory, 'out')
+        os.makedirs(out)
+        wav = os.path.join(directory, 'profile.wav')
+        sender = AudioStreamSender(WavFileBackend(wav), profile='96k')
+        sender.send_file_stream(src)
+        sender.close()
+        receiver = AudioStreamReceiver(WavFileBackend(wav), NullBackend(), device_rate=96000)
+        receiver.listen_continuous(out)
+        assert os.path.exists(os.path.join(out, 'src.bin'))
+        assert receiver.duty_cycle() > 0.5
+
+if __name__ == '__main__':
+    test_fin_conflicting_total_is_ignored()
+    print("✓ FIN con otro total descartado")
+    test_syn_unknown_codec_is_dropped()
+    print("✓ SYN con codec desconocido descartado")
+    test_trace_records_evict_oldest()
+    print("✓ Registros de traza acotados")
+    test_resend_above_256()
+    test_resend_from_cache_above_256()
+    print("✓ Retransmisión de paquetes ≥ 256")
+    test_resampled_tail()
+    print("✓ Final de la entrada remuestreada")
+    test_duty_cycle_across_profiles()
+    print("✓ Demodulación activa con cambio de perfil")